@@ -0,0 +1,255 @@
+"""
+Local stand-in of the Vjmap Service-API used by the benchmarks.
+
+Run standalone with ``python -m benchmarks.mock_server --port 8080``, or start it in a
+background thread with :class:`MockVjmapServer`.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+
+class MockVjmapServer(object):
+    """
+    Emulates /map/uploads, /map/mapfile, /map/openmap, /map/updatemap, /map/tile and the /map/cmd
+    endpoints (queryFeatures, metadata, getDataBounds, thumbnail, listmaps, closemap, ...).
+
+    Every request waits ``latency`` seconds plus up to ``jitter`` seconds, and fails with a 503 with
+    probability ``error_rate``. queryFeatures serves ``feature_count`` line features laid out on a
+    diagonal of the map extent, paginated with beginpos and maxReturnCount.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 tile_size: int = 16384, feature_count: int = 10000, extent: float = 100000.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.tile_size = tile_size
+        self.extent = extent
+        self.requests = 0
+        self.uploaded = {}
+        self.updates = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tile = b'\x89PNG\r\n\x1a\n' + bytes(max(tile_size - 8, 0))
+        self.features = [_feature(i, feature_count, extent) for i in range(feature_count)]
+        self._pages = {}
+        server = self
+
+        class Handler(_Handler):
+            mock = server
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'MockVjmapServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def delay(self) -> bool:
+        """
+        Wait for the simulated latency, returns whether the request should fail.
+        """
+        with self._lock:
+            self.requests += 1
+            jitter = self._random.random() * self.jitter if self.jitter else 0.0
+            fail = self.error_rate > 0 and self._random.random() < self.error_rate
+        if self.latency or jitter:
+            time.sleep(self.latency + jitter)
+        return fail
+
+    def upload(self, body: bytes, content_type: str) -> dict:
+        """
+        Store an uploaded file, its fileid being the MD5 of its content as /map/mapfile looks it up.
+        """
+        content = _file_part(body, content_type)
+        fileid = hashlib.md5(content).hexdigest()
+        with self._lock:
+            self.uploaded[fileid] = fileid
+        return {'code': 0, 'fileid': fileid, 'mapid': fileid[:8], 'uploadname': 'mock', 'size': len(content)}
+
+    def update(self, map_id: str, parameters: dict) -> dict:
+        """
+        Record the entities of an /map/updatemap request as (map_id, entities) in :attr:`updates`.
+        """
+        entities = json.loads(parameters.get('fileid') or '{}').get('entities') or []
+        with self._lock:
+            self.updates.append((map_id, entities))
+        return {'code': 0}
+
+    def query(self, parameters: dict) -> bytes:
+        features = self.features
+        if parameters.get('querytype') == 'rect':
+            x1, y1, x2, y2 = parameters['x1'], parameters['y1'], parameters['x2'], parameters['y2']
+            features = [f for f in features if x1 <= f['_x'] <= x2 and y1 <= f['_y'] <= y2]
+        elif parameters.get('querytype') == 'point':
+            x, y = parameters['x'], parameters['y']
+            tolerance = parameters.get('tolerance') or 1.0
+            features = [f for f in features if abs(f['_x'] - x) <= tolerance and abs(f['_y'] - y) <= tolerance]
+        else:
+            # 条件与表达式查询返回所有实体，分页结果可以缓存
+            key = (parameters.get('beginpos') or 0, parameters.get('maxReturnCount') or 100)
+            page = self._pages.get(key)
+            if page is None:
+                page = self._pages[key] = _page(features, *key)
+            return page
+        return _page(features, parameters.get('beginpos') or 0, parameters.get('maxReturnCount') or 100)
+
+
+def _feature(i: int, count: int, extent: float) -> dict:
+    step = extent / max(count, 1)
+    x = y = i * step
+    return {
+        'objectid': f'{i:X}',
+        'layername': f'layer{i % 8}',
+        'name': 'AcDbLine',
+        'color': i % 256,
+        'bounds': f'[{x},{y},{x + step},{y + step}]',
+        'geom': {'type': 'LineString', 'coordinates': [[x, y], [x + step, y + step]]},
+        '_x': x + step / 2,
+        '_y': y + step / 2,
+    }
+
+
+def _file_part(body: bytes, content_type: str) -> bytes:
+    # multipart/form-data 中第一个文件的内容，其他请求体原样返回
+    boundary = content_type.partition('boundary=')[2].strip('"')
+    if not content_type.startswith('multipart/form-data') or not boundary:
+        return body
+    for part in body.split(b'--' + boundary.encode('utf-8')):
+        head, separator, content = part.partition(b'\r\n\r\n')
+        if separator and b'filename=' in head:
+            return content[:-2] if content.endswith(b'\r\n') else content
+    return body
+
+
+def _page(features: list, beginpos: int, count: int) -> bytes:
+    page = [dict((k, v) for k, v in f.items() if not k.startswith('_')) for f in features[beginpos:beginpos + count]]
+    return json.dumps({'code': 0, 'recordCount': len(page), 'result': page}).encode('utf-8')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # 响应头与响应体分两次写出，关闭 Nagle 算法以免本机上的延迟确认拖慢响应
+    disable_nagle_algorithm = True
+    mock = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body, content_type: str = 'application/json', headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            body = b''.join(chunks)
+        else:
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.headers.get('Content-Encoding', '').lower() == 'gzip':
+            body = gzip.decompress(body)
+        return body
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        path = url.path
+        if self.mock.delay():
+            return self._send(503, b'Service Unavailable', 'text/plain')
+        if '/map/tile/' in path:
+            etag = '"%s"' % hashlib.md5(path.encode('utf-8')).hexdigest()
+            if self.headers.get('If-None-Match') == etag:
+                return self._send(304, b'', headers={'ETag': etag})
+            return self._send(200, self.mock._tile, 'image/png', {'ETag': etag})
+        if '/thumbnail/' in path:
+            return self._send(200, self.mock._tile, 'image/png')
+        if '/metadata/' in path:
+            layers = [{'name': f'layer{i}', 'color': i} for i in range(8)]
+            extent = self.mock.extent
+            return self._send(200, {'code': 0, 'mapid': path.split('/')[-2], 'version': path.split('/')[-1],
+                                    'bounds': f'[0,0,{extent},{extent}]', 'layers': layers})
+        if '/getDataBounds/' in path:
+            return self._send(200, {'code': 0, 'bounds': [0, 0, self.mock.extent, self.mock.extent]})
+        if '/listmaps/' in path:
+            return self._send(200, [{'mapid': path.split('/')[-2], 'version': 'v1', 'status': 'finish'}])
+        if '/openmap/' in path:
+            return self._send(200, {'code': 0, 'mapid': path.split('/')[-1], 'version': 'v1', 'fileid': 'mock'})
+        if path.endswith('/map/mapfile'):
+            md5 = (query.get('md5') or [''])[0]
+            fileid = self.mock.uploaded.get(md5)
+            return self._send(200, {'code': 0, 'fileid': fileid} if fileid else {'code': 0})
+        self._send(404, {'code': -1, 'error': 'Not Found'})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        body = self._read_body()
+        if self.mock.delay():
+            return self._send(503, b'Service Unavailable', 'text/plain')
+        if '/queryFeatures/' in path:
+            return self._send(200, self.mock.query(json.loads(body or b'{}')))
+        if '/map/updatemap/' in path:
+            return self._send(200, self.mock.update(path.rsplit('/', 1)[-1], json.loads(body or b'{}')))
+        if path.endswith('/map/uploads'):
+            return self._send(200, self.mock.upload(body, self.headers.get('Content-Type', '')))
+        self._send(200, {'code': 0})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in of the Vjmap Service-API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='maximum random seconds added to every request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests failing with a 503')
+    parser.add_argument('--tile-size', type=int, default=16384, help='bytes per tile')
+    parser.add_argument('--features', type=int, default=10000, help='number of features served by queryFeatures')
+    args = parser.parse_args()
+    server = MockVjmapServer(args.host, args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                             tile_size=args.tile_size, feature_count=args.features)
+    print(f'Mock Vjmap server listening on {server.url}/server/api/v1')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,465 @@
+"""
+Benchmarks of vjmap_py_client against the local mock server, or a server given with --url.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --baseline results.json --tolerance 0.2
+    python benchmarks/run.py --output results.json
+
+Results are printed as JSON. With --baseline, benchmarks whose throughput dropped or whose
+p99 latency grew by more than the tolerance are reported and the exit code is 1.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 仓库根目录，包含 vjmap_py_client 与 benchmarks
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if not __package__:
+    # 以脚本运行时从仓库根目录导入，相对导入按 benchmarks 包解析
+    sys.path.insert(0, ROOT)
+    __package__ = 'benchmarks'
+
+from vjmap_py_client import (VjmapClient, ConditionQueryParameter, RectQueryParameter, RetryPolicy, TileCache, TileFetcher, TilePrefetcher,
+                             TransportConfig, HashCache, files_md5)
+from vjmap_py_client.utils import file_md5
+from .mock_server import MockVjmapServer
+
+MAP_ID = 'bench'
+VERSION = 'v1'
+BENCHMARKS = {}
+
+
+def benchmark(name: str):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def percentile(samples: list, q: float):
+    # 最近秩法
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))]
+
+
+class Recorder(object):
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def call(self, func, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            return None
+        self.latencies.append(time.perf_counter() - started)
+        return result
+
+    def result(self, name: str, ops: int, seconds: float) -> dict:
+        return {
+            'name': name,
+            'ops': ops,
+            'seconds': round(seconds, 6),
+            'ops_per_second': round(ops / seconds, 3) if seconds else None,
+            'mb_per_second': round(self.bytes / seconds / 1048576, 3) if seconds and self.bytes else None,
+            'p50_ms': _ms(percentile(self.latencies, 0.5)),
+            'p99_ms': _ms(percentile(self.latencies, 0.99)),
+            'errors': self.errors,
+        }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+
+def _client(args, **kwargs) -> VjmapClient:
+    retry = RetryPolicy(max_retries=args.retries, backoff_base=0.01) if args.retries else None
+    transport = TransportConfig(pool_maxsize=max(args.concurrency, 10))
+    return VjmapClient('bench', args.url, retry=retry, transport=transport, **kwargs)
+
+
+def _tiles(count: int):
+    # 自 8 级起按行列依次取瓦片，保证各不相同
+    z = 8
+    side = 1 << z
+    return [(z, i % side, i // side % side) for i in range(count)]
+
+
+@benchmark('tiles_sync')
+def bench_tiles_sync(args, files):
+    client = _client(args)
+    recorder = Recorder()
+    tiles = _tiles(args.tiles)
+    started = time.perf_counter()
+    for z, x, y in tiles:
+        response = recorder.call(client.get_map_tile, MAP_ID, VERSION, 'default', z, x, y, 'mock')
+        if response is not None:
+            recorder.bytes += len(response.content)
+    return recorder.result('tiles_sync', len(tiles), time.perf_counter() - started)
+
+
+@benchmark('tiles_threads')
+def bench_tiles_threads(args, files):
+    client = _client(args)
+    recorder = Recorder()
+    tiles = _tiles(args.tiles)
+
+    def fetch(tile):
+        z, x, y = tile
+        response = recorder.call(client.get_map_tile, MAP_ID, VERSION, 'default', z, x, y, 'mock')
+        return len(response.content) if response is not None else 0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        recorder.bytes = sum(executor.map(fetch, tiles))
+    return recorder.result('tiles_threads', len(tiles), time.perf_counter() - started)
+
+
+@benchmark('tiles_fetcher')
+def bench_tiles_fetcher(args, files):
+    client = _client(args)
+    recorder = Recorder()
+
+    class TimedTileFetcher(TileFetcher):
+        def _fetch_tile(self, *a, **kwargs):
+            started = time.perf_counter()
+            content = super()._fetch_tile(*a, **kwargs)
+            recorder.latencies.append(time.perf_counter() - started)
+            return content
+
+    fetcher = TimedTileFetcher(client, workers=args.concurrency)
+    started = time.perf_counter()
+    for z, x, y, content in fetcher.fetch_tiles(MAP_ID, VERSION, 'default', 'mock', _tiles(args.tiles)):
+        recorder.bytes += len(content)
+    recorder.errors = fetcher.stats.failed
+    return recorder.result('tiles_fetcher', fetcher.stats.requested, time.perf_counter() - started)
+
+
+@benchmark('tiles_async')
+def bench_tiles_async(args, files):
+    try:
+        from vjmap_py_client.async_client import AsyncVjmapClient
+    except ImportError:
+        return None
+    recorder = Recorder()
+    tiles = _tiles(args.tiles)
+
+    async def run():
+        semaphore = asyncio.Semaphore(args.concurrency)
+        async with AsyncVjmapClient('bench', args.url, max_concurrency=args.concurrency) as client:
+            async def fetch(z, x, y):
+                # 在信号量内计时，延迟不包含排队时间
+                async with semaphore:
+                    started = time.perf_counter()
+                    try:
+                        response = await client.get_map_tile(MAP_ID, VERSION, 'default', z, x, y, 'mock')
+                    except Exception:
+                        recorder.errors += 1
+                        return
+                recorder.latencies.append(time.perf_counter() - started)
+                recorder.bytes += len(response.content)
+            await asyncio.gather(*(fetch(*tile) for tile in tiles))
+
+    started = time.perf_counter()
+    asyncio.run(run())
+    return recorder.result('tiles_async', len(tiles), time.perf_counter() - started)
+
+
+def _viewer(args, name: str, prefetch: bool) -> dict:
+    # 模拟浏览器的视口：4x3 个瓦片，每步向右平移一列
+    client = _client(args, tile_cache=TileCache())
+    prefetcher = TilePrefetcher(client, workers=args.concurrency) if prefetch else None
+    get_tile = prefetcher.get_tile if prefetch else client.get_map_tile
+    recorder = Recorder()
+    started = time.perf_counter()
+    for step in range(args.pan_steps):
+        for dx in range(4):
+            for dy in range(3):
+                response = recorder.call(get_tile, MAP_ID, VERSION, 'default', 10, 100 + step + dx, 100 + dy, 'mock')
+                if response is not None:
+                    recorder.bytes += len(response.content)
+        time.sleep(args.think)
+    seconds = time.perf_counter() - started
+    if prefetcher is not None:
+        prefetcher.close()
+    return recorder.result(name, args.pan_steps * 12, seconds)
+
+
+@benchmark('tiles_viewer')
+def bench_tiles_viewer(args, files):
+    return _viewer(args, 'tiles_viewer', False)
+
+
+@benchmark('tiles_viewer_prefetch')
+def bench_tiles_viewer_prefetch(args, files):
+    return _viewer(args, 'tiles_viewer_prefetch', True)
+
+
+@benchmark('query_pages')
+def bench_query_pages(args, files):
+    client = _client(args)
+    recorder = Recorder()
+    pages = 0
+    beginpos = 0
+    started = time.perf_counter()
+    while True:
+        parameters = ConditionQueryParameter(condition='', beginpos=beginpos, limit=args.page_size, fields='')
+        result = recorder.call(client.query_features, MAP_ID, VERSION, parameters)
+        pages += 1
+        if result is None:
+            break
+        beginpos += len(result.get('result') or [])
+        if len(result.get('result') or []) < args.page_size:
+            break
+    return recorder.result('query_pages', pages, time.perf_counter() - started)
+
+
+def _bench_iter_features(args, name: str, prefetch: bool):
+    client = _client(args)
+    recorder = Recorder()
+    parameters = ConditionQueryParameter(condition='', fields='')
+    count = 0
+    started = last = time.perf_counter()
+    try:
+        for count, feature in enumerate(client.iter_features(MAP_ID, VERSION, parameters, page_size=args.page_size, prefetch=prefetch), 1):
+            if count % args.page_size == 0:
+                # 每页的耗时为消费者等待该页的时间
+                now = time.perf_counter()
+                recorder.latencies.append(now - last)
+                last = now
+    except Exception:
+        recorder.errors += 1
+    result = recorder.result(name, count, time.perf_counter() - started)
+    result['unit'] = 'features'
+    return result
+
+
+@benchmark('iter_features')
+def bench_iter_features(args, files):
+    return _bench_iter_features(args, 'iter_features', prefetch=False)
+
+
+@benchmark('iter_features_prefetch')
+def bench_iter_features_prefetch(args, files):
+    return _bench_iter_features(args, 'iter_features_prefetch', prefetch=True)
+
+
+@benchmark('metadata')
+def bench_metadata(args, files):
+    client = _client(args)
+    recorder = Recorder()
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        recorder.call(client.get_metadata, MAP_ID, VERSION)
+    return recorder.result('metadata', args.requests, time.perf_counter() - started)
+
+
+@benchmark('upload')
+def bench_upload(args, files):
+    client = _client(args)
+    recorder = Recorder()
+    started = time.perf_counter()
+    for _ in range(args.uploads):
+        if recorder.call(client.upload_map, files['upload']) is not None:
+            recorder.bytes += args.upload_size
+    return recorder.result('upload', args.uploads, time.perf_counter() - started)
+
+
+@benchmark('hash_file')
+def bench_hash_file(args, files):
+    recorder = Recorder()
+    started = time.perf_counter()
+    for _ in range(args.hashes):
+        recorder.call(file_md5, files['upload'])
+        recorder.bytes += args.upload_size
+    return recorder.result('hash_file', args.hashes, time.perf_counter() - started)
+
+
+@benchmark('hash_files_parallel')
+def bench_hash_files_parallel(args, files):
+    recorder = Recorder()
+    started = time.perf_counter()
+    recorder.call(files_md5, files['hash'], max_workers=args.concurrency)
+    recorder.bytes = len(files['hash']) * args.upload_size
+    return recorder.result('hash_files_parallel', len(files['hash']), time.perf_counter() - started)
+
+
+@benchmark('hash_files_cached')
+def bench_hash_files_cached(args, files):
+    recorder = Recorder()
+    with tempfile.TemporaryDirectory() as directory:
+        cache = HashCache(os.path.join(directory, 'hashes.db'))
+        files_md5(files['hash'], cache=cache)
+        started = time.perf_counter()
+        for _ in range(args.hashes):
+            recorder.call(files_md5, files['hash'], cache=cache)
+        seconds = time.perf_counter() - started
+        cache.close()
+    return recorder.result('hash_files_cached', args.hashes * len(files['hash']), seconds)
+
+
+def _import_seconds(statement: str) -> float:
+    # 在新的解释器中计时，模块缓存不影响结果
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    return float(subprocess.run([sys.executable, '-c', code], env=env, check=True, capture_output=True, text=True).stdout)
+
+
+@benchmark('import')
+def bench_import(args, files):
+    recorder = Recorder()
+    for _ in range(args.imports):
+        recorder.latencies.append(_import_seconds('import vjmap_py_client'))
+    return recorder.result('import', args.imports, sum(recorder.latencies))
+
+
+@benchmark('import_client')
+def bench_import_client(args, files):
+    recorder = Recorder()
+    for _ in range(args.imports):
+        recorder.latencies.append(_import_seconds('from vjmap_py_client import VjmapClient'))
+    return recorder.result('import_client', args.imports, sum(recorder.latencies))
+
+
+@benchmark('build_parameters')
+def bench_build_parameters(args, files):
+    recorder = Recorder()
+
+    def build(i):
+        return RectQueryParameter(i, i, i + 1, i + 1, condition="name='AcDbLine'", limit=100).to_dict()
+
+    started = time.perf_counter()
+    for i in range(args.builds):
+        recorder.call(build, i)
+    return recorder.result('build_parameters', args.builds, time.perf_counter() - started)
+
+
+def _make_files(directory: str, args) -> dict:
+    block = os.urandom(min(args.upload_size, 1048576)) or b'\0'
+
+    def write(path):
+        with open(path, 'wb') as f:
+            remaining = args.upload_size
+            while remaining > 0:
+                f.write(block[:remaining])
+                remaining -= len(block)
+        return path
+
+    return {
+        'upload': write(os.path.join(directory, 'upload.dwg')),
+        'hash': [write(os.path.join(directory, f'hash{i}.dwg')) for i in range(args.hash_files)],
+    }
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """
+    The regressions of results against a baseline output: throughput lower, or p99 latency higher,
+    by more than tolerance.
+    """
+    previous = dict((r['name'], r) for r in baseline.get('results', []))
+    regressions = []
+    for result in results:
+        old = previous.get(result['name'])
+        if old is None:
+            continue
+        if old.get('ops_per_second') and result.get('ops_per_second') is not None and result['ops_per_second'] < old['ops_per_second'] * (1 - tolerance):
+            regressions.append(f"{result['name']}: {result['ops_per_second']} ops/s, baseline {old['ops_per_second']}")
+        if old.get('p99_ms') and result.get('p99_ms') is not None and result['p99_ms'] > old['p99_ms'] * (1 + tolerance):
+            regressions.append(f"{result['name']}: p99 {result['p99_ms']} ms, baseline {old['p99_ms']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='base url of a running server, defaults to a local mock server')
+    parser.add_argument('--only', nargs='*', choices=sorted(BENCHMARKS), help='benchmarks to run')
+    parser.add_argument('--latency', type=float, default=0.002, help='mock server latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='mock server maximum random extra latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of mock server responses failing with a 503')
+    parser.add_argument('--tile-size', type=int, default=16384, help='mock server bytes per tile')
+    parser.add_argument('--features', type=int, default=20000, help='mock server number of features')
+    parser.add_argument('--tiles', type=int, default=500, help='tiles per tile benchmark')
+    parser.add_argument('--pan-steps', type=int, default=30, help='viewport moves of the viewer benchmarks')
+    parser.add_argument('--think', type=float, default=0.05, help='seconds between viewport moves of the viewer benchmarks')
+    parser.add_argument('--requests', type=int, default=200, help='requests of the metadata benchmark')
+    parser.add_argument('--page-size', type=int, default=1000, help='features per queryFeatures page')
+    parser.add_argument('--uploads', type=int, default=5, help='uploads of the upload benchmark')
+    parser.add_argument('--upload-size', type=int, default=16777216, help='bytes per uploaded or hashed file')
+    parser.add_argument('--hashes', type=int, default=5, help='repetitions of the hashing benchmarks')
+    parser.add_argument('--hash-files', type=int, default=8, help='files of the parallel hashing benchmarks')
+    parser.add_argument('--imports', type=int, default=10, help='interpreters started by the import benchmarks')
+    parser.add_argument('--builds', type=int, default=100000, help='query parameters built by the build_parameters benchmark')
+    parser.add_argument('--concurrency', type=int, default=8, help='workers of the concurrent benchmarks')
+    parser.add_argument('--retries', type=int, default=3, help='retries of failed idempotent requests')
+    parser.add_argument('--no-warmup', dest='warmup', action='store_false', help='skip the unmeasured first run of each benchmark')
+    parser.add_argument('--output', help='file the JSON results are written to, defaults to stdout')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='relative change reported as a regression')
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.url is None:
+        server = MockVjmapServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                 tile_size=args.tile_size, feature_count=args.features).start()
+        args.url = f'{server.url}/server/api/v1'
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            files = _make_files(directory, args)
+            for name in args.only or BENCHMARKS:
+                if args.warmup:
+                    # 预热连接、文件缓存与模拟服务端的分页缓存
+                    BENCHMARKS[name](args, files)
+                result = BENCHMARKS[name](args, files)
+                if result is not None:
+                    results.append(result)
+                    print(f"{name}: {result['ops_per_second']} ops/s, p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, "
+                          f"{result['errors']} errors", file=sys.stderr)
+    finally:
+        if server is not None:
+            server.stop()
+
+    output = {
+        'environment': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'config': dict((k, v) for k, v in vars(args).items() if k not in ('output', 'baseline')),
+        'results': results,
+    }
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
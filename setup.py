@@ -23,6 +23,16 @@ setup(
     install_requires=[
         "requests"
     ],
+    extras_require={
+        "async": ["httpx"],
+        "numpy": ["numpy"],
+        "arrow": ["pyarrow"],
+        "orjson": ["orjson"],
+        "msgspec": ["msgspec"],
+        "http2": ["httpx[http2]"],
+        "brotli": ["brotli"],
+        "test": ["pytest", "httpx"],
+    },
     keywords='vjmap cad python sdk client',
     include_package_data=True,
 )
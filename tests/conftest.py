@@ -0,0 +1,34 @@
+import pytest
+
+from benchmarks.mock_server import MockVjmapServer
+from vjmap_py_client import VjmapClient
+
+
+@pytest.fixture(scope='session')
+def _server():
+    server = MockVjmapServer(feature_count=250).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def server(_server):
+    # 各测试共用一个服务，但请求计数与故障率互不影响
+    _server.requests = 0
+    _server.error_rate = 0.0
+    _server.uploaded.clear()
+    _server.updates.clear()
+    yield _server
+    _server.error_rate = 0.0
+
+
+@pytest.fixture
+def base_url(server):
+    return server.url + '/server/api/v1'
+
+
+@pytest.fixture
+def client(base_url):
+    client = VjmapClient('token', base_url)
+    yield client
+    client.session.close()
@@ -0,0 +1,96 @@
+import asyncio
+import inspect
+import io
+
+import pytest
+
+from vjmap_py_client import VjmapClient, AsyncVjmapClient, ConditionQueryParameter, EntitySnapshot, FeatureColumns
+
+METHODS = sorted(name for name, value in vars(VjmapClient).items() if inspect.isfunction(value) and not name.startswith('_'))
+
+
+@pytest.mark.parametrize('name', METHODS)
+def test_every_method_has_an_async_version(name):
+    method = getattr(AsyncVjmapClient, name, None)
+    assert method is not None, f"AsyncVjmapClient.{name} is missing"
+    assert inspect.iscoroutinefunction(method) or inspect.isasyncgenfunction(method)
+    sync_parameters = inspect.signature(getattr(VjmapClient, name)).parameters
+    async_parameters = inspect.signature(method).parameters
+    assert list(async_parameters) == list(sync_parameters)
+    assert [p.default for p in async_parameters.values()] == [p.default for p in sync_parameters.values()]
+
+
+def _run(base_url, call):
+    async def main():
+        async with AsyncVjmapClient('token', base_url) as client:
+            return await call(client)
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize('name, args', [
+    ('open_map', ('m',)),
+    ('get_data_bounds', ('m', 'v1')),
+    ('get_metadata', ('m', 'v1')),
+    ('list_maps', ('m', 'v1')),
+    ('update_map', ('m', [{"objectid": "1"}])),
+    ('close_map', ('m', 'v1')),
+])
+def test_same_results(client, base_url, name, args):
+    assert _run(base_url, lambda c: getattr(c, name)(*args)) == getattr(client, name)(*args)
+
+
+def test_same_tiles(client, base_url, tmp_path):
+    expected = client.get_map_tile('m', 'v1', 'style', 3, 1, 2, 'file').content
+    assert _run(base_url, lambda c: c.get_map_tile('m', 'v1', 'style', 3, 1, 2, 'file')).content == expected
+
+    buffer = bytearray(len(expected))
+    _run(base_url, lambda c: c.get_map_tile('m', 'v1', 'style', 3, 1, 2, 'file', destination=buffer, chunk_size=1000))
+    assert buffer == expected
+    path = tmp_path / 'thumbnail.png'
+    _run(base_url, lambda c: c.get_thumbnail('m', 'v1', destination=str(path)))
+    assert path.read_bytes() == client.get_thumbnail('m', 'v1').content
+    with pytest.raises(ValueError):
+        _run(base_url, lambda c: c.get_map_tile('m', 'v1', 'style', 3, 1, 2, 'file', destination=bytearray(10)))
+
+
+def test_same_queries(client, base_url):
+    parameters = ConditionQueryParameter(condition="", limit=100)
+    expected = client.query_features('m', 'v1', parameters)
+    assert _run(base_url, lambda c: c.query_features('m', 'v1', parameters)) == expected
+
+    columns = _run(base_url, lambda c: c.query_features('m', 'v1', parameters, columnar=True))
+    assert isinstance(columns, FeatureColumns)
+    assert len(columns) == len(client.query_features('m', 'v1', parameters, columnar=True))
+
+    async def stream(c):
+        features = await c.stream_features('m', 'v1', parameters, chunk_size=100)
+        return [feature async for feature in features]
+    assert _run(base_url, stream) == expected["result"]
+
+
+def test_same_point_queries(client, base_url):
+    points = [(10.5, 10.5), (11.5, 11.5), (500.5, 500.5), (5000.0, 5000.0)]
+    for options in ({}, {"tolerance": 1.0, "cluster_size": 50.0}):
+        expected = client.query_points('m', 'v1', points, **options)
+        assert _run(base_url, lambda c: c.query_points('m', 'v1', points, **options)) == expected
+
+
+def test_same_batched_updates(client, base_url):
+    entities = [{"objectid": str(i), "value": i} for i in range(50)]
+    expected = client.update_map_batched('m', entities, max_chunk_entities=7, snapshot=EntitySnapshot())
+    snapshot = EntitySnapshot()
+    result = _run(base_url, lambda c: c.update_map_batched('m', entities, max_chunk_entities=7, concurrency=3, snapshot=snapshot))
+    assert (result.chunks, result.submitted, result.skipped) == (expected.chunks, expected.submitted, expected.skipped)
+    again = _run(base_url, lambda c: c.update_map_batched('m', entities, snapshot=snapshot))
+    assert (again.chunks, again.submitted, again.skipped) == (0, 0, 50)
+
+
+def test_same_uploads(server, client, base_url):
+    content = b'dwg' * 100000
+    expected = client.upload_map_file_object(io.BytesIO(content), chunk_size=65536)
+    result = _run(base_url, lambda c: c.upload_map_file_object(io.BytesIO(content), chunk_size=65536))
+    assert result == expected
+    requests = server.requests
+    skipped = _run(base_url, lambda c: c.upload_map_file_object(io.BytesIO(content), skip_uploaded=True))
+    assert skipped["fileid"] == expected["fileid"]
+    assert server.requests == requests + 1
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from vjmap_py_client import EntitySnapshot
+from vjmap_py_client.batch import encode_chunks
+from vjmap_py_client.exceptions import VjmapError
+
+
+def _entities(count, size=10):
+    return [{"objectid": str(i), "name": "x" * size} for i in range(count)]
+
+
+def test_each_chunk_is_its_own_update(server, client):
+    entities = _entities(50)
+    result = client.update_map_batched('m', entities, max_chunk_entities=7)
+    assert (result.chunks, result.submitted, result.skipped) == (8, 50, 0)
+    assert len(result.responses) == 8
+    # 每块单独提交，服务端收到的实体依次累加
+    assert [len(chunk) for _, chunk in server.updates] == [7] * 7 + [1]
+    assert [entity for _, chunk in server.updates for entity in chunk] == entities
+    assert {map_id for map_id, _ in server.updates} == {'m'}
+
+
+def test_concurrent_chunks_submit_every_entity_once(server, client):
+    entities = _entities(100)
+    result = client.update_map_batched('m', entities, max_chunk_entities=10, concurrency=4)
+    assert (result.chunks, result.submitted) == (10, 100)
+    submitted = [entity["objectid"] for _, chunk in server.updates for entity in chunk]
+    assert sorted(submitted) == sorted(entity["objectid"] for entity in entities)
+
+
+def test_chunks_respect_max_bytes():
+    entities = _entities(40, size=100) + [{"objectid": "big", "name": "y" * 5000}]
+    chunks = list(encode_chunks(entities, json.dumps, max_bytes=1000))
+    for file_data, pieces in chunks:
+        assert json.loads(file_data)["entities"] == [json.loads(encoded) for _, encoded in pieces]
+        assert len(file_data) <= 1000 or len(pieces) == 1
+    assert sum(len(pieces) for _, pieces in chunks) == len(entities)
+
+
+def test_snapshot_resumes_after_a_failed_chunk(server, client):
+    entities = _entities(30)
+    snapshot = EntitySnapshot()
+    request = client._request
+    calls = []
+
+    def fail_third(method, endpoint, **kwargs):
+        calls.append(endpoint)
+        if len(calls) == 3:
+            raise VjmapError("injected")
+        return request(method, endpoint, **kwargs)
+
+    client._request = fail_third
+    with pytest.raises(VjmapError):
+        client.update_map_batched('m', entities, max_chunk_entities=5, snapshot=snapshot)
+    assert len(snapshot) == 10
+    client._request = request
+    result = client.update_map_batched('m', entities, max_chunk_entities=5, snapshot=snapshot)
+    assert (result.submitted, result.skipped) == (20, 10)
+    assert sorted(e["objectid"] for _, chunk in server.updates for e in chunk) == sorted(e["objectid"] for e in entities)
+
+
+def test_snapshot_skips_unchanged_entities(tmp_path, client):
+    entities = _entities(10)
+    snapshot = EntitySnapshot()
+    client.update_map_batched('m', entities, snapshot=snapshot)
+    path = str(tmp_path / 'snapshot.json')
+    snapshot.save(path)
+    snapshot = EntitySnapshot.load(path)
+    entities[3] = dict(entities[3], name="changed")
+    result = client.update_map_batched('m', entities + [{"name": "no objectid"}], snapshot=snapshot)
+    assert (result.submitted, result.skipped) == (2, 9)
+    assert snapshot.removed(entities[1:]) == ['0']
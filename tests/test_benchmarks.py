@@ -0,0 +1,24 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('command', [
+    [os.path.join(ROOT, 'benchmarks', 'run.py')],
+    ['-m', 'benchmarks.run'],
+])
+def test_benchmarks_run_as_script_or_module(tmp_path, command):
+    # 以脚本运行时工作目录不在仓库根目录下
+    cwd = ROOT if command[0] == '-m' else str(tmp_path)
+    env = dict(os.environ)
+    env.pop('PYTHONPATH', None)
+    result = subprocess.run([sys.executable] + command + ['--only', 'build_parameters'], cwd=cwd, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    results = json.loads(result.stdout[result.stdout.index('{'):])["results"]
+    assert [r["name"] for r in results] == ['build_parameters']
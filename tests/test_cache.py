@@ -0,0 +1,135 @@
+import sqlite3
+
+import pytest
+
+from vjmap_py_client import VjmapClient, ResponseCache, MemoryCache, SQLiteCache, TileCache, ConditionQueryParameter
+from vjmap_py_client.cache import TileKey
+
+
+@pytest.fixture(params=[MemoryCache, SQLiteCache])
+def cached_client(request, base_url):
+    return VjmapClient('token', base_url, response_cache=ResponseCache(request.param(), ttl=60))
+
+
+def test_responses_are_cached(server, cached_client):
+    first = cached_client.get_metadata('m', 'v1')
+    requests = server.requests
+    assert cached_client.get_metadata('m', 'v1') == first
+    assert server.requests == requests
+    # 参数不同的请求分别缓存
+    cached_client.get_metadata('m', 'v1', geom=True)
+    assert server.requests == requests + 1
+
+
+@pytest.mark.parametrize('mutate', [
+    lambda client: client.update_metadata('m', 'v1', {"title": "changed"}),
+    lambda client: client.update_map('m', [{"objectid": "1"}]),
+    lambda client: client.switch_layers('m', 'v1', ['layer0']),
+    lambda client: client.delete_map('m', 'v1'),
+])
+def test_mutations_invalidate_the_map(server, cached_client, mutate):
+    parameters = ConditionQueryParameter(condition="", limit=10)
+    cached_client.get_metadata('m', 'v1')
+    cached_client.query_features('m', 'v1', parameters)
+    cached_client.get_metadata('other', 'v1')
+    mutate(cached_client)
+    requests = server.requests
+    cached_client.get_metadata('m', 'v1')
+    cached_client.query_features('m', 'v1', parameters)
+    assert server.requests == requests + 2
+    # 其他地图的缓存不受影响
+    cached_client.get_metadata('other', 'v1')
+    assert server.requests == requests + 2
+
+
+def test_failed_mutation_keeps_the_cache(server, cached_client):
+    cached_client.get_metadata('m', 'v1')
+    server.error_rate = 1.0
+    with pytest.raises(Exception):
+        cached_client.update_metadata('m', 'v1', {})
+    server.error_rate = 0.0
+    requests = server.requests
+    cached_client.get_metadata('m', 'v1')
+    assert server.requests == requests
+
+
+def test_ttl_expiry():
+    cache = MemoryCache()
+    cache.set('key', b'value', ttl=-1)
+    assert cache.get('key') is None
+    cache.set('key', b'value', ttl=60, tags=['map:m'])
+    assert cache.get('key') == b'value'
+    cache.invalidate('map:m')
+    assert cache.get('key') is None
+
+
+def _key(z=1, x=0, y=0, tile_format='raster', version='v1'):
+    return TileKey('m', version, 'style', z, x, y, 'file', tile_format)
+
+
+def test_pinned_tiles_are_served_from_the_cache(server, base_url):
+    client = VjmapClient('token', base_url, tile_cache=TileCache())
+    first = client.get_map_tile('m', 'v1', 'style', 3, 1, 2, 'file').content
+    assert client.get_map_tile('m', 'v1', 'style', 3, 1, 2, 'file').content == first
+    assert server.requests == 1
+
+
+def test_unpinned_tiles_are_revalidated(server, base_url):
+    cache = TileCache()
+    client = VjmapClient('token', base_url, tile_cache=cache)
+    client.get_map_tile('m', '_', 'style', 3, 1, 2, 'file')
+    key, = [TileKey(*row) for row in cache._conn.execute(
+        'SELECT map_id, version, stylename, z, x, y, fileid, format FROM tile_cache')]
+    cached = cache.get(key)
+    # 替换缓存内容但保留 ETag，服务端返回 304 时使用缓存的内容
+    cache.put(key, b'cached', cached.content_type, cached.etag)
+    fetched_at = cache.get(key).fetched_at
+    assert client.get_map_tile('m', '_', 'style', 3, 1, 2, 'file').content == b'cached'
+    assert server.requests == 2
+    assert cache.get(key).fetched_at >= fetched_at
+
+
+def test_tile_cache_evicts_the_least_recently_used():
+    cache = TileCache(max_bytes=300)
+    for x in range(3):
+        cache.put(_key(x=x), bytes(100))
+    cache.get(_key(x=0))
+    cache.put(_key(x=3), bytes(100))
+    assert cache.get(_key(x=1)) is None
+    assert [cache.get(_key(x=x)) is not None for x in (0, 2, 3)] == [True, True, True]
+    assert cache.size == 300
+    cache.put(_key(x=4), bytes(250))
+    assert cache.size <= 300
+    assert cache.get(_key(x=4)) is not None
+
+
+def _format(path):
+    with sqlite3.connect(path) as conn:
+        row = conn.execute("SELECT value FROM metadata WHERE name='format'").fetchone()
+    return row[0] if row else None
+
+
+@pytest.mark.parametrize('tile_format, expected', [('raster', 'png'), ('mvt', 'pbf')])
+def test_mbtiles_format(tmp_path, tile_format, expected):
+    path = str(tmp_path / 'tiles.mbtiles')
+    cache = TileCache(path)
+    assert _format(path) is None
+    cache.put(_key(tile_format=tile_format), b'tile')
+    assert _format(path) == expected
+    cache.close()
+    # 重新打开时按已缓存的瓦片确定 format
+    TileCache(path).close()
+    assert _format(path) == expected
+
+
+def test_mbtiles_format_of_mixed_caches(tmp_path):
+    path = str(tmp_path / 'tiles.mbtiles')
+    cache = TileCache(path)
+    cache.put(_key(tile_format='mvt'), b'tile')
+    cache.put(_key(tile_format='raster'), b'tile')
+    assert _format(path) is None
+    cache.put(_key(tile_format='mvt'), b'tile')
+    assert _format(path) is None
+    cache.close()
+    TileCache(path).close()
+    assert _format(path) is None
@@ -0,0 +1,47 @@
+import json
+import math
+import sys
+
+import pytest
+
+from vjmap_py_client.codec import get_decoder, get_encoder
+
+DOCUMENT = b'{"code": 0, "result": [{"objectid": "1A", "name": "\\u4e2d\\u6587", "bounds": [1.5, -2, 3e10, 4]}], "big": 12345678901234567890}'
+NON_FINITE = b'{"a": NaN, "b": Infinity, "c": -Infinity}'
+
+
+@pytest.mark.parametrize('name', ['auto', 'orjson', 'msgspec', 'json'])
+def test_decoders_agree_with_the_standard_library(name):
+    assert get_decoder(name)(DOCUMENT) == json.loads(DOCUMENT)
+
+
+@pytest.mark.parametrize('missing', [[], ['orjson'], ['orjson', 'msgspec']])
+def test_auto_decoder_accepts_what_json_accepts(monkeypatch, missing):
+    for module in missing:
+        monkeypatch.setitem(sys.modules, module, None)
+    decode = get_decoder('auto')
+    decoded = decode(NON_FINITE)
+    assert math.isnan(decoded["a"]) and decoded["b"] == math.inf and decoded["c"] == -math.inf
+    assert decode(DOCUMENT) == json.loads(DOCUMENT)
+    with pytest.raises(ValueError):
+        decode(b'{"a": ')
+
+
+@pytest.mark.parametrize('name', ['orjson', 'msgspec'])
+def test_explicit_fast_decoders_reject_non_finite_numbers(name):
+    with pytest.raises(ValueError):
+        get_decoder(name)(NON_FINITE)
+
+
+@pytest.mark.parametrize('name', ['auto', 'orjson', 'msgspec', 'json'])
+def test_encoders_round_trip(name):
+    value = json.loads(DOCUMENT)
+    value.pop("big")
+    assert json.loads(get_encoder(name)(value)) == value
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        get_decoder('yaml')
+    with pytest.raises(ValueError):
+        get_encoder('yaml')
@@ -0,0 +1,62 @@
+import math
+
+import numpy as np
+import pyarrow.parquet as pq
+
+from vjmap_py_client import ConditionQueryParameter, FeatureColumns
+
+FEATURES = [
+    {"objectid": "1", "name": "AcDbLine", "layername": "0", "bounds": "[0,0,2,2]",
+     "geom": {"type": "LineString", "coordinates": [[0, 0], [2, 2]]}},
+    {"objectid": "2", "name": "AcDbPolyline", "layername": "walls", "bounds": [1, 1, 3, 4],
+     "geom": {"type": "GeometryCollection", "geometries": [{"type": "Polygon", "coordinates": [[[1, 1], [3, 1], [3, 4]]]}]}},
+    {"objectid": "3", "name": "AcDbText"},
+]
+
+
+def test_from_features():
+    columns = FeatureColumns.from_features(FEATURES)
+    assert len(columns) == 3
+    assert columns.objectids == ["1", "2", "3"]
+    assert columns.layernames == ["0", "walls", None]
+    assert list(columns.bounds[:8]) == [0, 0, 2, 2, 1, 1, 3, 4]
+    # 没有范围的实体为 NaN，没有几何的实体坐标为空
+    assert all(math.isnan(value) for value in columns.bounds[8:])
+    assert list(columns.offsets) == [0, 2, 5, 5]
+    assert list(columns.coords[4:10]) == [1, 1, 3, 1, 3, 4]
+
+
+def test_to_numpy_shares_the_buffers():
+    columns = FeatureColumns.from_features(FEATURES)
+    arrays = columns.to_numpy()
+    assert arrays["bounds"].shape == (3, 4)
+    assert arrays["coords"].shape == (5, 2)
+    assert arrays["offsets"].tolist() == [0, 2, 5, 5]
+    assert arrays["objectid"].tolist() == ["1", "2", "3"]
+    assert np.shares_memory(arrays["coords"], np.frombuffer(columns.coords, dtype=np.float64))
+
+
+def test_to_arrow_and_parquet(tmp_path):
+    columns = FeatureColumns.from_features(FEATURES)
+    table = columns.to_arrow()
+    assert table.column_names == ["objectid", "name", "layername", "x1", "y1", "x2", "y2", "coords"]
+    assert table.column("x2").to_pylist()[:2] == [2, 3]
+    assert table.column("y2").to_pylist()[:2] == [2, 4]
+    assert table.column("coords").to_pylist()[1] == [[1, 1], [3, 1], [3, 4]]
+    assert table.column("coords").to_pylist()[2] == []
+    path = str(tmp_path / "features.parquet")
+    columns.to_parquet(path)
+    written = pq.read_table(path)
+    assert written.column("objectid").to_pylist() == ["1", "2", "3"]
+    assert written.column("coords").to_pylist() == table.column("coords").to_pylist()
+
+
+def test_query_features_columnar(client):
+    parameters = ConditionQueryParameter(condition="", limit=100)
+    result = client.query_features('m', 'v1', parameters)["result"]
+    columns = client.query_features('m', 'v1', parameters, columnar=True)
+    assert isinstance(columns, FeatureColumns)
+    assert columns.objectids == [feature["objectid"] for feature in result]
+    # 模拟服务的每个实体是一条两点的直线
+    assert list(columns.offsets) == list(range(0, 2 * len(result) + 1, 2))
+    assert columns.to_numpy()["bounds"][1].tolist() == [400, 400, 800, 800]
@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from vjmap_py_client import FanOut
+from vjmap_py_client.exceptions import VjmapTimeoutError
+
+TARGETS = [(f'map{i}', 'v1') for i in range(10)]
+
+
+def test_client_method_on_every_target(server, client):
+    values, errors = FanOut(client, workers=4).collect(TARGETS, 'get_data_bounds')
+    assert errors == {}
+    assert sorted(values) == sorted(TARGETS)
+    assert server.requests == len(TARGETS)
+
+
+def test_failures_are_collected_per_target(client):
+    def operation(client, map_id, version):
+        if map_id in ('map3', 'map7'):
+            raise ValueError(map_id)
+        return map_id
+
+    values, errors = FanOut(client).collect(TARGETS, operation)
+    assert sorted(errors) == [('map3', 'v1'), ('map7', 'v1')]
+    assert values[('map0', 'v1')] == 'map0'
+    with pytest.raises(ValueError):
+        list(FanOut(client, raise_errors=True).run(TARGETS, operation))
+
+
+def test_ordered_results(client):
+    def operation(client, map_id, version):
+        # 靠前的目标完成得更晚
+        time.sleep(0.002 * (10 - int(map_id[3:])))
+        return map_id
+
+    results = list(FanOut(client, workers=10).run(TARGETS, operation, ordered=True))
+    assert [r.map_id for r in results] == [map_id for map_id, _ in TARGETS]
+    assert [r.index for r in results] == list(range(10))
+
+
+def test_slow_targets_time_out(client):
+    release = threading.Event()
+
+    def operation(client, map_id, version):
+        if map_id == 'map2':
+            release.wait(5)
+        return map_id
+
+    started = time.monotonic()
+    try:
+        results = list(FanOut(client, workers=4, timeout=0.1).run(TARGETS, operation, ordered=True))
+    finally:
+        release.set()
+    assert time.monotonic() - started < 2
+    assert isinstance(results[2].error, VjmapTimeoutError)
+    assert results[2].elapsed >= 0.1
+    assert all(r.ok for i, r in enumerate(results) if i != 2)
+
+
+def test_timeout_is_passed_to_client_methods(server, client):
+    server.latency = 0.3
+    try:
+        values, errors = FanOut(client, workers=2, timeout=0.05).collect(TARGETS[:2], 'get_data_bounds')
+    finally:
+        server.latency = 0.0
+    assert values == {}
+    assert all(isinstance(error, VjmapTimeoutError) for error in errors.values())
+
+
+def test_targets_are_consumed_lazily(client):
+    consumed = []
+
+    def targets():
+        for target in TARGETS:
+            consumed.append(target)
+            yield target
+
+    results = FanOut(client, workers=2).run(targets(), lambda client, map_id, version: map_id)
+    next(results)
+    # 最多提前调度 2 * workers 个目标
+    assert len(consumed) <= 5
+    assert len(list(results)) == len(TARGETS) - 1
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import vjmap_py_client
+
+OPTIONAL = ['httpx', 'h2', 'numpy', 'pyarrow', 'orjson', 'msgspec', 'redis', 'opentelemetry', 'brotli']
+
+
+def _run(code: str):
+    return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=os.path.dirname(vjmap_py_client.__path__[0]))
+
+
+@pytest.mark.parametrize('module', OPTIONAL)
+def test_star_import_without_optional_dependency(module):
+    # sys.modules 中为 None 的模块导入时抛出 ImportError，模拟未安装
+    result = _run(f"import sys; sys.modules[{module!r}] = None\nfrom vjmap_py_client import *\nprint(VjmapClient.__name__)")
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == 'VjmapClient'
+
+
+def test_async_client_without_httpx():
+    result = _run("import sys; sys.modules['httpx'] = None\nimport vjmap_py_client\nvjmap_py_client.AsyncVjmapClient")
+    assert 'httpx' in result.stderr
+
+
+def test_every_name_resolves():
+    for name in vjmap_py_client.__all__ + ['AsyncVjmapClient']:
+        assert getattr(vjmap_py_client, name) is not None
+    assert 'AsyncVjmapClient' in dir(vjmap_py_client)
@@ -0,0 +1,94 @@
+import pytest
+
+from vjmap_py_client import (VjmapClient, ClientMetrics, OpenTelemetryExporter, RetryPolicy, ResponseCache, MemoryCache, TileCache,
+                             ConditionQueryParameter)
+from vjmap_py_client.exceptions import VjmapServerError
+from vjmap_py_client.metrics import Histogram, PHASES, endpoint_name
+
+
+@pytest.fixture
+def metrics():
+    return ClientMetrics()
+
+
+def test_endpoint_names():
+    assert endpoint_name('/map/cmd/queryFeatures/m/v1') == 'queryFeatures'
+    assert endpoint_name('/map/tile/m/v1/style/1/2/3') == 'tile'
+    assert endpoint_name('map/openmap/m') == 'openmap'
+    assert endpoint_name('/other') == 'other'
+
+
+def test_histogram_quantiles():
+    histogram = Histogram((0.1, 1.0))
+    assert histogram.quantile(0.5) is None
+    for value in (0.05, 0.05, 0.5, 5.0):
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1]
+    assert (histogram.quantile(0.5), histogram.quantile(0.75), histogram.quantile(1.0)) == (0.1, 1.0, float('inf'))
+    assert histogram.sum == pytest.approx(5.6)
+
+
+def test_requests_are_recorded(server, base_url, metrics):
+    records = []
+    metrics.exporters.append(records.append)
+    client = VjmapClient('token', base_url, metrics=metrics)
+    client.get_data_bounds('m', 'v1')
+    client.query_features('m', 'v1', ConditionQueryParameter(condition="", limit=10))
+    assert [record.name for record in records] == ['getDataBounds', 'queryFeatures']
+    record = records[1]
+    assert (record.method, record.status_code, record.error) == ('POST', 200, None)
+    assert record.request_bytes > 0 and record.response_bytes > 0
+    assert record.total >= record.connect + record.ttfb
+    for phase in PHASES:
+        assert metrics.histogram('queryFeatures', phase).count == 1
+    assert metrics.requests[('getDataBounds', 'GET', '200')] == 1
+    assert metrics.response_bytes['queryFeatures'] == record.response_bytes
+
+
+def test_retries_and_errors_are_recorded(server, base_url, metrics):
+    server.error_rate = 1.0
+    client = VjmapClient('token', base_url, metrics=metrics, retry=RetryPolicy(max_retries=2, backoff_base=0.0))
+    with pytest.raises(VjmapServerError):
+        client.get_data_bounds('m', 'v1')
+    assert metrics.retries == {'getDataBounds': 2}
+    assert metrics.requests == {('getDataBounds', 'GET', 'VjmapServerError'): 1}
+
+
+def test_cache_hits_and_misses(server, base_url, metrics):
+    client = VjmapClient('token', base_url, metrics=metrics, tile_cache=TileCache(), response_cache=ResponseCache(MemoryCache(), ttl=60))
+    for _ in range(2):
+        client.get_metadata('m', 'v1')
+        client.get_map_tile('m', 'v1', 'style', 3, 1, 2, 'file')
+        # v1 为固定版本，缓存的瓦片不再请求服务，latest 的瓦片需要向服务确认
+        client.get_map_tile('m', 'latest', 'style', 3, 1, 2, 'file')
+    # 服务返回 304 时也计为命中
+    assert metrics.cache_hits == {'response': 1, 'tile': 2}
+    assert metrics.cache_misses == {'response': 1, 'tile': 2}
+    assert metrics.requests == {('metadata', 'GET', '200'): 1, ('tile', 'GET', '200'): 2, ('tile', 'GET', '304'): 1}
+
+
+def test_prometheus_format(server, base_url, metrics):
+    client = VjmapClient('token', base_url, metrics=metrics)
+    client.get_data_bounds('m', 'v1')
+    metrics.cache_hit('tile')
+    text = metrics.prometheus()
+    assert '# TYPE vjmap_request_duration_seconds histogram' in text
+    assert 'vjmap_request_duration_seconds_bucket{endpoint="getDataBounds",phase="total",le="+Inf"} 1' in text
+    assert 'vjmap_requests_total{endpoint="getDataBounds",method="GET",status="200"} 1' in text
+    assert 'vjmap_cache_hits_total{cache="tile"} 1' in text
+    assert text.endswith('\n')
+
+
+def test_opentelemetry_spans(base_url):
+    pytest.importorskip('opentelemetry.sdk')
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    spans = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(spans))
+    metrics = ClientMetrics([OpenTelemetryExporter(provider.get_tracer('test'))])
+    VjmapClient('token', base_url, metrics=metrics).get_data_bounds('m', 'v1')
+    span, = spans.get_finished_spans()
+    assert span.name == 'vjmap getDataBounds'
+    assert span.attributes['http.response.status_code'] == 200
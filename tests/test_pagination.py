@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from vjmap_py_client import AsyncVjmapClient, ConditionQueryParameter, ExprQueryParameter, PointQueryParameter, RectQueryParameter
+from vjmap_py_client.exceptions import VjmapError
+
+
+@pytest.mark.parametrize('prefetch', [True, False])
+@pytest.mark.parametrize('page_size', [1, 50, 125, 249, 250, 1000])
+def test_iter_features_returns_every_feature_once(server, client, prefetch, page_size):
+    parameters = ConditionQueryParameter(condition="")
+    features = list(client.iter_features('m', 'v1', parameters, page_size=page_size, prefetch=prefetch))
+    assert [f["objectid"] for f in features] == [f"{i:X}" for i in range(250)]
+    # 总数是页大小的整数倍时多请求一个空页
+    assert server.requests == 250 // page_size + 1
+
+
+def test_iter_features_starts_at_beginpos(client):
+    parameters = ExprQueryParameter(expr="", beginpos=240)
+    assert len(list(client.iter_features('m', 'v1', parameters, page_size=3))) == 10
+
+
+@pytest.mark.parametrize('parameters', [PointQueryParameter(x=1, y=1), RectQueryParameter(x1=0, y1=0, x2=1, y2=1)])
+def test_iter_features_rejects_unpageable_queries(server, client, parameters):
+    with pytest.raises(TypeError):
+        next(client.iter_features('m', 'v1', parameters))
+    assert server.requests == 0
+
+
+def test_iter_features_stops_when_beginpos_is_ignored(client):
+    request = client._request
+
+    def ignore_beginpos(method, endpoint, json=None, **kwargs):
+        return request(method, endpoint, json=dict(json, beginpos=0), **kwargs)
+
+    client._request = ignore_beginpos
+    with pytest.raises(VjmapError):
+        list(client.iter_features('m', 'v1', ConditionQueryParameter(condition=""), page_size=100))
+
+
+def test_iter_features_stops_on_error(server, client):
+    features = client.iter_features('m', 'v1', ConditionQueryParameter(condition=""), page_size=100, prefetch=False)
+    next(features)
+    server.error_rate = 1.0
+    with pytest.raises(VjmapError):
+        list(features)
+
+
+@pytest.mark.parametrize('prefetch', [True, False])
+def test_async_iter_features(base_url, prefetch):
+    async def collect():
+        async with AsyncVjmapClient('token', base_url) as client:
+            parameters = ConditionQueryParameter(condition="")
+            features = [f async for f in client.iter_features('m', 'v1', parameters, page_size=100, prefetch=prefetch)]
+            with pytest.raises(TypeError):
+                [f async for f in client.iter_features('m', 'v1', RectQueryParameter(x1=0, y1=0, x2=1, y2=1))]
+            return features
+
+    assert len(asyncio.run(collect())) == 250
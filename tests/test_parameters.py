@@ -0,0 +1,37 @@
+import pickle
+
+from vjmap_py_client import RectQueryParameter, PointQueryParameter, ConditionQueryParameter, ExprQueryParameter
+
+
+def test_to_dict_skips_none():
+    parameters = RectQueryParameter(x1=0, y1=1, x2=2, y2=3, limit=10)
+    assert parameters.to_dict() == {
+        'zoom': 1, 'fields': '', 'useCache': False, 'maxReturnCount': 10,
+        'querytype': 'rect', 'x1': 0, 'y1': 1, 'x2': 2, 'y2': 3,
+    }
+    assert list(PointQueryParameter(x=1, y=2).to_dict())[-4:] == ['querytype', 'x', 'y', 'pixelsize']
+
+
+def test_undeclared_attributes_are_sent():
+    parameters = RectQueryParameter(x1=0, y1=0, x2=1, y2=1)
+    parameters.isContains = True
+    parameters.realgeom = None
+    d = parameters.to_dict()
+    assert d['isContains'] is True
+    assert 'realgeom' not in d
+    assert list(d)[-1] == 'isContains'
+
+
+def test_subclasses_keep_their_attributes():
+    class CustomQuery(ExprQueryParameter):
+        def __init__(self, expr, extra, **kwargs):
+            super().__init__(expr, **kwargs)
+            self.extra = extra
+
+    assert CustomQuery("gOutReturn(1)", extra=[1]).to_dict()['extra'] == [1]
+
+
+def test_parameters_pickle():
+    parameters = ConditionQueryParameter(condition="name='x'", bounds=(0, 0, 1, 1))
+    parameters.isContains = False
+    assert pickle.loads(pickle.dumps(parameters)).to_dict() == parameters.to_dict()
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from vjmap_py_client import VjmapClient, TileCache, TilePrefetcher, TokenBucket, iter_tiles
+
+BOUNDS = [0, 0, 1000, 1000]
+TILE_SIZE = 16384  # 模拟服务每个瓦片的字节数
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def cached_client(base_url):
+    client = VjmapClient('token', base_url, tile_cache=TileCache())
+    yield client
+    client.session.close()
+
+
+class _RecordingBucket(TokenBucket):
+
+    def __init__(self, rate, burst):
+        super().__init__(rate, burst)
+        self.acquired = []
+
+    def acquire(self, tokens=1.0):
+        self.acquired.append(tokens)
+        super().acquire(tokens)
+
+
+def test_requires_a_tile_cache(client):
+    with pytest.raises(ValueError):
+        TilePrefetcher(client)
+
+
+def test_neighbours_are_prefetched(server, cached_client):
+    with TilePrefetcher(cached_client, workers=2, radius=1, zoom_levels=0) as prefetcher:
+        prefetcher.get_tile('m', 'v1', 'style', 4, 5, 5, 'file')
+        _wait_until(lambda: prefetcher.stats.fetched == 8)
+        assert server.requests == 9
+        for x in (4, 5, 6):
+            prefetcher.get_tile('m', 'v1', 'style', 4, x, 4, 'file')
+        # 查看的三个瓦片都已预取过
+        assert prefetcher.stats.hits == 3
+        assert prefetcher.stats.hit_rate == 0.75
+    assert prefetcher.stats.bytes == prefetcher.stats.fetched * TILE_SIZE
+
+
+def test_seed_fetches_the_range(cached_client):
+    tiles = list(iter_tiles(BOUNDS, 0, 2))
+    with TilePrefetcher(cached_client, workers=3, max_queue=4) as prefetcher:
+        assert prefetcher.seed('m', 'v1', 'style', 'file', 0, 2, BOUNDS) == len(tiles)
+        _wait_until(lambda: prefetcher.stats.fetched == len(tiles))
+    assert prefetcher.stats.failed == 0
+    # 缓存中仍然有效的瓦片不再请求
+    with TilePrefetcher(cached_client, workers=3) as prefetcher:
+        prefetcher.seed('m', 'v1', 'style', 'file', 0, 2, BOUNDS)
+        _wait_until(lambda: prefetcher.stats.cached == len(tiles))
+        assert prefetcher.stats.fetched == 0
+
+
+def test_whole_tiles_are_charged_to_the_bandwidth(cached_client):
+    # 令牌桶容量小于瓦片大小时分段计入
+    with TilePrefetcher(cached_client, workers=1) as prefetcher:
+        prefetcher.budget = _RecordingBucket(1e9, 1000)
+        prefetcher.seed('m', 'v1', 'style', 'file', 0, 1, BOUNDS)
+        _wait_until(lambda: sum(prefetcher.budget.acquired) == prefetcher.stats.fetched * TILE_SIZE > 0)
+        assert max(prefetcher.budget.acquired) == 1000
+
+
+def test_bandwidth_limits_fetching(cached_client):
+    tiles = list(iter_tiles(BOUNDS, 0, 2))[:6]
+    with TilePrefetcher(cached_client, workers=1, bandwidth=4 * TILE_SIZE) as prefetcher:
+        start = time.monotonic()
+        prefetcher.seed('m', 'v1', 'style', 'file', 0, 2, BOUNDS)
+        _wait_until(lambda: prefetcher.stats.fetched >= len(tiles))
+        # 前四个瓦片用完初始容量，第五个瓦片取回后等待 0.25 秒才取下一个
+        assert time.monotonic() - start >= 0.2
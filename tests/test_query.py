@@ -0,0 +1,83 @@
+import pytest
+
+from vjmap_py_client import RectQueryEngine
+
+# 模拟服务的 250 个实体沿对角线排列，第 i 个的范围为 [400i, 400i, 400i + 400, 400i + 400]
+STEP = 400.0
+
+
+def _center(i):
+    return i * STEP + STEP / 2
+
+
+def _ids(features):
+    return [feature["objectid"] for feature in features]
+
+
+def test_query_points_sends_point_queries_by_default(server, client):
+    points = [(_center(0), _center(0)), (_center(1), _center(1)), (_center(1) + 0.5, _center(1)), (-5000.0, -5000.0)]
+    results = client.query_points('m', 'v1', points, tolerance=1.0)
+    assert [_ids(r) for r in results] == [['0'], ['1'], ['1'], []]
+    assert server.requests == len(points)
+
+
+def test_query_points_clusters_on_request(server, client):
+    points = [(_center(0), _center(0)), (_center(0) + 10, _center(0) + 10), (_center(1), _center(1)), (50000.5, 50000.5)]
+    results = client.query_points('m', 'v1', points, tolerance=1.0, cluster_size=1000.0)
+    # 前三个点在同一网格内共用一次矩形查询，最后一个点单独做点查询
+    assert server.requests == 2
+    assert [_ids(r) for r in results] == [['0'], ['0'], ['1'], []]
+
+
+def test_clusters_use_bounding_boxes(server, client):
+    # 点在实体 0 的范围内但远离其几何（对角线），点查询查不到，聚合查询按范围分配时会命中
+    points = [(STEP - 10, 10.0), (_center(0), _center(0))]
+    assert _ids(client.query_points('m', 'v1', points, tolerance=1.0)[0]) == []
+    assert _ids(client.query_points('m', 'v1', points, tolerance=1.0, cluster_size=1000.0)[0]) == ['0']
+
+
+def test_truncated_clusters_fall_back_to_point_queries(server, client):
+    points = [(_center(i), _center(i)) for i in range(3)]
+    results = client.query_points('m', 'v1', points, tolerance=1.0, cluster_size=10000.0, cluster_limit=2)
+    assert [_ids(r) for r in results] == [['0'], ['1'], ['2']]
+    assert server.requests == 1 + len(points)
+
+
+def test_clustering_requires_a_tolerance(client):
+    with pytest.raises(ValueError):
+        client.query_points('m', 'v1', [(0.0, 0.0)], cluster_size=100.0)
+    results = client.query_points('m', 'v1', [(0.0, 0.0)], query_options={"pixelToGeoLength": 0.2}, cluster_size=100.0)
+    assert results == [[]]
+
+
+def test_rect_query_engine_splits_full_cells(server, client):
+    engine = RectQueryEngine(client, workers=4, cell_limit=50)
+    result = engine.query('m', 'v1', bounds=[0, 0, 100000, 100000])
+    assert sorted(_ids(result["result"]), key=lambda key: int(key, 16)) == [f"{i:X}" for i in range(250)]
+    assert result["recordCount"] == 250
+    assert result["truncated"] == []
+    assert server.requests > 1
+
+
+def test_rect_query_engine_reports_truncated_cells(client):
+    engine = RectQueryEngine(client, cell_limit=50, max_depth=1)
+    result = engine.query('m', 'v1', bounds=[0, 0, 100000, 100000])
+    # 实体沿对角线分布，拆分一次后对角线上的两个单元仍然达到上限
+    assert sorted(result["truncated"]) == [(0, 0, 50000.0, 50000.0), (50000.0, 50000.0, 100000, 100000)]
+    assert result["recordCount"] == 100
+
+
+def test_rect_query_engine_merges_features():
+    shared = [{"objectid": "1"}, {"id": "2"}, {"name": "a", "bounds": "[0,0,1,1]"}, {"name": "a", "bounds": "[0,0,1,1]"}, {"name": "b"}]
+
+    class Engine(RectQueryEngine):
+        def _query_cell(self, map_id, version, data, **kwargs):
+            # 整个范围达到上限而被拆分，四个子单元返回相同的实体
+            if data["x2"] - data["x1"] == 100:
+                return [{"objectid": str(i)} for i in range(10)]
+            return [dict(feature) for feature in shared]
+
+    result = Engine(None, cell_limit=10).query('m', 'v1', bounds=[0, 0, 100, 100])
+    # 同一单元内内容相同、没有 objectid 的两个实体都保留，其他单元返回的副本被合并
+    assert result["result"] == shared
+    assert result["recordCount"] == 5
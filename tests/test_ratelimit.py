@@ -0,0 +1,106 @@
+import time
+
+import pytest
+import requests
+
+from vjmap_py_client import VjmapClient, AdaptiveLimiter, RequestLimiter, TokenBucket
+from vjmap_py_client.exceptions import VjmapRateLimitError, VjmapServerError
+from vjmap_py_client.ratelimit import endpoint_family
+
+
+def _saturate(limiter):
+    for _ in range(int(limiter.limit)):
+        limiter.acquire()
+
+
+def test_overload_decreases_the_limit_once_per_round_trip():
+    limiter = AdaptiveLimiter(initial=10, backoff=0.5)
+    _saturate(limiter)
+    limiter.release(0.01, overloaded=True)
+    assert limiter.limit == 5
+    # 同一往返周期内的其他过载响应不再减小上限
+    for _ in range(5):
+        limiter.release(0.01, overloaded=True)
+    assert limiter.limit == 5
+    limiter.acquire()
+    limiter.release(0.01, overloaded=True)
+    assert limiter.limit == 2.5
+
+
+def test_limit_never_drops_below_min_limit():
+    limiter = AdaptiveLimiter(initial=2, min_limit=2, backoff=0.1)
+    limiter.acquire()
+    limiter.release(overloaded=True)
+    assert limiter.limit == 2
+
+
+def test_success_grows_the_limit_only_when_saturated():
+    limiter = AdaptiveLimiter(initial=4, max_limit=5)
+    limiter.acquire()
+    limiter.release(0.01)
+    assert limiter.limit == 4
+    for _ in range(100):
+        _saturate(limiter)
+        for _ in range(int(limiter.limit)):
+            limiter.release(0.01)
+    assert limiter.limit == 5
+
+
+def test_latency_growth_is_treated_as_overload():
+    limiter = AdaptiveLimiter(initial=8, backoff=0.5, tolerance=2.0, smoothing=1.0)
+    limiter.acquire()
+    limiter.release(0.01)
+    limiter.acquire()
+    limiter.release(0.05)
+    assert limiter.limit == 4
+
+
+def _respond(client, status, headers=None):
+    # 不经过网络，直接返回给定状态码的响应
+    def request(method, url, **kwargs):
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers or {})
+        response._content = b'{"code": -1}'
+        response.url = url
+        return response
+
+    client.session.request = request
+
+
+@pytest.mark.parametrize('status, error', [(429, VjmapRateLimitError), (503, VjmapServerError)])
+def test_client_backs_off_on_overload(base_url, status, error):
+    limiter = RequestLimiter()
+    client = VjmapClient('token', base_url, limiter=limiter)
+    client.get_data_bounds('m', 'v1')
+    adaptive = limiter.concurrency['default']
+    limit = adaptive.limit
+    _respond(client, status, {'Retry-After': '0'})
+    with pytest.raises(error):
+        client.get_data_bounds('m', 'v1')
+    assert adaptive.limit == pytest.approx(limit * adaptive.backoff)
+    assert adaptive.in_flight == 0
+
+
+def test_families_are_limited_separately(base_url):
+    limiter = RequestLimiter(concurrency={'tile': AdaptiveLimiter(initial=2)}, adaptive=False)
+    client = VjmapClient('token', base_url, limiter=limiter)
+    client.get_map_tile('m', 'v1', 'style', 1, 0, 0, 'file')
+    client.get_data_bounds('m', 'v1')
+    assert list(limiter.concurrency) == ['tile']
+    assert endpoint_family('/map/cmd/queryFeatures/m/v1') == 'query'
+    assert endpoint_family('/map/uploads') == 'upload'
+    assert endpoint_family('/map/cmd/thumbnail/m/v1') == 'tile'
+
+
+def test_token_bucket_rate():
+    bucket = TokenBucket(rate=200, burst=1)
+    started = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    assert time.monotonic() - started >= 0.045
+
+
+def test_shared_limiter():
+    assert RequestLimiter.shared('test') is RequestLimiter.shared('test')
+    assert RequestLimiter.shared('test') is not RequestLimiter.shared('other')
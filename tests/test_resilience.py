@@ -0,0 +1,94 @@
+import time
+
+import pytest
+import requests
+
+from vjmap_py_client import VjmapClient, RetryPolicy, RetryBudget, CircuitBreaker
+from vjmap_py_client.exceptions import VjmapConnectionError, VjmapServerError, CircuitOpenError
+
+
+def _flaky(client, failures, error=requests.ConnectionError):
+    # 前 failures 次请求抛出异常，之后正常发送
+    send = client.session.request
+    calls = []
+
+    def request(*args, **kwargs):
+        calls.append(args)
+        if len(calls) <= failures:
+            raise error("injected")
+        return send(*args, **kwargs)
+
+    client.session.request = request
+    return calls
+
+
+def _retry(max_retries=3):
+    return RetryPolicy(max_retries=max_retries, backoff_base=0.0, budget=RetryBudget(max_tokens=100))
+
+
+def test_retry_recovers_from_transient_errors(base_url):
+    retry = _retry()
+    client = VjmapClient('token', base_url, retry=retry)
+    calls = _flaky(client, 2)
+    assert client.get_data_bounds('m', 'v1')["code"] == 0
+    assert len(calls) == 3
+    assert retry.retries == 2
+
+
+def test_retry_gives_up_after_max_retries(server, base_url):
+    client = VjmapClient('token', base_url, retry=_retry(max_retries=2))
+    server.error_rate = 1.0
+    with pytest.raises(VjmapServerError):
+        client.get_data_bounds('m', 'v1')
+    assert server.requests == 3
+
+
+def test_mutating_requests_are_not_retried(base_url):
+    client = VjmapClient('token', base_url, retry=_retry())
+    calls = _flaky(client, 1)
+    with pytest.raises(VjmapConnectionError):
+        client.update_metadata('m', 'v1', {})
+    assert len(calls) == 1
+
+
+def test_circuit_opens_and_recovers(server, base_url):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    client = VjmapClient('token', base_url, circuit_breaker=breaker)
+    server.error_rate = 1.0
+    for _ in range(2):
+        with pytest.raises(VjmapServerError):
+            client.get_data_bounds('m', 'v1')
+    requests_before = server.requests
+    with pytest.raises(CircuitOpenError):
+        client.get_data_bounds('m', 'v1')
+    assert server.requests == requests_before
+
+    server.error_rate = 0.0
+    time.sleep(0.06)
+    assert client.get_data_bounds('m', 'v1')["code"] == 0
+    assert breaker.state(client._host) == 'closed'
+
+
+@pytest.mark.parametrize('error', [requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError, RuntimeError])
+def test_failed_trial_reopens_the_circuit(base_url, error):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    client = VjmapClient('token', base_url, circuit_breaker=breaker)
+    _flaky(client, 2, error)
+    with pytest.raises(Exception):
+        client.get_data_bounds('m', 'v1')
+    assert breaker.state(client._host) == 'open'
+    time.sleep(0.06)
+    # 半开状态的试探请求失败后熔断器重新打开，而不是一直等待试探结果
+    with pytest.raises(Exception):
+        client.get_data_bounds('m', 'v1')
+    assert breaker.state(client._host) == 'open'
+    time.sleep(0.06)
+    assert client.get_data_bounds('m', 'v1')["code"] == 0
+    assert breaker.state(client._host) == 'closed'
+
+
+def test_request_errors_are_mapped(base_url):
+    client = VjmapClient('token', base_url)
+    _flaky(client, 1, requests.exceptions.ChunkedEncodingError)
+    with pytest.raises(VjmapConnectionError):
+        client.get_data_bounds('m', 'v1')
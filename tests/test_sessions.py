@@ -0,0 +1,123 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from vjmap_py_client import MapSessionPool, VjmapClient
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+class FakeClient(object):
+    # 记录 open_map 与 close_map 的调用，close_map 可以被阻塞
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+        self.close_allowed = threading.Event()
+        self.close_allowed.set()
+        self.open_error = None
+
+    def open_map(self, map_id, params=None):
+        with self.lock:
+            self.calls.append(('open', map_id))
+        time.sleep(0.01)
+        if self.open_error is not None:
+            raise self.open_error
+        return {"mapid": map_id, "version": "v1"}
+
+    def close_map(self, map_id, version):
+        self.close_allowed.wait(5)
+        with self.lock:
+            self.calls.append(('close', map_id))
+
+
+def test_maps_are_opened_once_and_reused():
+    client = FakeClient()
+    with MapSessionPool(client, ttl=None) as pool:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            def use(_):
+                with pool.session('a') as session:
+                    return session.version
+            assert list(executor.map(use, range(16))) == ['v1'] * 16
+        assert client.calls == [('open', 'a')]
+        assert (pool.opened, pool.reused) == (1, 15)
+    assert client.calls == [('open', 'a'), ('close', 'a')]
+
+
+def test_idle_maps_are_closed_after_ttl():
+    client = FakeClient()
+    with MapSessionPool(client, ttl=0.0) as pool:
+        with pool.session('a'):
+            pass
+        _wait_until(lambda: pool.closed == 1)
+        assert len(pool) == 0
+
+
+def test_least_recently_used_maps_are_closed_beyond_max_open():
+    client = FakeClient()
+    with MapSessionPool(client, ttl=None, max_open=1) as pool:
+        for map_id in ('a', 'b'):
+            with pool.session(map_id):
+                pass
+        _wait_until(lambda: pool.closed == 1)
+        assert client.calls[-1] == ('close', 'a')
+
+
+def test_reopening_a_map_waits_for_its_close():
+    client = FakeClient()
+    client.close_allowed.clear()
+    with MapSessionPool(client, ttl=0.0) as pool:
+        with pool.session('a'):
+            pass
+        _wait_until(lambda: any(s.closing for s in list(pool._sessions.values())))
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(pool.acquire, 'a')
+            time.sleep(0.05)
+            # 关闭完成前不会重新打开
+            assert not future.done()
+            assert client.calls == [('open', 'a')]
+            client.close_allowed.set()
+            session = future.result(timeout=5)
+        assert client.calls == [('open', 'a'), ('close', 'a'), ('open', 'a')]
+        assert not session.closing
+        pool.release(session)
+
+
+def test_open_errors_are_shared_and_not_cached():
+    client = FakeClient()
+    client.open_error = RuntimeError("cannot open")
+    with MapSessionPool(client, ttl=None) as pool:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(pool.acquire, 'a') for _ in range(4)]
+            for future in futures:
+                with pytest.raises(RuntimeError):
+                    future.result()
+        assert len(pool) == 0
+        client.open_error = None
+        with pool.session('a') as session:
+            assert session.info == {"mapid": "a", "version": "v1"}
+
+
+def test_prewarmed_maps_stay_open_until_close():
+    client = FakeClient()
+    pool = MapSessionPool(client, ttl=0.0, prewarm=[('a', None), ('b', None)])
+    assert sorted(client.calls) == [('open', 'a'), ('open', 'b')]
+    assert pool.evict(now=time.monotonic() + 3600) == 0
+    pool.close()
+    assert sorted(call for call in client.calls if call[0] == 'close') == [('close', 'a'), ('close', 'b')]
+    assert len(pool) == 0
+
+
+def test_pool_over_the_mock_server(base_url):
+    client = VjmapClient('token', base_url)
+    with MapSessionPool(client, ttl=0.0) as pool:
+        with pool.session('m', 'v1') as session:
+            assert session.info["code"] == 0
+        _wait_until(lambda: pool.closed == 1)
+    assert pool.errors == []
@@ -0,0 +1,83 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from vjmap_py_client import SingleFlight, VjmapClient
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def _concurrent(flight, func, followers=4):
+    # 首个调用进行中时再发起 followers 个相同的调用
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        release.wait(5)
+        return func()
+
+    def run():
+        try:
+            return flight.do('key', call)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=followers + 1) as executor:
+        futures = [executor.submit(run)]
+        _wait_until(lambda: 'key' in flight._calls)
+        futures += [executor.submit(run) for _ in range(followers)]
+        _wait_until(lambda: flight.coalesced == followers)
+        release.set()
+        return [future.result() for future in futures], len(calls)
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    result = object()
+    results, calls = _concurrent(flight, lambda: result)
+    assert calls == 1
+    assert all(r is result for r in results)
+    # 调用结束后相同的键重新调用
+    assert flight.do('key', lambda: 'again') == 'again'
+
+
+def test_concurrent_calls_share_one_exception():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("failed")
+
+    results, calls = _concurrent(flight, fail)
+    assert calls == 1
+    assert isinstance(results[0], ValueError)
+    assert all(r is results[0] for r in results)
+    assert flight._calls == {}
+
+
+def test_different_keys_are_not_coalesced():
+    flight = SingleFlight()
+    assert [flight.do(key, lambda key=key: key) for key in range(3)] == [0, 1, 2]
+    assert flight.coalesced == 0
+
+
+def test_client_coalesces_identical_requests(server, base_url):
+    client = VjmapClient('token', base_url, coalesce=True)
+    server.latency = 0.1
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: client.get_metadata('m', 'v1'), range(8)))
+            assert all(r == results[0] for r in results)
+            assert server.requests + client.single_flight.coalesced == 8
+            assert server.requests < 8
+            # 修改地图的请求不合并
+            requests = server.requests
+            list(executor.map(lambda _: client.update_metadata('m', 'v1', {}), range(4)))
+            assert server.requests == requests + 4
+    finally:
+        server.latency = 0.0
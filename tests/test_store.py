@@ -0,0 +1,79 @@
+import pytest
+
+from vjmap_py_client import FeatureStore, ConditionQueryParameter, RectQueryParameter
+from vjmap_py_client.store import parse_condition
+
+BASE = 500000000.0  # 单精度在此量级的间隔为 32
+
+
+def _feature(objectid, x1, y1, x2, y2, **fields):
+    return dict({"objectid": objectid, "layername": "0", "name": "AcDbLine", "bounds": f"[{x1},{y1},{x2},{y2}]"}, **fields)
+
+
+def _ids(features):
+    return sorted(feature["objectid"] for feature in features)
+
+
+@pytest.fixture
+def store():
+    store = FeatureStore()
+    yield store
+    store.close()
+
+
+def test_exact_bounds_at_large_coordinates(store):
+    store.add('m', 'v1', [
+        _feature('a', BASE + 0.25, BASE + 0.25, BASE + 0.75, BASE + 0.75),
+        _feature('b', BASE + 2.25, BASE + 2.25, BASE + 2.75, BASE + 2.75),
+        _feature('c', BASE + 40.0, BASE + 40.0, BASE + 41.0, BASE + 41.0),
+    ])
+    # R*Tree 的候选包含三个实体，按精确范围只保留相交的
+    assert _ids(store.query_rect('m', 'v1', BASE + 1.0, BASE + 1.0, BASE + 2.0, BASE + 2.0)) == []
+    assert _ids(store.query_rect('m', 'v1', BASE + 0.5, BASE + 0.5, BASE + 2.5, BASE + 2.5)) == ['a', 'b']
+    assert _ids(store.query_rect('m', 'v1', BASE, BASE, BASE + 2.5, BASE + 2.5, contains=True)) == ['a']
+    assert _ids(store.query_point('m', 'v1', BASE + 0.8, BASE + 0.8)) == []
+    assert _ids(store.query_point('m', 'v1', BASE + 0.8, BASE + 0.8, tolerance=0.1)) == ['a']
+
+
+def test_add_replaces_entities(store):
+    store.add('m', 'v1', [_feature('a', 0, 0, 1, 1)])
+    store.add('m', 'v1', [_feature('a', 10, 10, 11, 11, color=3)])
+    assert store.query_rect('m', 'v1', 0, 0, 2, 2) == []
+    assert [f["color"] for f in store.query_rect('m', 'v1', 9, 9, 12, 12)] == [3]
+    assert len(store.query_condition('m', 'v1')) == 1
+
+
+def test_conditions_and_layers(store):
+    store.add('m', 'v1', [
+        _feature('a', 0, 0, 1, 1, color=1),
+        _feature('b', 0, 0, 1, 1, color=2, layername='walls'),
+        _feature('c', 0, 0, 1, 1, color=2, name="O'Brien"),
+    ])
+    assert _ids(store.query_condition('m', 'v1', condition='color=2')) == ['b', 'c']
+    assert _ids(store.query_condition('m', 'v1', layer='walls', condition='color >= 2')) == ['b']
+    assert _ids(store.query_condition('m', 'v1', condition="name = 'O''Brien' and color == 2")) == ['c']
+    assert parse_condition("color in (1, 2)") is None
+    with pytest.raises(ValueError):
+        store.query_rect('m', 'v1', 0, 0, 1, 1, condition="color in (1, 2)")
+
+
+def test_loaded_versions_are_queried_locally(server, client):
+    store = FeatureStore(client=client)
+    assert store.load('m', 'v1', page_size=100) == 250
+    assert store.is_complete('m', 'v1')
+    requests = server.requests
+    result = store.query_features('m', 'v1', RectQueryParameter(x1=0, y1=0, x2=1000, y2=1000))
+    # 实体 i 的范围为 [400i, 400i, 400i + 400, 400i + 400]
+    assert _ids(result["result"]) == ['0', '1', '2']
+    result = store.query_features('m', 'v1', ConditionQueryParameter(condition="layername='layer1'", limit=10))
+    assert result["recordCount"] == 10
+    assert server.requests == requests
+    assert store.local_queries == 2
+
+    store.query_features('m', 'v1', ConditionQueryParameter(condition="color in (1, 2)"))
+    store.query_features('m', 'v2', ConditionQueryParameter(condition=""))
+    assert store.server_queries == 2
+    assert server.requests == requests + 2
+    store.remove('m', 'v1')
+    assert not store.is_complete('m', 'v1')
+    assert store.query_condition('m', 'v1') == []
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from vjmap_py_client import ArrayItemParser, ConditionQueryParameter
+from vjmap_py_client.streaming import iter_json_items
+
+
+def _split(document: bytes, size: int):
+    return [document[i:i + size] for i in range(0, len(document), size)]
+
+
+def _parse(document: bytes, size: int, key='result'):
+    parser = ArrayItemParser(key)
+    items = [json.loads(item) for chunk in _split(document, size) for item in parser.feed(chunk)]
+    return items, parser
+
+
+DOCUMENTS = [
+    {"code": 0, "result": [{"a": 1}, {"b": [1, 2, {"c": "]}"}]}, 3, "x", None, [], {}], "recordCount": 7},
+    {"result": []},
+    {"result": [{"s": "quote \" and \\\\ backslash, [brackets] {braces}"}]},
+    {"result": [{"u": "中文 ✓ é"}], "error": None},
+    {"meta": {"result": [9, 9]}, "list": ["result", "[", "{"], "result": [1, 2]},
+    {"result": [[1, [2, [3]]], [[]]]},
+]
+
+
+@pytest.mark.parametrize('document', DOCUMENTS)
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, 100000])
+def test_items_at_any_chunking(document, size):
+    encoded = json.dumps(document, ensure_ascii=False).encode('utf-8')
+    items, parser = _parse(encoded, size)
+    assert items == document["result"]
+    assert parser.finished
+    envelope = json.loads(parser.envelope())
+    assert envelope == dict(document, result=[])
+
+
+def test_whitespace_and_pretty_printing():
+    document = {"code": 0, "result": [{"a": [1, 2]}, 2, "three"]}
+    encoded = json.dumps(document, indent=4).encode('utf-8')
+    items, parser = _parse(encoded, 5)
+    assert items == document["result"]
+    assert json.loads(parser.envelope()) == dict(document, result=[])
+
+
+def test_missing_key_returns_the_whole_document():
+    document = json.dumps({"code": -1, "error": "failed"}).encode('utf-8')
+    items, parser = _parse(document, 4)
+    assert items == []
+    assert not parser.finished
+    assert json.loads(parser.envelope()) == {"code": -1, "error": "failed"}
+
+
+def test_nested_key_is_not_the_array():
+    document = json.dumps({"data": {"result": [1, 2]}, "result": [3]}).encode('utf-8')
+    items, _ = _parse(document, 3)
+    assert items == [3]
+
+
+def test_top_level_array():
+    document = json.dumps([{"a": 1}, [2], "3"]).encode('utf-8')
+    items, parser = _parse(document, 2, key=None)
+    assert items == [{"a": 1}, [2], "3"]
+    assert parser.finished
+
+
+def test_data_after_the_array_is_kept():
+    document = b'{"result": [1, 2], "recordCount": 2}'
+    parser = ArrayItemParser()
+    assert parser.feed(document[:14]) == [b'1']
+    assert parser.feed(document[14:]) == [b'2']
+    assert parser.feed(b'') == []
+    assert json.loads(parser.envelope()) == {"result": [], "recordCount": 2}
+
+
+def test_iter_json_items():
+    chunks = _split(json.dumps({"result": [{"a": i} for i in range(10)]}).encode('utf-8'), 5)
+    assert list(iter_json_items(chunks, json.loads)) == [{"a": i} for i in range(10)]
+
+
+def test_stream_features_matches_query_features(client):
+    parameters = ConditionQueryParameter(condition="", limit=1000)
+    expected = client.query_features('m', 'v1', parameters)
+    stream = client.stream_features('m', 'v1', parameters, chunk_size=333)
+    assert list(stream) == expected["result"]
+    assert stream.envelope["recordCount"] == expected["recordCount"]
@@ -0,0 +1,54 @@
+import pytest
+
+from vjmap_py_client import VjmapClient, TileFetcher, TransportConfig, iter_tiles
+
+BOUNDS = [0, 0, 1000, 1000]
+
+
+def _tiles(count):
+    return [(8, x, 0) for x in range(count)]
+
+
+def test_iter_tiles_covers_the_bounds():
+    tiles = list(iter_tiles(BOUNDS, 0, 2))
+    assert [t for t in tiles if t[0] == 0] == [(0, 0, 0)]
+    assert len([t for t in tiles if t[0] == 2]) == 16
+    assert len(set(tiles)) == len(tiles)
+
+
+def test_fetch_returns_every_tile(server, client):
+    tiles = list(iter_tiles(BOUNDS, 0, 3))
+    fetcher = TileFetcher(client, workers=4)
+    results = list(fetcher.fetch('m', 'v1', 'style', 'file', 0, 3, BOUNDS))
+    assert sorted((z, x, y) for z, x, y, _ in results) == sorted(tiles)
+    assert all(content for _, _, _, content in results)
+    assert (fetcher.stats.requested, fetcher.stats.completed, fetcher.stats.failed) == (len(tiles), len(tiles), 0)
+    assert server.requests == len(tiles)
+
+
+def test_fetch_keeps_the_client_session(base_url):
+    client = VjmapClient('token', base_url, transport=TransportConfig(pool_maxsize=4))
+    adapters = dict(client.session.adapters)
+    fetcher = TileFetcher(client, workers=16, max_connections=4)
+    for _ in fetcher.fetch_tiles('m', 'v1', 'style', 'file', _tiles(40)):
+        assert client.session.adapters == adapters
+    assert client.session.adapters == adapters
+    stats = client.pool_stats()
+    assert stats["requests"] == 40
+    assert stats["peak_in_flight"] <= 4
+
+
+def test_max_connections_is_capped_by_the_pool(base_url):
+    client = VjmapClient('token', base_url, transport=TransportConfig(pool_maxsize=4))
+    assert TileFetcher(client, workers=16).max_connections == 4
+    with pytest.raises(ValueError):
+        TileFetcher(client, max_connections=5)
+
+
+def test_failed_tiles_are_recorded(server, client):
+    server.error_rate = 1.0
+    fetcher = TileFetcher(client, workers=2)
+    assert list(fetcher.fetch_tiles('m', 'v1', 'style', 'file', _tiles(3))) == []
+    assert fetcher.stats.failed == 3
+    with pytest.raises(Exception):
+        list(TileFetcher(client, raise_errors=True).fetch_tiles('m', 'v1', 'style', 'file', _tiles(3)))
@@ -0,0 +1,84 @@
+import gzip
+
+import httpx
+import pytest
+import requests
+
+from vjmap_py_client import VjmapClient, RetryPolicy, RetryBudget, TransportConfig
+from vjmap_py_client.exceptions import VjmapConnectionError, VjmapTimeoutError
+
+
+def _flaky_httpx(monkeypatch, failures, error):
+    # 前 failures 次发送抛出 httpx 的异常
+    send = httpx.Client.send
+    calls = []
+
+    def flaky(self, request, **kwargs):
+        calls.append(request)
+        if len(calls) <= failures:
+            raise error("injected", request=request)
+        return send(self, request, **kwargs)
+
+    monkeypatch.setattr(httpx.Client, 'send', flaky)
+    return calls
+
+
+def _http2_client(base_url, retries):
+    retry = RetryPolicy(max_retries=retries, backoff_base=0.0, budget=RetryBudget(max_tokens=100))
+    return VjmapClient('token', base_url, transport=TransportConfig(http2=True), retry=retry), retry
+
+
+@pytest.mark.parametrize('error', [httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.RemoteProtocolError])
+def test_http2_retries_httpx_errors(monkeypatch, base_url, error):
+    client, retry = _http2_client(base_url, 3)
+    calls = _flaky_httpx(monkeypatch, 2, error)
+    assert client.get_data_bounds('m', 'v1')["code"] == 0
+    assert len(calls) == 3
+    assert retry.retries == 2
+
+
+@pytest.mark.parametrize('error, expected', [
+    (httpx.ConnectError, VjmapConnectionError),
+    (httpx.ConnectTimeout, VjmapTimeoutError),
+    (httpx.ReadTimeout, VjmapTimeoutError),
+])
+def test_http2_errors_are_mapped(monkeypatch, base_url, error, expected):
+    client, _ = _http2_client(base_url, 0)
+    _flaky_httpx(monkeypatch, 1, error)
+    with pytest.raises(expected):
+        client.get_data_bounds('m', 'v1')
+
+
+def test_http2_adapter_raises_requests_exceptions(monkeypatch, base_url):
+    session = requests.Session()
+    session.mount('http://', TransportConfig(http2=True).create_adapter())
+    _flaky_httpx(monkeypatch, 2, httpx.ConnectTimeout)
+    with pytest.raises(requests.ConnectTimeout):
+        session.get(base_url + '/map/cmd/getDataBounds/m/v1', params={'token': 't'})
+    with pytest.raises(requests.ConnectTimeout):
+        session.get(base_url + '/map/cmd/getDataBounds/m/v1', params={'token': 't'}, stream=True)
+    assert session.get(base_url + '/map/cmd/getDataBounds/m/v1', params={'token': 't'}).json()["code"] == 0
+
+
+def test_http2_streamed_body_errors_are_mapped(monkeypatch, base_url):
+    session = requests.Session()
+    session.mount('http://', TransportConfig(http2=True).create_adapter())
+
+    def broken(self):
+        yield b'{"code"'
+        raise httpx.ReadError("injected")
+
+    monkeypatch.setattr(httpx.Response, 'iter_bytes', broken)
+    response = session.get(base_url + '/map/cmd/getDataBounds/m/v1', params={'token': 't'}, stream=True)
+    with pytest.raises(requests.ConnectionError):
+        b''.join(response.iter_content(4))
+
+
+def test_requests_are_compressed(server, base_url):
+    client = VjmapClient('token', base_url, transport=TransportConfig(compress_requests=True, compress_min_size=100))
+    entities = [{"objectid": str(i), "name": "x" * 50} for i in range(100)]
+    prepared = client.session.prepare_request(requests.Request('POST', base_url + '/map/updatemap', json={"e": entities}))
+    response = client.session.send(prepared)
+    assert response.request.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.request.body)
+    assert client.update_map('m', entities)["code"] == 0
@@ -0,0 +1,93 @@
+import hashlib
+import io
+import os
+
+from vjmap_py_client import HashCache, files_md5
+from vjmap_py_client import utils
+from vjmap_py_client.utils import file_md5, file_object_md5, parse_bounds
+
+
+class _Reader(io.RawIOBase):
+    # 记录 readinto 收到的缓冲区大小
+    def __init__(self, content: bytes, seekable: bool = True):
+        self._file = io.BytesIO(content)
+        self._seekable = seekable
+        self.buffer_sizes = []
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self._seekable
+
+    def tell(self):
+        return self._file.tell()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._file.seek(offset, whence)
+
+    def readinto(self, buffer):
+        self.buffer_sizes.append(len(buffer))
+        return self._file.readinto(buffer)
+
+
+def test_file_md5(tmp_path):
+    content = os.urandom(100000)
+    path = tmp_path / 'map.dwg'
+    path.write_bytes(content)
+    assert file_md5(str(path)) == hashlib.md5(content).hexdigest()
+    empty = tmp_path / 'empty.dwg'
+    empty.write_bytes(b'')
+    assert file_md5(str(empty)) == hashlib.md5(b'').hexdigest()
+
+
+def test_file_object_md5_reads_from_the_current_position():
+    content = os.urandom(5000)
+    reader = _Reader(content)
+    reader.seek(1000)
+    assert file_object_md5(reader) == hashlib.md5(content[1000:]).hexdigest()
+    # 长度已知时缓冲区不超过剩余长度
+    assert reader.buffer_sizes[0] == 4000
+
+
+def test_file_object_md5_of_unsized_objects():
+    content = os.urandom(3 * utils.STREAM_CHUNK_SIZE // 2)
+    reader = _Reader(content, seekable=False)
+    assert file_object_md5(reader) == hashlib.md5(content).hexdigest()
+    assert set(reader.buffer_sizes) == {utils.STREAM_CHUNK_SIZE}
+    assert file_object_md5(io.BufferedReader(io.BytesIO(content))) == hashlib.md5(content).hexdigest()
+
+
+def test_hash_cache_skips_unchanged_files(tmp_path, monkeypatch):
+    path = tmp_path / 'map.dwg'
+    path.write_bytes(b'first')
+    cache = HashCache(str(tmp_path / 'hashes.db'))
+    assert cache.md5(str(path)) == hashlib.md5(b'first').hexdigest()
+    monkeypatch.setattr(utils, 'file_md5', lambda file_path: 'not hashed again')
+    assert cache.md5(str(path)) == hashlib.md5(b'first').hexdigest()
+    assert files_md5([str(path)], cache=cache) == {str(path): hashlib.md5(b'first').hexdigest()}
+
+
+def test_hash_cache_ignores_files_changed_while_hashing(tmp_path, monkeypatch):
+    path = tmp_path / 'map.dwg'
+    path.write_bytes(b'before')
+    hash_file = utils.file_md5
+
+    def changed_while_hashing(file_path):
+        md5 = hash_file(file_path)
+        path.write_bytes(b'after, longer')
+        return md5
+
+    cache = HashCache()
+    monkeypatch.setattr(utils, 'file_md5', changed_while_hashing)
+    assert cache.md5(str(path)) == hashlib.md5(b'before').hexdigest()
+    monkeypatch.setattr(utils, 'file_md5', hash_file)
+    # 缓存的是修改前的键，修改后的文件重新计算
+    assert cache.get(str(path)) is None
+    assert cache.md5(str(path)) == hashlib.md5(b'after, longer').hexdigest()
+
+
+def test_parse_bounds():
+    assert parse_bounds("[1,2,3,4]") == (1.0, 2.0, 3.0, 4.0)
+    assert parse_bounds(" 1, 2,3,4") == (1.0, 2.0, 3.0, 4.0)
+    assert parse_bounds([1, 2, 3, 4]) == (1.0, 2.0, 3.0, 4.0)
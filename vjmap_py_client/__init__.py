@@ -1,3 +1,52 @@
-from .client import VjmapClient, RectQueryParameter, ConditionQueryParameter, ExprQueryParameter, PointQueryParameter
+import importlib
 
-__all__ = ['VjmapClient', 'RectQueryParameter', 'ConditionQueryParameter', 'ExprQueryParameter', 'PointQueryParameter']
+# 名称所在的模块，首次访问时才导入，避免导入包时加载 requests、httpx 等依赖
+_LAZY = {
+    'VjmapClient': 'client',
+    'AsyncVjmapClient': 'async_client',
+    'RectQueryParameter': 'parameters', 'ConditionQueryParameter': 'parameters', 'ExprQueryParameter': 'parameters', 'PointQueryParameter': 'parameters',
+    'EntitySnapshot': 'batch', 'BatchUpdateResult': 'batch',
+    'TileCache': 'cache', 'ResponseCache': 'cache', 'MemoryCache': 'cache', 'SQLiteCache': 'cache', 'RedisCache': 'cache',
+    'FeatureColumns': 'columnar',
+    'VjmapError': 'exceptions', 'VjmapHTTPError': 'exceptions', 'VjmapClientError': 'exceptions', 'VjmapAuthError': 'exceptions',
+    'VjmapNotFoundError': 'exceptions', 'VjmapRateLimitError': 'exceptions', 'VjmapServerError': 'exceptions',
+    'VjmapConnectionError': 'exceptions', 'VjmapTimeoutError': 'exceptions', 'CircuitOpenError': 'exceptions',
+    'FanOut': 'fanout', 'FanOutResult': 'fanout',
+    'ClientMetrics': 'metrics', 'OpenTelemetryExporter': 'metrics', 'RequestRecord': 'metrics',
+    'Feature': 'models', 'QueryResult': 'models', 'Metadata': 'models', 'MapInfo': 'models',
+    'RectQueryEngine': 'query',
+    'RequestLimiter': 'ratelimit', 'TokenBucket': 'ratelimit', 'AdaptiveLimiter': 'ratelimit',
+    'RetryPolicy': 'resilience', 'RetryBudget': 'resilience', 'CircuitBreaker': 'resilience',
+    'TilePrefetcher': 'prefetch', 'PrefetchStats': 'prefetch',
+    'MapSessionPool': 'sessions', 'MapSession': 'sessions',
+    'SingleFlight': 'singleflight',
+    'FeatureStore': 'store',
+    'FeatureStream': 'streaming', 'AsyncFeatureStream': 'streaming', 'ArrayItemParser': 'streaming', 'write_response': 'streaming',
+    'TileFetcher': 'tiles', 'iter_tiles': 'tiles',
+    'TransportConfig': 'transport',
+    'HashCache': 'utils', 'files_md5': 'utils',
+}
+
+# AsyncVjmapClient 依赖可选的 httpx，不放入 __all__，未安装 httpx 时 import * 仍然可用
+__all__ = ['VjmapClient', 'RectQueryParameter', 'ConditionQueryParameter', 'ExprQueryParameter', 'PointQueryParameter',
+           'EntitySnapshot', 'BatchUpdateResult', 'TileCache', 'ResponseCache', 'MemoryCache', 'SQLiteCache', 'RedisCache',
+           'FeatureColumns', 'Feature', 'QueryResult', 'Metadata', 'MapInfo',
+           'VjmapError', 'VjmapHTTPError', 'VjmapClientError', 'VjmapAuthError', 'VjmapNotFoundError',
+           'VjmapRateLimitError', 'VjmapServerError', 'VjmapConnectionError', 'VjmapTimeoutError', 'CircuitOpenError',
+           'RetryPolicy', 'RetryBudget', 'CircuitBreaker', 'RequestLimiter', 'TokenBucket', 'AdaptiveLimiter',
+           'ClientMetrics', 'OpenTelemetryExporter', 'RequestRecord',
+           'RectQueryEngine', 'FanOut', 'FanOutResult', 'MapSessionPool', 'MapSession', 'SingleFlight', 'FeatureStore', 'FeatureStream', 'AsyncFeatureStream', 'ArrayItemParser', 'write_response', 'TileFetcher', 'TilePrefetcher', 'PrefetchStats', 'iter_tiles', 'TransportConfig', 'HashCache', 'files_md5']
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    # 缓存到模块中，之后的访问不再经过 __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -0,0 +1,422 @@
+import asyncio
+import json
+import httpx
+from typing import Optional, Any, Callable, Iterable
+from .parameters import PointQueryParameter, RectQueryParameter, ExprQueryParameter, ConditionQueryParameter
+from .codec import get_decoder, get_encoder
+from .columnar import FeatureColumns
+from .exceptions import error_for_response, VjmapConnectionError, VjmapTimeoutError
+from .models import decode_model, Feature, QueryResult, Metadata, MapInfo
+from .query import async_query_points, ensure_pageable, page_key
+from .streaming import async_write_response, AsyncFeatureStream, DEFAULT_STREAM_CHUNK_SIZE
+from .upload import UploadStream, DEFAULT_CHUNK_SIZE, is_seekable
+from .utils import file_md5, file_object_md5, HashCache
+
+
+class AsyncVjmapClientBase(object):
+
+    def __init__(
+            self,
+            access_token,
+            base_url='https://vjmap.com/server/api/v1',
+            max_concurrency: int = 32,
+            max_connections: Optional[int] = None,
+            max_keepalive_connections: Optional[int] = None,
+            timeout: Optional[float] = 60.0,
+            http2: bool = False,
+            http_client: Optional[httpx.AsyncClient] = None,
+            decoder: str|Callable[[bytes], Any] = 'auto',
+            typed: bool = False,
+            hash_cache: Optional[HashCache] = None,
+            encoder: str|Callable[[Any], str] = 'auto'
+    ):
+        """
+        Parameters
+        ----------
+        access_token : str
+            The access token of the Vjmap service.
+        base_url : str
+            The base url of the Vjmap Service-API.
+        max_concurrency : int
+            The maximum number of requests in flight at the same time.
+        max_connections : int, optional
+            The size of the connection pool, defaults to ``max_concurrency``.
+        max_keepalive_connections : int, optional
+            The number of idle connections kept alive, defaults to ``max_connections``.
+        timeout : float, optional
+            The request timeout in seconds, None to disable.
+        http2 : bool
+            Whether requests are multiplexed over HTTP/2, requires ``httpx[http2]``.
+        http_client : httpx.AsyncClient, optional
+            An existing client to share its connection pool. It is not closed by :meth:`aclose`.
+        decoder : str|Callable[[bytes], Any]
+            The JSON decoder, see :class:`VjmapClientBase`.
+        typed : bool
+            Whether query_features, get_metadata and list_maps return typed models instead of dicts.
+        hash_cache : HashCache, optional
+            The cache of the MD5 of map files, unchanged files are not hashed again.
+        encoder : str|Callable[[Any], str]
+            The JSON encoder of the entities of update_map_batched, see :class:`VjmapClientBase`.
+        """
+        self.access_token = access_token
+        self.base_url = base_url[:-1] if base_url.endswith('/') else base_url
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._owns_http_client = http_client is None
+        if http_client is None:
+            max_connections = max_connections or max_concurrency
+            limits = httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections or max_connections
+            )
+            http_client = httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+        self.session = http_client
+        self.session.headers.update({"Token": access_token})
+        self.decoder = decoder
+        self.typed = typed
+        self._decode = get_decoder(decoder)
+        self._encode = get_encoder(encoder)
+        self.hash_cache = hash_cache
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    async def aclose(self):
+        if self._owns_http_client:
+            await self.session.aclose()
+
+    async def _request(self, method: str, endpoint: str, as_json: bool = True, model=None, stream: bool = False, **kwargs):
+        kwargs["params"] = kwargs.get("params", {})
+        kwargs["params"]["token"] = self.access_token
+        url = f"{self.base_url}{endpoint}" if endpoint.startswith('/') else f"{self.base_url}/{endpoint}"
+        try:
+            async with self._semaphore:
+                if stream:
+                    # 只读取响应头，响应体由调用方逐块读取并关闭
+                    request = self.session.build_request(method, url, **kwargs)
+                    response = await self.session.send(request, stream=True)
+                else:
+                    response = await self.session.request(method, url, **kwargs)
+        except httpx.TimeoutException as e:
+            raise VjmapTimeoutError(str(e)) from e
+        except httpx.TransportError as e:
+            raise VjmapConnectionError(str(e)) from e
+        if response.status_code == 200:
+            if as_json:
+                if model is not None and self.typed:
+                    return decode_model(response.content, model, self.decoder)
+                return self._decode(response.content)
+            else:
+                return response
+        else:
+            if stream:
+                await response.aread()
+            raise error_for_response(response)
+
+    async def _request_file(self, endpoint: str, destination=None, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE, **kwargs):
+        if destination is None:
+            return await self._request('GET', endpoint, as_json=False, **kwargs)
+        response = await self._request('GET', endpoint, as_json=False, stream=True, **kwargs)
+        await async_write_response(response, destination, chunk_size)
+        return response
+
+    async def _upload_file(self, endpoint: str, file_path: str, **kwargs):
+        if kwargs.get("skip_uploaded") and kwargs.get("md5") is None and self.hash_cache is not None:
+            kwargs["md5"] = await asyncio.get_running_loop().run_in_executor(None, self.hash_cache.md5, file_path)
+        key = self.hash_cache.key(file_path) if self.hash_cache is not None else None
+        with open(file_path, 'rb') as file_object:
+            res = await self._upload_file_object(endpoint, file_object, **kwargs)
+        if self.hash_cache is not None and isinstance(res, dict) and res.get("md5"):
+            self.hash_cache.put(file_path, res["md5"], key)
+        return res
+
+    async def _upload_file_object(self, endpoint: str, file_object: Any, chunk_size: int = DEFAULT_CHUNK_SIZE, progress: Optional[Callable[[int, Optional[int]], Any]] = None,
+                                  retries: int = 0, skip_uploaded: bool = False, md5: Optional[str] = None, **kwargs):
+        start = file_object.tell() if is_seekable(file_object) else None
+        if skip_uploaded:
+            if md5 is None and start is not None:
+                md5 = await asyncio.get_running_loop().run_in_executor(None, file_object_md5, file_object)
+                file_object.seek(start)
+            uploaded = await self._uploaded_file(md5) if md5 else None
+            if uploaded:
+                return uploaded
+        headers = dict(kwargs.pop("headers", None) or {})
+        attempt = 0
+        while True:
+            stream = UploadStream(file_object, chunk_size=chunk_size, progress=progress)
+            headers["Content-Type"] = stream.content_type
+            # 大小未知时以 chunked 方式发送
+            if stream.size is not None:
+                headers["Content-Length"] = str(len(stream))
+            try:
+                response = await self._request('POST', endpoint, content=aiter(stream), headers=headers, **kwargs)
+            except (VjmapConnectionError, VjmapTimeoutError):
+                if attempt >= retries or start is None:
+                    raise
+                attempt += 1
+                # 文件已完整发送时，服务端可能已经收到，先按 MD5 检查
+                if stream.finished:
+                    uploaded = await self._uploaded_file(stream.hexdigest())
+                    if uploaded:
+                        return uploaded
+                file_object.seek(start)
+                continue
+            if isinstance(response, dict) and stream.finished:
+                response.setdefault("md5", stream.hexdigest())
+            return response
+
+    async def _uploaded_file(self, md5: str):
+        result = await self._request("GET", '/map/mapfile', params={"md5": md5})
+        return result if isinstance(result, dict) and result.get("fileid") else None
+
+
+class AsyncVjmapClient(AsyncVjmapClientBase):
+    """
+    Asyncio counterpart of :class:`VjmapClient`.
+
+    Every method has the same parameters as in :class:`VjmapClient` and has to be awaited.
+    Requests share one connection pool and at most ``max_concurrency`` of them are in flight.
+    Tile and thumbnail calls return an :class:`httpx.Response` whose body has been read.
+    """
+
+    async def upload_map(self, map_file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, progress: Optional[Callable[[int, Optional[int]], Any]] = None,
+                         retries: int = 0, skip_uploaded: bool = False, md5: Optional[str] = None, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.upload_map`.
+        The file is read and hashed in the default executor so the event loop is not blocked.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E4%B8%8A%E4%BC%A0%E5%9B%BE%E5%BD%A2
+        """
+        endpoint = '/map/uploads'
+        return await self._upload_file(endpoint, map_file_path, chunk_size=chunk_size, progress=progress,
+                                       retries=retries, skip_uploaded=skip_uploaded, md5=md5, **kwargs)
+
+    async def upload_map_file_object(self, map_file_object: Any, chunk_size: int = DEFAULT_CHUNK_SIZE, progress: Optional[Callable[[int, Optional[int]], Any]] = None,
+                                     retries: int = 0, skip_uploaded: bool = False, md5: Optional[str] = None, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.upload_map_file_object`.
+        The file object is read and hashed in the default executor so the event loop is not blocked.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E4%B8%8A%E4%BC%A0%E5%9B%BE%E5%BD%A2
+        """
+        endpoint = '/map/uploads'
+        return await self._upload_file_object(endpoint, map_file_object, chunk_size=chunk_size, progress=progress,
+                                              retries=retries, skip_uploaded=skip_uploaded, md5=md5, **kwargs)
+
+    async def open_map(self, map_id: str, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.open_map`.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E5%88%9B%E5%BB%BA%E6%88%96%E6%89%93%E5%BC%80%E5%9B%BE%E5%BD%A2
+        """
+        endpoint = f'/map/openmap/{map_id}'
+        return await self._request('GET', endpoint, **kwargs)
+
+    async def update_map(self, map_id: str, entities: list, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.update_map`.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E6%9B%B4%E6%96%B0%E5%9B%BE%E5%BD%A2
+        """
+        endpoint = f'/map/updatemap/{map_id}'
+        file_data = json.dumps({"entities": entities})
+        json_data = {
+            "fileid": file_data
+        }
+        return await self._request('POST', endpoint, json=json_data, **kwargs)
+
+    async def update_map_batched(self, map_id: str, entities: Iterable[dict], max_chunk_bytes: int = 4194304, max_chunk_entities: Optional[int] = None,
+                                 concurrency: int = 1, snapshot: Optional['EntitySnapshot'] = None, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.update_map_batched`.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E6%9B%B4%E6%96%B0%E5%9B%BE%E5%BD%A2
+        """
+        from .batch import async_update_map_batched
+        return await async_update_map_batched(self, map_id, entities, max_chunk_bytes, max_chunk_entities, concurrency, snapshot, **kwargs)
+
+    async def map_file_uploaded(self, map_file_path: str, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.map_file_uploaded`.
+        The file is hashed in the default executor so the event loop is not blocked.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E6%A3%80%E6%9F%A5%E6%96%87%E4%BB%B6%E6%98%AF%E5%90%A6%E4%B8%8A%E4%BC%A0%E8%BF%87
+        """
+        endpoint = '/map/mapfile'
+        md5_func = self.hash_cache.md5 if self.hash_cache is not None else file_md5
+        md5 = await asyncio.get_running_loop().run_in_executor(None, md5_func, map_file_path)
+        return await self._request("GET", endpoint, params={"md5": md5}, **kwargs)
+
+    async def map_file_object_uploaded(self, map_file_object: Any, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.map_file_object_uploaded`.
+        The file object is hashed in the default executor so the event loop is not blocked.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E6%A3%80%E6%9F%A5%E6%96%87%E4%BB%B6%E6%98%AF%E5%90%A6%E4%B8%8A%E4%BC%A0%E8%BF%87
+        """
+        endpoint = '/map/mapfile'
+        md5 = await asyncio.get_running_loop().run_in_executor(None, file_object_md5, map_file_object)
+        return await self._request("GET", endpoint, params={"md5": md5}, **kwargs)
+
+    async def get_map_tile(self, map_id: str, version: str, stylename: str, zoom: int, x: int, y: int, fileid: str, as_mvt: bool = False,
+                           destination=None, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.get_map_tile`.
+        Files given as destination are written in the default executor so the event loop is not blocked.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E6%A0%85%E6%A0%BC%E7%93%A6%E7%89%87%E5%9C%B0%E5%9D%80
+        :link: https://vjmap.com/guide/restinterface.html#%E7%9F%A2%E9%87%8F%E7%93%A6%E7%89%87%E5%9C%B0%E5%9D%80
+        """
+        endpoint = f'/map/tile/{map_id}/{version}/{stylename}/{zoom}/{x}/{y}'
+        if as_mvt:
+            endpoint += '.mvt'
+        return await self._request_file(endpoint, destination, chunk_size, params={"tag": fileid}, **kwargs)
+
+    async def list_maps(self, map_id: str, version: str, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.list_maps`.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E8%8E%B7%E5%8F%96%E5%9C%B0%E5%9B%BE%E5%88%97%E8%A1%A8
+        """
+        endpoint = f'/map/cmd/listmaps/{map_id}/{version}'
+        return await self._request('GET', endpoint, model=MapInfo, **kwargs)
+
+    async def query_features(self, map_id: str, version: str, parameters: PointQueryParameter|RectQueryParameter|ExprQueryParameter|ConditionQueryParameter, columnar: bool = False, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.query_features`.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E6%9F%A5%E8%AF%A2%E5%AE%9E%E4%BD%93
+        """
+        endpoint = f'/map/cmd/queryFeatures/{map_id}/{version}'
+        if columnar:
+            response = await self._request('POST', endpoint, json=parameters.to_dict(), **kwargs)
+            return FeatureColumns.from_features(response.get("result") or [])
+        return await self._request('POST', endpoint, json=parameters.to_dict(), model=QueryResult, **kwargs)
+
+    async def stream_features(self, map_id: str, version: str, parameters: PointQueryParameter|RectQueryParameter|ExprQueryParameter|ConditionQueryParameter, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.stream_features`, returning an :class:`AsyncFeatureStream` to be used with ``async for``.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E6%9F%A5%E8%AF%A2%E5%AE%9E%E4%BD%93
+        """
+        endpoint = f'/map/cmd/queryFeatures/{map_id}/{version}'
+        response = await self._request('POST', endpoint, as_json=False, json=parameters.to_dict(), stream=True, **kwargs)
+        return AsyncFeatureStream(response, self._decode, chunk_size, model=Feature if self.typed else None)
+
+    async def iter_features(self, map_id: str, version: str, parameters: ExprQueryParameter|ConditionQueryParameter, page_size: int = 1000, prefetch: bool = True, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.iter_features`, to be used with ``async for``.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E6%9F%A5%E8%AF%A2%E5%AE%9E%E4%BD%93
+        """
+        ensure_pageable(parameters)
+        endpoint = f'/map/cmd/queryFeatures/{map_id}/{version}'
+        data = parameters.to_dict()
+        data["maxReturnCount"] = page_size
+        beginpos = data.get("beginpos") or 0
+        first = None
+
+        async def fetch(pos):
+            return (await self._request('POST', endpoint, json=dict(data, beginpos=pos), **kwargs)).get("result") or []
+
+        task = asyncio.ensure_future(fetch(beginpos)) if prefetch else None
+        try:
+            while True:
+                page = await task if prefetch else await fetch(beginpos)
+                first = page_key(page, first)
+                beginpos += len(page)
+                more = len(page) >= page_size
+                if prefetch and more:
+                    task = asyncio.ensure_future(fetch(beginpos))
+                for feature in page:
+                    yield feature
+                if not more:
+                    break
+        finally:
+            if task is not None and not task.done():
+                task.cancel()
+
+    async def query_points(self, map_id: str, version: str, points, pixelsize: Optional[int] = 5, tolerance: Optional[float] = None, cluster_size: Optional[float] = None, workers: int = 8, cluster_limit: int = 5000, query_options: Optional[dict] = None, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.query_points`, at most ``workers`` queries being in flight.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E6%9F%A5%E8%AF%A2%E5%AE%9E%E4%BD%93
+        """
+        return await async_query_points(self, map_id, version, points, pixelsize, tolerance, cluster_size, workers, cluster_limit, query_options, **kwargs)
+
+    async def get_data_bounds(self, map_id: str, version: str, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.get_data_bounds`.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E8%8E%B7%E5%8F%96%E5%9B%BE%E5%BD%A2%E4%B8%AD%E6%9C%89%E6%95%B0%E6%8D%AE%E7%9A%84%E8%8C%83%E5%9B%B4%E5%8C%BA%E5%9F%9F
+        """
+        endpoint = f'/map/cmd/getDataBounds/{map_id}/{version}'
+        return await self._request('GET', endpoint, **kwargs)
+
+    async def get_thumbnail(self, map_id: str, version: str, width: int = 100, height: int = 100, dark_theme: bool = False,
+                            destination=None, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.get_thumbnail`.
+        Files given as destination are written in the default executor so the event loop is not blocked.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E8%8E%B7%E5%8F%96%E5%9B%BE%E7%9A%84%E7%BC%A9%E7%95%A5%E5%9B%BE
+        """
+        endpoint = f'/map/cmd/thumbnail/{map_id}/{version}'
+        params = {"width": width, "height": height, "darkTheme": dark_theme}
+        return await self._request_file(endpoint, destination, chunk_size, params=params, **kwargs)
+
+    async def close_map(self, map_id: str, version: str, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.close_map`.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E4%B8%BB%E5%8A%A8%E5%85%B3%E9%97%AD%E6%89%93%E5%BC%80%E7%9A%84%E5%9C%B0%E5%9B%BE
+        """
+        endpoint = f'/map/cmd/closemap/{map_id}/{version}'
+        return await self._request('POST', endpoint, **kwargs)
+
+    async def get_metadata(self, map_id: str, version: str, geom: bool = False, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.get_metadata`.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E8%8E%B7%E5%8F%96%E5%9C%B0%E5%9B%BE%E5%85%83%E6%95%B0%E6%8D%AE
+        """
+        endpoint = f'/map/cmd/metadata/{map_id}/{version}'
+        return await self._request('GET', endpoint, params={"geom": geom}, model=Metadata, **kwargs)
+
+    async def update_metadata(self, map_id: str, version: str, metadata: dict, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.update_metadata`.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E4%BF%AE%E6%94%B9%E5%9C%B0%E5%9B%BE%E5%85%83%E6%95%B0%E6%8D%AE
+        """
+        endpoint = f'/map/cmd/updateMetadata/{map_id}/{version}'
+        return await self._request('POST', endpoint, json=metadata, **kwargs)
+
+    async def switch_layers(self, map_id: str, version: str, visible_layers: list, dark_mode: bool = False, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.switch_layers`.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E5%88%87%E6%8D%A2%E5%9B%BE%E5%B1%82
+        """
+        endpoint = f'/map/cmd/switchlayers/{map_id}/{version}'
+        return await self._request('POST', endpoint, json={"visibleLayers": visible_layers, "darkMode": dark_mode}, **kwargs)
+
+    async def create_map_style(self, map_id: str, version: str, style: dict, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.create_map_style`.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E8%8E%B7%E5%8F%96%E6%A0%B7%E5%BC%8F%E5%9B%BE%E5%B1%82%E5%90%8D
+        """
+        endpoint = f'/map/cmd/createMapStyle/{map_id}/{version}'
+        return await self._request('POST', endpoint, json=style, **kwargs)
+
+    async def delete_map(self, map_id: str, version: str, retain_version_count: str = 0, **kwargs):
+        """
+        Async version of :meth:`VjmapClient.delete_map`.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E5%88%A0%E9%99%A4%E5%9B%BE
+        """
+        endpoint = f'/map/cmd/deletemap/{map_id}/{version}'
+        return await self._request('POST', endpoint, json={"retainVersionMaxCount": retain_version_count}, **kwargs)
@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from .query import feature_key
+
+DEFAULT_CHUNK_BYTES = 4194304  # 4MB
+
+
+def _digest(encoded: str) -> str:
+    return hashlib.blake2b(encoded.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class EntitySnapshot(object):
+    """
+    The digests of the entities last submitted to a map, keyed by objectid, used to submit only
+    the entities that changed since. Entities without an objectid are always submitted.
+    """
+
+    def __init__(self, digests: Optional[Dict[str, str]] = None):
+        self.digests = dict(digests or {})
+
+    def changed(self, key, encoded: str) -> bool:
+        return key is None or self.digests.get(str(key)) != _digest(encoded)
+
+    def record(self, key, encoded: str):
+        if key is not None:
+            self.digests[str(key)] = _digest(encoded)
+
+    def removed(self, entities: Iterable[dict]) -> List[str]:
+        """
+        The objectids of the snapshot missing from entities.
+        """
+        keys = set(str(feature_key(entity)) for entity in entities)
+        return [key for key in self.digests if key not in keys]
+
+    def __len__(self):
+        return len(self.digests)
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.digests, f)
+
+    @classmethod
+    def load(cls, path: str) -> 'EntitySnapshot':
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+
+def encode_chunks(entities: Iterable[dict], encode: Callable[[Any], str], max_bytes: int = DEFAULT_CHUNK_BYTES,
+                  max_entities: Optional[int] = None, snapshot: Optional[EntitySnapshot] = None) -> Iterator[Tuple[str, list]]:
+    """
+    将实体编码并分块，每块的 {"entities": [...]} 不超过 max_bytes 字节（单个实体超过时单独成块）
+    :param entities: 实体
+    :param encode: JSON 编码函数
+    :param max_bytes: 每块的最大字节数
+    :param max_entities: 每块的最大实体数
+    :param snapshot: 给定时跳过与快照相同的实体
+    :return: (该块的 JSON 字符串, [(objectid, 实体的 JSON 字符串)]) 的生成器
+    """
+    head, tail = '{"entities":[', ']}'
+    pieces = []
+    size = len(head) + len(tail)
+    for entity in entities:
+        encoded = encode(entity)
+        key = feature_key(entity)
+        if snapshot is not None and not snapshot.changed(key, encoded):
+            continue
+        # 按 UTF-8 字节数计算大小，ASCII 为主时近似于字符数
+        length = len(encoded) if encoded.isascii() else len(encoded.encode('utf-8'))
+        if pieces and (size + length + 1 > max_bytes or max_entities is not None and len(pieces) >= max_entities):
+            yield head + ','.join(encoded for _, encoded in pieces) + tail, pieces
+            pieces = []
+            size = len(head) + len(tail)
+        pieces.append((key, encoded))
+        size += length + 1
+    if pieces:
+        yield head + ','.join(encoded for _, encoded in pieces) + tail, pieces
+
+
+class BatchUpdateResult(object):
+
+    def __init__(self):
+        self.chunks = 0
+        self.submitted = 0
+        self.skipped = 0
+        self.responses = []
+
+    def __repr__(self):
+        return f"BatchUpdateResult(chunks={self.chunks}, submitted={self.submitted}, skipped={self.skipped})"
+
+
+def update_map_batched(client, map_id: str, entities: Iterable[dict], max_bytes: int = DEFAULT_CHUNK_BYTES, max_entities: Optional[int] = None,
+                       concurrency: int = 1, snapshot: Optional[EntitySnapshot] = None, **kwargs) -> BatchUpdateResult:
+    """
+    See :meth:`VjmapClient.update_map_batched`.
+    """
+    result = BatchUpdateResult()
+    total = [0]
+
+    def counted(items):
+        for item in items:
+            total[0] += 1
+            yield item
+
+    def submit(file_data):
+        return client._request('POST', f'/map/updatemap/{map_id}', json={"fileid": file_data}, **kwargs)
+
+    def done(pieces, response):
+        result.chunks += 1
+        result.submitted += len(pieces)
+        result.responses.append(response)
+        # 仅在块提交成功后更新快照，失败后重新调用只会提交剩余的实体
+        if snapshot is not None:
+            for key, encoded in pieces:
+                snapshot.record(key, encoded)
+
+    chunks = encode_chunks(counted(entities), client._encode, max_bytes, max_entities, snapshot)
+    if concurrency <= 1:
+        for file_data, pieces in chunks:
+            done(pieces, submit(file_data))
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending = {}
+            try:
+                for file_data, pieces in chunks:
+                    while len(pending) >= concurrency:
+                        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            done(pending.pop(future), future.result())
+                    pending[executor.submit(submit, file_data)] = pieces
+                for future in list(pending):
+                    done(pending.pop(future), future.result())
+            finally:
+                for future in pending:
+                    future.cancel()
+    result.skipped = total[0] - result.submitted
+    return result
+
+
+async def async_update_map_batched(client, map_id: str, entities: Iterable[dict], max_bytes: int = DEFAULT_CHUNK_BYTES, max_entities: Optional[int] = None,
+                                   concurrency: int = 1, snapshot: Optional[EntitySnapshot] = None, **kwargs) -> BatchUpdateResult:
+    """
+    See :meth:`AsyncVjmapClient.update_map_batched`.
+    """
+    result = BatchUpdateResult()
+    total = [0]
+
+    def counted(items):
+        for item in items:
+            total[0] += 1
+            yield item
+
+    def submit(file_data):
+        return asyncio.ensure_future(client._request('POST', f'/map/updatemap/{map_id}', json={"fileid": file_data}, **kwargs))
+
+    def done(pieces, response):
+        result.chunks += 1
+        result.submitted += len(pieces)
+        result.responses.append(response)
+        if snapshot is not None:
+            for key, encoded in pieces:
+                snapshot.record(key, encoded)
+
+    pending = {}
+    try:
+        for file_data, pieces in encode_chunks(counted(entities), client._encode, max_bytes, max_entities, snapshot):
+            while len(pending) >= max(concurrency, 1):
+                finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    done(pending.pop(task), task.result())
+            pending[submit(file_data)] = pieces
+        while pending:
+            finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                done(pending.pop(task), task.result())
+    finally:
+        for task in pending:
+            task.cancel()
+    result.skipped = total[0] - result.submitted
+    return result
@@ -0,0 +1,479 @@
+import hashlib
+import json
+import re
+import socket
+import sqlite3
+import threading
+import time
+from collections import namedtuple, OrderedDict
+from typing import Any, Callable, Iterable, Optional
+
+# 瓦片缓存的键
+TileKey = namedtuple('TileKey', ['map_id', 'version', 'stylename', 'z', 'x', 'y', 'fileid', 'format'])
+
+# 缓存的瓦片
+CachedTile = namedtuple('CachedTile', ['content', 'content_type', 'etag', 'last_modified', 'fetched_at'])
+
+# 瓦片格式对应的 MBTiles 元数据 format
+_MBTILES_FORMATS = {'mvt': 'pbf', 'raster': 'png', 'thumbnail': 'png'}
+
+
+def is_pinned_version(version: Optional[str]) -> bool:
+    """
+    判断版本号是否指向固定版本。地图的固定版本不可变，其缓存无需再验证
+    :param version: 版本号
+    :return: 空版本号或 "_"、"latest" 等指向最新版本时返回 False
+    """
+    return bool(version) and version not in ('_', '*', 'latest')
+
+
+class TileCache(object):
+    """
+    Persistent tile cache stored in an SQLite file.
+
+    The file is MBTiles compatible: it has a ``metadata`` table and a ``tiles`` view with
+    ``zoom_level``, ``tile_column``, ``tile_row`` (TMS) and ``tile_data``, which is meaningful
+    when a single tileset is cached. The ``format`` metadata is ``png`` or ``pbf`` (MVT) after the
+    cached tiles, and left unset when both are cached. When the total size exceeds ``max_bytes``
+    the least recently used tiles are evicted.
+    """
+
+    def __init__(self, path: str = ':memory:', max_bytes: Optional[int] = 512 * 1024 * 1024, ttl: float = 0, pinned: Callable[[str], bool] = is_pinned_version):
+        """
+        Parameters
+        ----------
+        path : str
+            The path of the SQLite file, ':memory:' for a non persistent cache.
+        max_bytes : int, optional
+            The maximum total size of the cached tiles, None for no limit.
+        ttl : float
+            Seconds during which a tile of an unpinned version is served without revalidation.
+        pinned : Callable[[str], bool]
+            Tells whether a version is pinned. Tiles of pinned versions are never revalidated.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.pinned = pinned
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS tile_cache (
+                map_id TEXT NOT NULL, version TEXT NOT NULL, stylename TEXT NOT NULL,
+                z INTEGER NOT NULL, x INTEGER NOT NULL, y INTEGER NOT NULL,
+                fileid TEXT NOT NULL, format TEXT NOT NULL,
+                tile_data BLOB, content_type TEXT, etag TEXT, last_modified TEXT,
+                size INTEGER NOT NULL, fetched_at REAL NOT NULL, accessed_at REAL NOT NULL,
+                PRIMARY KEY (map_id, version, stylename, z, x, y, fileid, format)
+            );
+            CREATE INDEX IF NOT EXISTS tile_cache_accessed_at ON tile_cache (accessed_at);
+            CREATE VIEW IF NOT EXISTS tiles AS
+                SELECT z AS zoom_level, x AS tile_column, ((1 << z) - 1 - y) AS tile_row, tile_data FROM tile_cache;
+            INSERT OR IGNORE INTO metadata (name, value) VALUES ('name', 'vjmap tile cache');
+        ''')
+        # 按已缓存的瓦片重新确定 format，混合缓存时不设置
+        formats = set(_MBTILES_FORMATS.get(row[0], row[0]) for row in self._conn.execute('SELECT DISTINCT format FROM tile_cache'))
+        self._mixed = len(formats) > 1
+        self._format = formats.pop() if len(formats) == 1 else None
+        self._set_format(self._format)
+        self._conn.commit()
+        self._size = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM tile_cache').fetchone()[0]
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, key: TileKey) -> Optional[CachedTile]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT tile_data, content_type, etag, last_modified, fetched_at FROM tile_cache '
+                'WHERE map_id=? AND version=? AND stylename=? AND z=? AND x=? AND y=? AND fileid=? AND format=?',
+                tuple(key)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                'UPDATE tile_cache SET accessed_at=? '
+                'WHERE map_id=? AND version=? AND stylename=? AND z=? AND x=? AND y=? AND fileid=? AND format=?',
+                (time.time(),) + tuple(key)
+            )
+            self._conn.commit()
+        return CachedTile(*row)
+
+    def put(self, key: TileKey, content: bytes, content_type: Optional[str] = None, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute(
+                'SELECT size FROM tile_cache '
+                'WHERE map_id=? AND version=? AND stylename=? AND z=? AND x=? AND y=? AND fileid=? AND format=?',
+                tuple(key)
+            ).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO tile_cache (map_id, version, stylename, z, x, y, fileid, format, '
+                'tile_data, content_type, etag, last_modified, size, fetched_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                tuple(key) + (content, content_type, etag, last_modified, len(content), now, now)
+            )
+            self._size += len(content) - (old[0] if old else 0)
+            tile_format = _MBTILES_FORMATS.get(key.format, key.format)
+            if not self._mixed and tile_format != self._format:
+                # 首个瓦片确定 format，之后出现其他格式时不再设置
+                self._mixed = self._format is not None
+                self._format = None if self._mixed else tile_format
+                self._set_format(self._format)
+            self._evict()
+            self._conn.commit()
+
+    def touch(self, key: TileKey):
+        """
+        Mark a tile as freshly validated.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'UPDATE tile_cache SET fetched_at=?, accessed_at=? '
+                'WHERE map_id=? AND version=? AND stylename=? AND z=? AND x=? AND y=? AND fileid=? AND format=?',
+                (now, now) + tuple(key)
+            )
+            self._conn.commit()
+
+    def is_fresh(self, key: TileKey, tile: CachedTile) -> bool:
+        """
+        Whether a cached tile can be served without touching the network.
+        """
+        return self.pinned(key.version) or time.time() - tile.fetched_at < self.ttl
+
+    def _set_format(self, tile_format: Optional[str]):
+        if tile_format is None:
+            self._conn.execute("DELETE FROM metadata WHERE name='format'")
+        else:
+            self._conn.execute("INSERT OR REPLACE INTO metadata (name, value) VALUES ('format', ?)", (tile_format,))
+
+    def _evict(self):
+        if self.max_bytes is None or self._size <= self.max_bytes:
+            return
+        excess = self._size - self.max_bytes
+        cursor = self._conn.execute('SELECT rowid, size FROM tile_cache ORDER BY accessed_at')
+        rowids = []
+        for rowid, size in cursor:
+            rowids.append((rowid,))
+            excess -= size
+            self._size -= size
+            if excess <= 0:
+                break
+        cursor.close()
+        self._conn.executemany('DELETE FROM tile_cache WHERE rowid=?', rowids)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM tile_cache')
+            self._format = None
+            self._mixed = False
+            self._set_format(None)
+            self._conn.commit()
+            self._size = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM tile_cache').fetchone()[0]
+
+
+# 可缓存的查询接口，以及会修改地图数据、需要使缓存失效的接口
+_CACHEABLE = re.compile(r'^/map/cmd/(metadata|getDataBounds|listmaps|queryFeatures)/([^/]+)/([^/]*)$')
+_MUTATING = re.compile(r'^/map/(?:updatemap|cmd/(?:updateMetadata|switchlayers|deletemap|createMapStyle))/([^/]+)')
+
+# 请求的缓存项
+CacheEntry = namedtuple('CacheEntry', ['key', 'ttl', 'tags'])
+
+
+def canonical_key(method: str, endpoint: str, params: Optional[dict] = None, body: Any = None) -> str:
+    """
+    由接口、参数和请求体生成规范化的缓存键，参数和请求体的键顺序不影响结果
+    :return: 缓存键
+    """
+    params = dict((k, v) for k, v in (params or {}).items() if k != 'token')
+    payload = json.dumps([params, body], sort_keys=True, separators=(',', ':'), default=str)
+    return f"{method.upper()} {endpoint} {hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]}"
+
+
+class MemoryCache(object):
+    """
+    In-memory LRU response cache backend.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._tags = {}
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value, _ = entry
+            if expires < time.time():
+                self._delete(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float, tags: Iterable[str] = ()):
+        with self._lock:
+            self._delete(key)
+            self._entries[key] = (time.time() + ttl, value, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._delete(next(iter(self._entries)))
+
+    def invalidate(self, tag: str):
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def _delete(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            for tag in entry[2]:
+                keys = self._tags.get(tag)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._tags[tag]
+
+
+class SQLiteCache(object):
+    """
+    Response cache backend stored in an SQLite file, shared by processes on the same host.
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS response_cache (key TEXT PRIMARY KEY, value BLOB, expires REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS response_cache_tag (tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key));
+        ''')
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute('SELECT value, expires FROM response_cache WHERE key=?', (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def set(self, key: str, value: bytes, ttl: float, tags: Iterable[str] = ()):
+        with self._lock:
+            now = time.time()
+            self._conn.execute('DELETE FROM response_cache WHERE expires<?', (now,))
+            self._conn.execute('INSERT OR REPLACE INTO response_cache (key, value, expires) VALUES (?, ?, ?)', (key, value, now + ttl))
+            self._conn.executemany('INSERT OR IGNORE INTO response_cache_tag (tag, key) VALUES (?, ?)', [(tag, key) for tag in tags])
+            self._conn.commit()
+
+    def invalidate(self, tag: str):
+        with self._lock:
+            self._conn.execute('DELETE FROM response_cache WHERE key IN (SELECT key FROM response_cache_tag WHERE tag=?)', (tag,))
+            self._conn.execute('DELETE FROM response_cache_tag WHERE tag=?', (tag,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM response_cache')
+            self._conn.execute('DELETE FROM response_cache_tag')
+            self._conn.commit()
+
+
+class RespConnection(object):
+    """
+    Minimal client of the Redis serialization protocol (RESP), for Redis or any server speaking it.
+    """
+
+    def __init__(self, host: str = 'localhost', port: int = 6379, db: int = 0, password: Optional[str] = None, timeout: Optional[float] = 5.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock = None
+        self._file = None
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._file = self._sock.makefile('rb')
+        if self.password:
+            self._call('AUTH', self.password)
+        if self.db:
+            self._call('SELECT', self.db)
+
+    def close(self):
+        with self._lock:
+            if self._sock is not None:
+                self._file.close()
+                self._sock.close()
+                self._sock = self._file = None
+
+    def execute_command(self, *args):
+        with self._lock:
+            try:
+                if self._sock is None:
+                    self._connect()
+                return self._call(*args)
+            except OSError:
+                # 连接断开时重连一次
+                if self._sock is not None:
+                    self._sock.close()
+                self._sock = None
+                self._connect()
+                return self._call(*args)
+
+    def _call(self, *args):
+        parts = [f'*{len(args)}\r\n'.encode()]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            parts.append(f'${len(arg)}\r\n'.encode())
+            parts.append(arg)
+            parts.append(b'\r\n')
+        self._sock.sendall(b''.join(parts))
+        return self._read()
+
+    def _read(self):
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Connection closed by the server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest
+        if kind == b'-':
+            raise RuntimeError(rest.decode('utf-8', 'replace'))
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            size = int(rest)
+            if size < 0:
+                return None
+            data = self._file.read(size + 2)
+            return data[:-2]
+        if kind == b'*':
+            size = int(rest)
+            return None if size < 0 else [self._read() for _ in range(size)]
+        raise RuntimeError(f"Unexpected reply: {line!r}")
+
+
+class RedisCache(object):
+    """
+    Response cache backend stored in Redis, shared by all hosts.
+
+    ``connection`` may be any object with an ``execute_command(*args)`` method, such as a
+    ``redis.Redis`` client or a local stand-in; a :class:`RespConnection` is created otherwise.
+    """
+
+    def __init__(self, host: str = 'localhost', port: int = 6379, db: int = 0, password: Optional[str] = None, prefix: str = 'vjmap:', connection: Any = None):
+        self.prefix = prefix
+        self.connection = connection or RespConnection(host, port, db, password)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.connection.execute_command('GET', self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: float, tags: Iterable[str] = ()):
+        ttl_ms = max(int(ttl * 1000), 1)
+        self.connection.execute_command('SET', self.prefix + key, value, 'PX', ttl_ms)
+        for tag in tags:
+            tag_key = self.prefix + 'tag:' + tag
+            self.connection.execute_command('SADD', tag_key, self.prefix + key)
+            self.connection.execute_command('PEXPIRE', tag_key, ttl_ms)
+
+    def invalidate(self, tag: str):
+        tag_key = self.prefix + 'tag:' + tag
+        keys = self.connection.execute_command('SMEMBERS', tag_key) or []
+        self.connection.execute_command('DEL', tag_key, *keys)
+
+    def clear(self):
+        cursor = b'0'
+        while True:
+            cursor, keys = self.connection.execute_command('SCAN', cursor, 'MATCH', self.prefix + '*', 'COUNT', 1000)
+            if keys:
+                self.connection.execute_command('DEL', *keys)
+            if cursor in (b'0', 0, '0'):
+                break
+
+
+class ResponseCache(object):
+    """
+    Cache of the JSON responses of get_metadata, get_data_bounds, list_maps and query_features.
+
+    Entries are keyed by endpoint, params and body. Responses of pinned versions, which are
+    immutable, are kept for ``pinned_ttl`` seconds, others for ``ttl`` seconds. Successful calls to
+    update_map, update_metadata, switch_layers, create_map_style and delete_map invalidate the
+    entries of their map.
+    """
+
+    def __init__(self, backend: Any = None, ttl: float = 60, pinned_ttl: float = 86400, pinned: Callable[[str], bool] = is_pinned_version):
+        """
+        Parameters
+        ----------
+        backend : MemoryCache|SQLiteCache|RedisCache, optional
+            Where the responses are stored, defaults to a MemoryCache.
+        ttl : float
+            The lifetime in seconds of the entries of unpinned versions and of map lists.
+        pinned_ttl : float
+            The lifetime in seconds of the entries of pinned versions.
+        pinned : Callable[[str], bool]
+            Tells whether a version is pinned.
+        """
+        self.backend = backend if backend is not None else MemoryCache()
+        self.ttl = ttl
+        self.pinned_ttl = pinned_ttl
+        self.pinned = pinned
+
+    def entry(self, method: str, endpoint: str, params: Optional[dict] = None, body: Any = None) -> Optional[CacheEntry]:
+        """
+        The cache entry of a request, None if it is not cacheable.
+        """
+        match = _CACHEABLE.match(endpoint)
+        if match is None:
+            return None
+        command, map_id, version = match.groups()
+        if command == 'listmaps':
+            ttl = self.ttl
+            tags = (f'map:{map_id}', 'listmaps')
+        else:
+            ttl = self.pinned_ttl if self.pinned(version) else self.ttl
+            tags = (f'map:{map_id}',)
+        return CacheEntry(canonical_key(method, endpoint, params, body), ttl, tags)
+
+    def get(self, entry: CacheEntry) -> Optional[bytes]:
+        return self.backend.get(entry.key)
+
+    def set(self, entry: CacheEntry, content: bytes):
+        self.backend.set(entry.key, content, entry.ttl, entry.tags)
+
+    def invalidate(self, endpoint: str):
+        """
+        Invalidate the entries affected by a successful request to endpoint.
+        """
+        match = _MUTATING.match(endpoint)
+        if match is not None:
+            self.backend.invalidate(f'map:{match.group(1)}')
+            self.backend.invalidate('listmaps')
+
+    def clear(self):
+        self.backend.clear()
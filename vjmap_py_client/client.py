@@ -1,173 +1,378 @@
 import json
+import time
 import requests
-from typing import Optional, List, Tuple, Callable, Any
-from .utils import file_md5, file_object_md5
-
-
-# 定义查询实体参数基类
-class QueryParameterBase:
-    def __init__(
-            self,
-            zoom: Optional[int] = 1,
-            mapid: Optional[str] = None,
-            version: Optional[str] = None,
-            layer: Optional[str] = None,
-            limit: Optional[int] = None,
-            fields: Optional[str] = "",
-            geom: Optional[bool] = None,
-            simplifyTolerance: Optional[bool] = None,
-            useCache: Optional[bool] = False,
-            toMapCoordinate: Optional[bool] = None
-    ):
-        self.zoom = zoom
-        self.mapid = mapid
-        self.version = version
-        self.layername = layer
-        self.maxReturnCount = limit
-        self.fields = fields
-        self.geom = geom
-        self.simplifyTolerance = simplifyTolerance
-        self.useCache = useCache
-        self.toMapCoordinate = toMapCoordinate
-
-    def to_dict(self):
-        return dict((k, v) for k, v in self.__dict__.items() if v is not None)
-
-
-# 点查询实体参数类
-class PointQueryParameter(QueryParameterBase):
-    def __init__(
-            self,
-            x: float,
-            y: float,
-            pixelsize: Optional[int] = 5,
-            condition: Optional[str] = None,
-            maxGeomBytesSize: Optional[int] = None,
-            pixelToGeoLength: Optional[float] = None,
-            **kwargs
-    ):
-        super().__init__(**kwargs)
-        self.querytype = "point"
-        self.x = x
-        self.y = y
-        self.pixelsize = pixelsize
-        self.condition = condition
-        self.maxGeomBytesSize = maxGeomBytesSize
-        self.pixelToGeoLength = pixelToGeoLength
-
-
-# 矩形查询实体参数类
-class RectQueryParameter(QueryParameterBase):
-    def __init__(
-            self,
-            x1: Optional[float] = None,
-            y1: Optional[float] = None,
-            x2: Optional[float] = None,
-            y2: Optional[float] = None,
-            condition: Optional[str] = None,
-            maxGeomBytesSize: Optional[int] = None,
-            **kwargs
-    ):
-        super().__init__(**kwargs)
-        self.querytype = "rect"
-        self.x1 = x1
-        self.y1 = y1
-        self.x2 = x2
-        self.y2 = y2
-        self.condition = condition
-        self.maxGeomBytesSize = maxGeomBytesSize
-
-
-# 表达式查询实体参数类
-class ExprQueryParameter(QueryParameterBase):
-    def __init__(
-            self,
-            expr: str,
-            beginpos: Optional[int] = None,
-            **kwargs
-    ):
-        super().__init__(**kwargs)
-        self.querytype = "expresion"
-        self.expr = expr
-        self.beginpos = beginpos
-
-
-# 条件查询实体参数类
-class ConditionQueryParameter(QueryParameterBase):
-    def __init__(
-            self,
-            condition: str,
-            bounds: Optional[Tuple[float, float, float, float]] = None,
-            beginpos: Optional[int] = None,
-            includegeom: Optional[bool] = None,
-            realgeom: Optional[bool] = None,
-            isContains: Optional[bool] = None,
-            **kwargs
-    ):
-        super().__init__(**kwargs)
-        self.querytype = "condition"
-        self.condition = condition
-        self.bounds = json.dumps(bounds) if bounds else ""
-        self.beginpos = beginpos
-        self.includegeom = includegeom
-        self.realgeom = realgeom
-        self.isContains = isContains
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Callable, Any, Iterable
+from urllib.parse import urlsplit
+from .cache import TileCache, TileKey, ResponseCache, canonical_key
+from .codec import get_decoder, get_encoder
+from .columnar import FeatureColumns
+from .exceptions import error_for_response, VjmapConnectionError, VjmapTimeoutError, VjmapServerError
+from .metrics import ClientMetrics
+from .models import decode_model, Feature, QueryResult, Metadata, MapInfo
+from .parameters import QueryParameterBase, PointQueryParameter, RectQueryParameter, ExprQueryParameter, ConditionQueryParameter
+from .ratelimit import RequestLimiter
+from .resilience import RetryPolicy, CircuitBreaker
+from .singleflight import SingleFlight
+from .streaming import write_response, FeatureStream, DEFAULT_STREAM_CHUNK_SIZE
+from .transport import TransportConfig, reset_connect_time, connect_time
+from .upload import UploadStream, DEFAULT_CHUNK_SIZE, is_seekable
+from .utils import file_md5, file_object_md5, HashCache
+
+
+def _coalescible(method: str, endpoint: str, kwargs: dict) -> bool:
+    # 幂等的 GET 请求和查询实体请求可以合并
+    if kwargs.get("stream") or kwargs.get("files") or kwargs.get("data") is not None:
+        return False
+    return method.upper() == 'GET' or method.upper() == 'POST' and endpoint.startswith('/map/cmd/queryFeatures/')
 
 
 class VjmapClientBase(object):
 
-    def __init__(self, access_token, base_url='https://vjmap.com/server/api/v1'):
+    def __init__(self, access_token, base_url='https://vjmap.com/server/api/v1', tile_cache: Optional[TileCache] = None,
+                 decoder: str|Callable[[bytes], Any] = 'auto', typed: bool = False, hash_cache: Optional[HashCache] = None,
+                 response_cache: Optional[ResponseCache] = None, coalesce: bool = False, transport: Optional[TransportConfig] = None,
+                 retry: Optional[RetryPolicy] = None, circuit_breaker: Optional[CircuitBreaker] = None,
+                 limiter: Optional[RequestLimiter] = None, metrics: Optional[ClientMetrics] = None,
+                 encoder: str|Callable[[Any], str] = 'auto'):
+        """
+        Parameters
+        ----------
+        access_token : str
+            The access token of the Vjmap service.
+        base_url : str
+            The base url of the Vjmap Service-API.
+        tile_cache : TileCache, optional
+            The cache of get_map_tile and get_thumbnail.
+        decoder : str|Callable[[bytes], Any]
+            The JSON decoder: 'auto' (orjson, then msgspec, then the standard library), 'orjson', 'msgspec', 'json' or a function.
+            With 'auto', responses rejected by orjson or msgspec, e.g. holding NaN or Infinity, are decoded by the standard library.
+        typed : bool
+            Whether query_features, get_metadata and list_maps return typed models instead of dicts.
+            With the 'msgspec' decoder they are msgspec Structs decoded straight from the response.
+        hash_cache : HashCache, optional
+            The cache of the MD5 of map files, unchanged files are not hashed again.
+        response_cache : ResponseCache, optional
+            The cache of the responses of get_metadata, get_data_bounds, list_maps and query_features.
+        coalesce : bool
+            Whether concurrent identical GET requests and queryFeatures POSTs share one network request.
+            The callers then share the same decoded result, which must not be mutated.
+        transport : TransportConfig, optional
+            The connection pooling, keep-alive, timeout, compression and HTTP/2 settings.
+        retry : RetryPolicy, optional
+            The automatic retries of idempotent requests failing with a transient error.
+        circuit_breaker : CircuitBreaker, optional
+            The circuit breaker failing fast while the server keeps failing, may be shared by clients.
+        limiter : RequestLimiter, optional
+            The rate and adaptive concurrency limits per endpoint family, may be shared by clients.
+        metrics : ClientMetrics, optional
+            The latency, size, cache and retry metrics of the requests, may be shared by clients.
+        encoder : str|Callable[[Any], str]
+            The JSON encoder of the entities of update_map_batched: 'auto', 'orjson', 'msgspec', 'json' or a function returning a str.
+        """
         self.access_token = access_token
         self.base_url = base_url[:-1] if base_url.endswith('/') else base_url
         self.session = requests.Session()
         self.session.headers.update({"Token": access_token})
-
-    def _request(self, method: str, endpoint: str, as_json: bool = True, **kwargs):
+        self.transport = transport or TransportConfig()
+        adapter = self.transport.create_adapter()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.tile_cache = tile_cache
+        self.decoder = decoder
+        self.typed = typed
+        self._decode = get_decoder(decoder)
+        self._encode = get_encoder(encoder)
+        self.hash_cache = hash_cache
+        self.response_cache = response_cache
+        self.single_flight = SingleFlight() if coalesce else None
+        self.retry = retry
+        self.circuit_breaker = circuit_breaker
+        self.limiter = limiter
+        self.metrics = metrics
+        self._host = urlsplit(self.base_url).netloc
+
+    def pool_stats(self) -> dict:
+        """
+        Connection pool utilization of the Vjmap host, see :meth:`TransportAdapter.stats`.
+        """
+        adapter = self.session.get_adapter(self.base_url)
+        return adapter.stats() if hasattr(adapter, 'stats') else {}
+
+    def _request(self, method: str, endpoint: str, as_json: bool = True, model=None, **kwargs):
         kwargs["params"] = kwargs.get("params", {})
+        entry = None
+        if self.response_cache is not None and as_json:
+            entry = self.response_cache.entry(method, endpoint, kwargs["params"], kwargs.get("json"))
+            content = self.response_cache.get(entry) if entry is not None else None
+            if self.metrics is not None and entry is not None:
+                if content is not None:
+                    self.metrics.cache_hit('response')
+                else:
+                    self.metrics.cache_miss('response')
+            if content is not None:
+                return self._decode_content(content, model)
+        if self.single_flight is not None and _coalescible(method, endpoint, kwargs):
+            key = (
+                canonical_key(method, endpoint, kwargs["params"], kwargs.get("json")),
+                as_json,
+                model,
+                tuple(sorted((kwargs.get("headers") or {}).items()))
+            )
+            return self.single_flight.do(key, lambda: self._send(method, endpoint, as_json, model, entry, **kwargs))
+        return self._send(method, endpoint, as_json, model, entry, **kwargs)
+
+    def _send(self, method: str, endpoint: str, as_json: bool, model, entry, **kwargs):
         kwargs["params"]["token"] = self.access_token
         url = f"{self.base_url}{endpoint}" if endpoint.startswith('/') else f"{self.base_url}/{endpoint}"
-        response = self.session.request(method, url, **kwargs)
+        if self.metrics is None:
+            return self._handle_response(endpoint, as_json, model, entry, self._send_with_retries(method, endpoint, url, as_json, **kwargs))
+        record = self.metrics.start(method, endpoint)
+        try:
+            response = self._send_with_retries(method, endpoint, url, as_json, record=record, **kwargs)
+            return self._handle_response(endpoint, as_json, model, entry, response, record)
+        except Exception as e:
+            record.error = e
+            raise
+        finally:
+            self.metrics.finish(record)
+
+    def _handle_response(self, endpoint: str, as_json: bool, model, entry, response, record=None):
         if response.status_code == 200:
+            if self.response_cache is not None:
+                self.response_cache.invalidate(endpoint)
             if as_json:
-                return response.json()
+                if entry is not None:
+                    self.response_cache.set(entry, response.content)
+                if record is None:
+                    return self._decode_content(response.content, model)
+                started = time.perf_counter()
+                result = self._decode_content(response.content, model)
+                record.decode = time.perf_counter() - started
+                return result
             else:
                 return response
         else:
-            raise Exception(response.text)
+            # 瓦片缓存的条件请求
+            return response
+
+    def _send_with_retries(self, method: str, endpoint: str, url: str, as_json: bool, record=None, **kwargs):
+        retry = self.retry if self.retry is not None and self.retry.is_idempotent(method, endpoint) else None
+        if self.retry is not None:
+            self.retry.budget.deposit()
+        attempt = 0
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before_request(self._host)
+        while True:
+            response = None
+            token = None
+            try:
+                token = self.limiter.acquire(endpoint) if self.limiter is not None else None
+                if record is not None:
+                    reset_connect_time()
+                    started = time.perf_counter()
+                response = self.session.request(method, url, **kwargs)
+            except requests.Timeout as e:
+                error = VjmapTimeoutError(str(e))
+                error.__cause__ = e
+            except requests.RequestException as e:
+                # 连接中断、响应体不完整等均视为连接错误，地址本身有误时重试无效
+                error = VjmapConnectionError(str(e))
+                error.__cause__ = e
+                if isinstance(e, (requests.exceptions.InvalidURL, requests.exceptions.InvalidSchema, requests.exceptions.MissingSchema)):
+                    error.retryable = False
+            except BaseException:
+                # 记录失败以清除熔断器的试探状态，否则熔断器将一直打开
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record_failure(self._host)
+                raise
+            else:
+                ok = response.status_code == 200 or response.status_code == 304 and not as_json
+                error = None if ok else error_for_response(response)
+            finally:
+                if token is not None:
+                    # 超时、429 与 503 视为服务端过载
+                    overloaded = response is None or response.status_code in (429, 503)
+                    self.limiter.release(token, overloaded)
+            if record is not None:
+                record.add_attempt(response, time.perf_counter() - started, connect_time())
+            if self.circuit_breaker is not None:
+                if error is not None and (error.retryable or isinstance(error, VjmapServerError)):
+                    self.circuit_breaker.record_failure(self._host)
+                else:
+                    self.circuit_breaker.record_success(self._host)
+            if error is None:
+                return response
+            if retry is None or not error.retryable:
+                raise error
+            # 重试期间熔断器打开时不再重试
+            if self.circuit_breaker is not None and self.circuit_breaker.state(self._host) != 'closed':
+                raise error
+            if not retry.should_retry(attempt):
+                raise error
+            delay = retry.backoff(attempt, response)
+            if response is not None:
+                # 放弃的响应归还连接
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+            if record is not None:
+                record.retries = attempt
+
+    def _decode_content(self, content: bytes, model=None):
+        if model is not None and self.typed:
+            return decode_model(content, model, self.decoder)
+        return self._decode(content)
+
+    def _request_tile(self, endpoint: str, key: TileKey, destination=None, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE, **kwargs):
+        if destination is not None:
+            if self.tile_cache is None:
+                response = self._request('GET', endpoint, as_json=False, stream=True, **kwargs)
+                write_response(response, destination, chunk_size)
+                return response
+            # 需要写入缓存，响应体完整读取后再写入
+            response = self._request_tile(endpoint, key, **kwargs)
+            write_response(response, destination, chunk_size)
+            return response
+        if self.tile_cache is None:
+            return self._request('GET', endpoint, as_json=False, **kwargs)
+        cached = self.tile_cache.get(key)
+        if cached is not None:
+            if self.tile_cache.is_fresh(key, cached):
+                if self.metrics is not None:
+                    self.metrics.cache_hit('tile')
+                return self._cached_response(endpoint, cached)
+            headers = dict(kwargs.pop("headers", None) or {})
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+            kwargs["headers"] = headers
+        response = self._request('GET', endpoint, as_json=False, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            if self.metrics is not None:
+                self.metrics.cache_hit('tile')
+            self.tile_cache.touch(key)
+            return self._cached_response(endpoint, cached)
+        if self.metrics is not None:
+            self.metrics.cache_miss('tile')
+        self.tile_cache.put(
+            key,
+            response.content,
+            content_type=response.headers.get("Content-Type"),
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified")
+        )
+        return response
+
+    def _cached_response(self, endpoint: str, cached):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = cached.content
+        response._content_consumed = True
+        response.url = f"{self.base_url}{endpoint}"
+        if cached.content_type:
+            response.headers["Content-Type"] = cached.content_type
+        if cached.etag:
+            response.headers["ETag"] = cached.etag
+        if cached.last_modified:
+            response.headers["Last-Modified"] = cached.last_modified
+        return response
+
+    def _file_md5(self, file_path: str) -> str:
+        if self.hash_cache is not None:
+            return self.hash_cache.md5(file_path)
+        return file_md5(file_path)
 
     def _upload_file(self, endpoint: str, file_path: str, **kwargs):
+        if kwargs.get("skip_uploaded") and kwargs.get("md5") is None and self.hash_cache is not None:
+            kwargs["md5"] = self.hash_cache.md5(file_path)
+        key = self.hash_cache.key(file_path) if self.hash_cache is not None else None
         with open(file_path, 'rb') as file_object:
             res = self._upload_file_object(endpoint, file_object, **kwargs)
+        if self.hash_cache is not None and isinstance(res, dict) and res.get("md5"):
+            self.hash_cache.put(file_path, res["md5"], key)
         return res
 
-    def _upload_file_object(self, endpoint: str, file_object: Any, **kwargs):
-        files = {'file': file_object}
-        response = self._request('POST', endpoint, files=files, **kwargs)
-        return response
+    def _upload_file_object(self, endpoint: str, file_object: Any, chunk_size: int = DEFAULT_CHUNK_SIZE, progress: Optional[Callable[[int, Optional[int]], Any]] = None,
+                            retries: int = 0, skip_uploaded: bool = False, md5: Optional[str] = None, **kwargs):
+        start = file_object.tell() if is_seekable(file_object) else None
+        if skip_uploaded:
+            if md5 is None and start is not None:
+                md5 = file_object_md5(file_object)
+                file_object.seek(start)
+            uploaded = self._uploaded_file(md5) if md5 else None
+            if uploaded:
+                return uploaded
+        headers = dict(kwargs.pop("headers", None) or {})
+        attempt = 0
+        while True:
+            stream = UploadStream(file_object, chunk_size=chunk_size, progress=progress)
+            headers["Content-Type"] = stream.content_type
+            try:
+                # 大小未知时以 chunked 方式发送
+                data = stream if stream.size is not None else iter(stream)
+                response = self._request('POST', endpoint, data=data, headers=headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= retries or start is None:
+                    raise
+                attempt += 1
+                # 文件已完整发送时，服务端可能已经收到，先按 MD5 检查
+                if stream.finished:
+                    md5 = stream.hexdigest()
+                    uploaded = self._uploaded_file(md5)
+                    if uploaded:
+                        return uploaded
+                file_object.seek(start)
+                continue
+            if isinstance(response, dict) and stream.finished:
+                response.setdefault("md5", stream.hexdigest())
+            return response
+
+    def _uploaded_file(self, md5: str):
+        result = self._request("GET", '/map/mapfile', params={"md5": md5})
+        return result if isinstance(result, dict) and result.get("fileid") else None
 
 
 class VjmapClient(VjmapClientBase):
 
-    def upload_map(self, map_file_path: str, **kwargs):
+    def upload_map(self, map_file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, progress: Optional[Callable[[int, Optional[int]], Any]] = None,
+                   retries: int = 0, skip_uploaded: bool = False, md5: Optional[str] = None, **kwargs):
         """
         Upload a map file to the Vjmap server.
 
+        The file is streamed in chunks and hashed on the way, it is read only once unless
+        skip_uploaded has to compute the MD5 first.
+
         Parameters
         ----------
         map_file_path : str
             The path to the map file to be uploaded.
+        chunk_size : int
+            The size of the chunks read from the file and sent.
+        progress : Callable[[int, Optional[int]], Any], optional
+            Called with the bytes sent and the total size after each chunk.
+        retries : int
+            The number of times the transfer is restarted after a connection error or timeout.
+            Before restarting a fully sent file, the server is checked for it by MD5.
+        skip_uploaded : bool
+            Whether to skip the upload and return the existing file when the server already has a file with the same MD5.
+        md5 : str, optional
+            The known MD5 of the file, saves the hashing pass of skip_uploaded.
 
         Returns
         -------
         response : dict
-            The response from the server as a dict.
+            The response from the server as a dict, with the MD5 of the file computed while sending it.
 
         :link: https://vjmap.com/guide/restinterface.html#%E4%B8%8A%E4%BC%A0%E5%9B%BE%E5%BD%A2
         """
         endpoint = '/map/uploads'
-        return self._upload_file(endpoint, map_file_path, **kwargs)
+        return self._upload_file(endpoint, map_file_path, chunk_size=chunk_size, progress=progress,
+                                 retries=retries, skip_uploaded=skip_uploaded, md5=md5, **kwargs)
 
-    def upload_map_file_object(self, map_file_object: Any, **kwargs):
+    def upload_map_file_object(self, map_file_object: Any, chunk_size: int = DEFAULT_CHUNK_SIZE, progress: Optional[Callable[[int, Optional[int]], Any]] = None,
+                               retries: int = 0, skip_uploaded: bool = False, md5: Optional[str] = None, **kwargs):
         """
         Upload a map file like object to the Vjmap server.
 
@@ -175,16 +380,29 @@ class VjmapClient(VjmapClientBase):
         ----------
         map_file_object : File like object
             The map file object to be uploaded. Its open() method shall be called.
+            Retries and skip_uploaded without md5 require it to be seekable.
+        chunk_size : int
+            The size of the chunks read from the file and sent.
+        progress : Callable[[int, Optional[int]], Any], optional
+            Called with the bytes sent and the total size after each chunk.
+        retries : int
+            The number of times the transfer is restarted after a connection error or timeout.
+            Before restarting a fully sent file, the server is checked for it by MD5.
+        skip_uploaded : bool
+            Whether to skip the upload and return the existing file when the server already has a file with the same MD5.
+        md5 : str, optional
+            The known MD5 of the file, saves the hashing pass of skip_uploaded.
 
         Returns
         -------
         response : dict
-            The response from the server as a dict.
+            The response from the server as a dict, with the MD5 of the file computed while sending it.
 
         :link: https://vjmap.com/guide/restinterface.html#%E4%B8%8A%E4%BC%A0%E5%9B%BE%E5%BD%A2
         """
         endpoint = '/map/uploads'
-        return self._upload_file_object(endpoint, map_file_object, **kwargs)
+        return self._upload_file_object(endpoint, map_file_object, chunk_size=chunk_size, progress=progress,
+                                        retries=retries, skip_uploaded=skip_uploaded, md5=md5, **kwargs)
 
     def open_map(self, map_id: str, **kwargs):
         """
@@ -232,6 +450,46 @@ class VjmapClient(VjmapClientBase):
         }
         return self._request('POST', endpoint, json=json_data, **kwargs)
 
+    def update_map_batched(self, map_id: str, entities: Iterable[dict], max_chunk_bytes: int = 4194304, max_chunk_entities: Optional[int] = None,
+                           concurrency: int = 1, snapshot: Optional['EntitySnapshot'] = None, **kwargs):
+        """
+        Update a map from the Vjmap server in several requests of bounded size.
+
+        Every entity is serialized once, and the entities are sent in chunks of at most max_chunk_bytes.
+        With a snapshot, only the entities whose objectid is new or whose content changed since the snapshot
+        are sent, and the snapshot is updated after each successful chunk, so that calling again after a
+        failure only sends the remaining entities.
+
+        Every chunk is a separate update_map request that the server applies on its own, adding its entities
+        to the map. The batch is therefore not atomic: a failure leaves the earlier chunks applied, and each
+        chunk produces its own map version. ``result.responses`` holds the response of every chunk.
+
+        Parameters
+        ----------
+        map_id : str
+            The ID of the map to be updated.
+        entities : Iterable[dict]
+            The entities to be updated.
+        max_chunk_bytes : int
+            The maximum size of the entities JSON of a request. A larger entity is sent alone.
+        max_chunk_entities : int, optional
+            The maximum number of entities of a request.
+        concurrency : int
+            The number of requests in flight. Chunks are sent in order one at a time by default, use more
+            only when the server applies the chunks independently of each other.
+        snapshot : EntitySnapshot, optional
+            The entities previously submitted, updated in place.
+
+        Returns
+        -------
+        result : BatchUpdateResult
+            The number of chunks, submitted and skipped entities, and the responses of the chunks.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E6%9B%B4%E6%96%B0%E5%9B%BE%E5%BD%A2
+        """
+        from .batch import update_map_batched
+        return update_map_batched(self, map_id, entities, max_chunk_bytes, max_chunk_entities, concurrency, snapshot, **kwargs)
+
     def map_file_uploaded(self, map_file_path: str, **kwargs):
         """
         Check if a map file has been uploaded to the Vjmap server.
@@ -249,7 +507,7 @@ class VjmapClient(VjmapClientBase):
         :link: https://vjmap.com/guide/restinterface.html#%E6%A3%80%E6%9F%A5%E6%96%87%E4%BB%B6%E6%98%AF%E5%90%A6%E4%B8%8A%E4%BC%A0%E8%BF%87
         """
         endpoint = '/map/mapfile'
-        return self._request("GET", endpoint, params={"md5": file_md5(map_file_path)}, **kwargs)
+        return self._request("GET", endpoint, params={"md5": self._file_md5(map_file_path)}, **kwargs)
 
     def map_file_object_uploaded(self, map_file_object: Any, **kwargs):
         """
@@ -270,7 +528,8 @@ class VjmapClient(VjmapClientBase):
         endpoint = '/map/mapfile'
         return self._request("GET", endpoint, params={"md5": file_object_md5(map_file_object)}, **kwargs)
 
-    def get_map_tile(self, map_id: str, version: str, stylename: str, zoom: int, x: int, y: int, fileid: str, as_mvt: bool = False, **kwargs):
+    def get_map_tile(self, map_id: str, version: str, stylename: str, zoom: int, x: int, y: int, fileid: str, as_mvt: bool = False,
+                     destination=None, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE, **kwargs):
         """
         Get a map tile from the Vjmap server.
 
@@ -292,6 +551,11 @@ class VjmapClient(VjmapClientBase):
             The ID of the file to get the tile from.
         as_mvt : bool
             Whether to return the tile as a MVT tile.
+        destination : str|file|bytearray|memoryview, optional
+            A file path, writable file object or pre-allocated buffer the tile is streamed into in chunks.
+            The response then does not keep the body.
+        chunk_size : int
+            The number of bytes read at a time when streaming into destination.
 
         Returns
         -------
@@ -304,7 +568,8 @@ class VjmapClient(VjmapClientBase):
         endpoint = f'/map/tile/{map_id}/{version}/{stylename}/{zoom}/{x}/{y}'
         if as_mvt:
             endpoint += '.mvt'
-        return self._request('GET', endpoint, as_json=False, params={"tag": fileid}, **kwargs)
+        key = TileKey(map_id, version, stylename, zoom, x, y, fileid or '', 'mvt' if as_mvt else 'raster')
+        return self._request_tile(endpoint, key, destination, chunk_size, params={"tag": fileid}, **kwargs)
 
     def list_maps(self, map_id: str, version: str, **kwargs):
         """
@@ -319,15 +584,15 @@ class VjmapClient(VjmapClientBase):
 
         Returns
         -------
-        response : dict
-            The response from the server as a dict.
+        response : dict|List[MapInfo]
+            The response from the server as a dict, or a list of MapInfo when the client is typed.
 
         :link: https://vjmap.com/guide/restinterface.html#%E8%8E%B7%E5%8F%96%E5%9C%B0%E5%9B%BE%E5%88%97%E8%A1%A8
         """
         endpoint = f'/map/cmd/listmaps/{map_id}/{version}'
-        return self._request('GET', endpoint, **kwargs)
+        return self._request('GET', endpoint, model=MapInfo, **kwargs)
 
-    def query_features(self, map_id: str, version: str, parameters: PointQueryParameter|RectQueryParameter|ExprQueryParameter|ConditionQueryParameter, **kwargs):
+    def query_features(self, map_id: str, version: str, parameters: PointQueryParameter|RectQueryParameter|ExprQueryParameter|ConditionQueryParameter, columnar: bool = False, **kwargs):
         """
         Query features from the Vjmap server.
 
@@ -339,16 +604,146 @@ class VjmapClient(VjmapClientBase):
             The version of the map to query.
         parameters : PointQueryParameter|RectQueryParameter|ExprQueryParameter|ConditionQueryParameter
             The parameters to be used in the query.
+        columnar : bool
+            Whether to return the entities decoded into a FeatureColumns.
 
         Returns
         -------
-        response : dict
-            The response from the server as a dict.
+        response : dict|QueryResult|FeatureColumns
+            The response from the server as a dict, or a QueryResult when the client is typed, or its entities as a FeatureColumns.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E6%9F%A5%E8%AF%A2%E5%AE%9E%E4%BD%93
+        """
+        endpoint = f'/map/cmd/queryFeatures/{map_id}/{version}'
+        if columnar:
+            response = self._request('POST', endpoint, json=parameters.to_dict(), **kwargs)
+            return FeatureColumns.from_features(response.get("result") or [])
+        return self._request('POST', endpoint, json=parameters.to_dict(), model=QueryResult, **kwargs)
+
+    def stream_features(self, map_id: str, version: str, parameters: PointQueryParameter|RectQueryParameter|ExprQueryParameter|ConditionQueryParameter, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE, **kwargs):
+        """
+        Query features from the Vjmap server, decoding the entities one at a time while the response arrives.
+
+        Only the entity being received is kept in memory, so that huge results can be processed
+        in bounded memory. The response bypasses the response cache.
+
+        Parameters
+        ----------
+        map_id : str
+            The ID of the map to query.
+        version : str
+            The version of the map to query.
+        parameters : PointQueryParameter|RectQueryParameter|ExprQueryParameter|ConditionQueryParameter
+            The parameters to be used in the query.
+        chunk_size : int
+            The number of bytes read at a time.
+
+        Returns
+        -------
+        features : FeatureStream
+            The entities as dicts, or Features when the client is typed. The other fields of the
+            response are in its envelope once the iteration is over.
 
         :link: https://vjmap.com/guide/restinterface.html#%E6%9F%A5%E8%AF%A2%E5%AE%9E%E4%BD%93
         """
         endpoint = f'/map/cmd/queryFeatures/{map_id}/{version}'
-        return self._request('POST', endpoint, json=parameters.to_dict(), **kwargs)
+        response = self._request('POST', endpoint, as_json=False, json=parameters.to_dict(), stream=True, **kwargs)
+        return FeatureStream(response, self._decode, chunk_size, model=Feature if self.typed else None)
+
+    def iter_features(self, map_id: str, version: str, parameters: ExprQueryParameter|ConditionQueryParameter, page_size: int = 1000, prefetch: bool = True, **kwargs):
+        """
+        Iterate over all features matching a query, page by page.
+
+        Parameters
+        ----------
+        map_id : str
+            The ID of the map to query.
+        version : str
+            The version of the map to query.
+        parameters : ExprQueryParameter|ConditionQueryParameter
+            The parameters to be used in the query. Its beginpos is the start position, its limit is ignored.
+            Point and rect queries cannot be paged and raise a TypeError. A VjmapError is raised if the
+            server returns the same page twice, instead of looping forever.
+        page_size : int
+            The number of features requested per page.
+        prefetch : bool
+            Whether to request the next page while the current one is being consumed.
+
+        Returns
+        -------
+        features : Iterator[dict]
+            The features, one at a time.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E6%9F%A5%E8%AF%A2%E5%AE%9E%E4%BD%93
+        """
+        from .query import ensure_pageable, page_key
+        ensure_pageable(parameters)
+        endpoint = f'/map/cmd/queryFeatures/{map_id}/{version}'
+        data = parameters.to_dict()
+        data["maxReturnCount"] = page_size
+        beginpos = data.get("beginpos") or 0
+        first = None
+
+        def fetch(pos):
+            return self._request('POST', endpoint, json=dict(data, beginpos=pos), **kwargs).get("result") or []
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(fetch, beginpos) if prefetch else None
+            while True:
+                page = future.result() if prefetch else fetch(beginpos)
+                first = page_key(page, first)
+                beginpos += len(page)
+                more = len(page) >= page_size
+                if prefetch and more:
+                    future = executor.submit(fetch, beginpos)
+                yield from page
+                if not more:
+                    break
+
+    def query_points(self, map_id: str, version: str, points, pixelsize: Optional[int] = 5, tolerance: Optional[float] = None, cluster_size: Optional[float] = None, workers: int = 8, cluster_limit: int = 5000, query_options: Optional[dict] = None, **kwargs):
+        """
+        Hit-test many points from the Vjmap server.
+
+        By default every point is sent as a point query, queries running concurrently. Clustering is
+        opt-in: with cluster_size, points falling in the same grid cell share one rect query and each
+        feature is assigned to the points within tolerance of its bounding box. This bounding box test
+        is coarser than the geometry test of a point query, e.g. a point inside the bounds of a diagonal
+        line or near the hole of a polygon gets the feature, so clustered results may contain more
+        features. Single points, and clusters whose rect query reaches cluster_limit or returns features
+        without bounds, are sent as point queries.
+
+        Parameters
+        ----------
+        map_id : str
+            The ID of the map to query.
+        version : str
+            The version of the map to query.
+        points : Sequence[Tuple[float, float]]|numpy.ndarray
+            The (x, y) coordinates to hit-test.
+        pixelsize : int, optional
+            The pixel tolerance of the point queries.
+        tolerance : float, optional
+            The tolerance in map units used for clusters, defaults to pixelsize * pixelToGeoLength.
+        cluster_size : float, optional
+            The edge of the grid cells used to cluster points, in map units, requires a tolerance.
+            Defaults to None, sending one point query per point.
+        workers : int
+            The number of queries run in parallel.
+        cluster_limit : int
+            The maxReturnCount of the rect queries of clusters.
+        query_options : dict, optional
+            Other query parameters, e.g. zoom, layer, condition, fields, geom or pixelToGeoLength.
+
+        Returns
+        -------
+        results : list
+            The list of features hit by each point, in the order of points.
+
+        :link: https://vjmap.com/guide/restinterface.html#%E6%9F%A5%E8%AF%A2%E5%AE%9E%E4%BD%93
+        """
+        from .query import query_points
+        return query_points(self, map_id, version, points, pixelsize=pixelsize, tolerance=tolerance, cluster_size=cluster_size,
+                            workers=workers, cluster_limit=cluster_limit, query_options=query_options, **kwargs)
 
     def get_data_bounds(self, map_id: str, version: str, **kwargs):
         """
@@ -371,7 +766,8 @@ class VjmapClient(VjmapClientBase):
         endpoint = f'/map/cmd/getDataBounds/{map_id}/{version}'
         return self._request('GET', endpoint, **kwargs)
 
-    def get_thumbnail(self, map_id: str, version: str, width: int = 100, height: int = 100, dark_theme: bool = False, **kwargs):
+    def get_thumbnail(self, map_id: str, version: str, width: int = 100, height: int = 100, dark_theme: bool = False,
+                      destination=None, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE, **kwargs):
         """
         Get a thumbnail from the Vjmap server.
 
@@ -387,6 +783,11 @@ class VjmapClient(VjmapClientBase):
             The height of the thumbnail.
         dark_theme : bool
             Whether to use a dark theme for the thumbnail.
+        destination : str|file|bytearray|memoryview, optional
+            A file path, writable file object or pre-allocated buffer the thumbnail is streamed into in chunks.
+            The response then does not keep the body.
+        chunk_size : int
+            The number of bytes read at a time when streaming into destination.
 
         Returns
         -------
@@ -396,7 +797,8 @@ class VjmapClient(VjmapClientBase):
         :link: https://vjmap.com/guide/restinterface.html#%E8%8E%B7%E5%8F%96%E5%9B%BE%E7%9A%84%E7%BC%A9%E7%95%A5%E5%9B%BE
         """
         endpoint = f'/map/cmd/thumbnail/{map_id}/{version}'
-        return self._request('GET', endpoint, as_json=False, params={"width": width, "height": height, "darkTheme": dark_theme}, **kwargs)
+        key = TileKey(map_id, version, f'{width}x{height}' + ('_dark' if dark_theme else ''), 0, 0, 0, '', 'thumbnail')
+        return self._request_tile(endpoint, key, destination, chunk_size, params={"width": width, "height": height, "darkTheme": dark_theme}, **kwargs)
 
     def close_map(self, map_id: str, version: str, **kwargs):
         """
@@ -434,13 +836,13 @@ class VjmapClient(VjmapClientBase):
 
         Returns
         -------
-        response : dict
-            The response from the server as a dict.
+        response : dict|Metadata
+            The response from the server as a dict, or a Metadata when the client is typed.
 
         :link: https://vjmap.com/guide/restinterface.html#%E8%8E%B7%E5%8F%96%E5%9C%B0%E5%9B%BE%E5%85%83%E6%95%B0%E6%8D%AE
         """
         endpoint = f'/map/cmd/metadata/{map_id}/{version}'
-        return self._request('GET', endpoint, params={"geom": geom}, **kwargs)
+        return self._request('GET', endpoint, params={"geom": geom}, model=Metadata, **kwargs)
 
     def update_metadata(self, map_id: str, version: str, metadata: dict, **kwargs):
         """
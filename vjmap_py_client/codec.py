@@ -0,0 +1,66 @@
+import json
+from typing import Any, Callable, Union
+
+
+def _with_fallback(decode: Callable[[bytes], Any]) -> Callable[[bytes], Any]:
+    # orjson 与 msgspec 拒绝 NaN、Infinity 等标准库接受的值，解码失败时交给标准库
+    def loads(data):
+        try:
+            return decode(data)
+        except ValueError:
+            return json.loads(data)
+    return loads
+
+
+def get_decoder(decoder: Union[str, Callable[[bytes], Any]] = 'auto') -> Callable[[bytes], Any]:
+    """
+    获取 JSON 解码函数
+    :param decoder: 'auto' 依次尝试 orjson、msgspec 和标准库，它们无法解码的响应由标准库解码，
+                    也可以是 'orjson'、'msgspec'、'json' 或解码函数
+    :return: 将响应字节解码为 Python 对象的函数
+    """
+    if callable(decoder):
+        return decoder
+    if decoder == 'auto':
+        for name in ('orjson', 'msgspec'):
+            try:
+                return _with_fallback(get_decoder(name))
+            except ImportError:
+                pass
+        return json.loads
+    if decoder == 'orjson':
+        import orjson
+        return orjson.loads
+    if decoder == 'msgspec':
+        import msgspec
+        return msgspec.json.Decoder().decode
+    if decoder == 'json':
+        return json.loads
+    raise ValueError(f"Unknown decoder: {decoder}")
+
+
+def get_encoder(encoder: Union[str, Callable[[Any], str]] = 'auto') -> Callable[[Any], str]:
+    """
+    获取 JSON 编码函数
+    :param encoder: 'auto' 依次尝试 orjson、msgspec 和标准库，也可以是 'orjson'、'msgspec'、'json' 或编码函数
+    :return: 将 Python 对象编码为紧凑 JSON 字符串的函数
+    """
+    if callable(encoder):
+        return encoder
+    if encoder == 'auto':
+        for name in ('orjson', 'msgspec'):
+            try:
+                return get_encoder(name)
+            except ImportError:
+                pass
+        return get_encoder('json')
+    if encoder == 'orjson':
+        import orjson
+        return lambda obj: orjson.dumps(obj).decode('utf-8')
+    if encoder == 'msgspec':
+        import msgspec
+        encode = msgspec.json.Encoder().encode
+        return lambda obj: encode(obj).decode('utf-8')
+    if encoder == 'json':
+        return lambda obj: json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+    raise ValueError(f"Unknown encoder: {encoder}")
@@ -0,0 +1,115 @@
+from array import array
+from typing import Iterable
+from .utils import parse_bounds
+
+
+class FeatureColumns(object):
+    """
+    Query results decoded into columns.
+
+    Attributes are kept in compact buffers instead of one dict per entity:
+    ``objectids``, ``names`` and ``layernames`` are lists, ``bounds`` is a flat float64 buffer of
+    ``(x1, y1, x2, y2)`` per entity (NaN when missing), and the coordinates of the geometry of
+    entity ``i`` are ``coords[2 * offsets[i]:2 * offsets[i + 1]]`` as interleaved x, y float64.
+    """
+
+    def __init__(self):
+        self.objectids = []
+        self.names = []
+        self.layernames = []
+        self.bounds = array('d')
+        self.coords = array('d')
+        self.offsets = array('q', [0])
+
+    def __len__(self):
+        return len(self.objectids)
+
+    @classmethod
+    def from_features(cls, features: Iterable[dict]) -> 'FeatureColumns':
+        """
+        Build the columns from entities, e.g. the ``result`` of query_features or iter_features.
+        """
+        columns = cls()
+        columns.extend(features)
+        return columns
+
+    def extend(self, features: Iterable[dict]):
+        nan = float('nan')
+        for feature in features:
+            self.objectids.append(feature.get("objectid"))
+            self.names.append(feature.get("name"))
+            self.layernames.append(feature.get("layername"))
+            bounds = feature.get("bounds")
+            self.bounds.extend(parse_bounds(bounds) if bounds else (nan, nan, nan, nan))
+            geom = feature.get("geom")
+            if geom:
+                _flatten_coords(geom, self.coords)
+            self.offsets.append(len(self.coords) // 2)
+
+    def to_numpy(self) -> dict:
+        """
+        Export the columns as NumPy arrays, the numeric buffers are not copied.
+
+        Returns
+        -------
+        columns : dict
+            ``objectid``, ``name`` and ``layername`` object arrays, ``bounds`` a (n, 4) float64 array,
+            ``coords`` a (m, 2) float64 array and ``offsets`` a (n + 1,) int64 array.
+        """
+        import numpy as np
+        return {
+            "objectid": np.array(self.objectids, dtype=object),
+            "name": np.array(self.names, dtype=object),
+            "layername": np.array(self.layernames, dtype=object),
+            "bounds": np.frombuffer(self.bounds, dtype=np.float64).reshape(-1, 4),
+            "coords": np.frombuffer(self.coords, dtype=np.float64).reshape(-1, 2),
+            "offsets": np.frombuffer(self.offsets, dtype=np.int64),
+        }
+
+    def to_arrow(self):
+        """
+        Export the columns as a :class:`pyarrow.Table` with one row per entity.
+        The geometry is a ``list<fixed_size_list<double, 2>>`` column named ``coords``.
+        """
+        import pyarrow as pa
+        bounds = pa.py_buffer(self.bounds)
+        n = len(self)
+        coords = pa.FixedSizeListArray.from_arrays(
+            pa.Array.from_buffers(pa.float64(), len(self.coords), [None, pa.py_buffer(self.coords)]), 2
+        )
+        geometry = pa.ListArray.from_arrays(
+            pa.Array.from_buffers(pa.int32(), n + 1, [None, pa.py_buffer(array('i', self.offsets))]), coords
+        )
+        columns = {
+            "objectid": pa.array(self.objectids),
+            "name": pa.array(self.names),
+            "layername": pa.array(self.layernames),
+        }
+        for i, field in enumerate(("x1", "y1", "x2", "y2")):
+            # 从交错的 bounds 缓冲区中按步长取出各列
+            columns[field] = pa.Array.from_buffers(pa.float64(), 4 * n, [None, bounds])[i::4]
+        columns["coords"] = geometry
+        return pa.table(columns)
+
+    def to_parquet(self, path: str, **kwargs):
+        """
+        Write the columns to a Parquet file, kwargs are passed to :func:`pyarrow.parquet.write_table`.
+        """
+        import pyarrow.parquet as pq
+        pq.write_table(self.to_arrow(), path, **kwargs)
+
+
+def _flatten_coords(value, out: array):
+    # 递归展开 GeoJSON 风格的几何，收集所有 (x, y) 坐标
+    if isinstance(value, dict):
+        for key in ("coordinates", "geometries", "geometry", "points"):
+            if key in value:
+                _flatten_coords(value[key], out)
+        return
+    if isinstance(value, (list, tuple)) and value:
+        if isinstance(value[0], (int, float)):
+            out.append(float(value[0]))
+            out.append(float(value[1]) if len(value) > 1 else 0.0)
+        else:
+            for item in value:
+                _flatten_coords(item, out)
@@ -0,0 +1,81 @@
+import requests
+
+
+# Vjmap 客户端异常基类，str(e) 为服务端返回的内容
+class VjmapError(Exception):
+    retryable = False
+
+    def __init__(self, message: str = '', status_code: int = None, response=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = response
+
+
+# 服务端返回非 200 状态码
+class VjmapHTTPError(VjmapError):
+    pass
+
+
+# 4xx 错误，请求本身有误，重试无效
+class VjmapClientError(VjmapHTTPError):
+    pass
+
+
+# 401/403 令牌无效或无权限
+class VjmapAuthError(VjmapClientError):
+    pass
+
+
+# 404 地图或资源不存在
+class VjmapNotFoundError(VjmapClientError):
+    pass
+
+
+# 429 请求过多，可稍后重试
+class VjmapRateLimitError(VjmapClientError):
+    retryable = True
+
+
+# 5xx 服务端错误，502/503/504 为暂时性错误，可重试
+class VjmapServerError(VjmapHTTPError):
+
+    @property
+    def retryable(self):
+        return self.status_code in (502, 503, 504)
+
+
+# 网络连接失败，可重试
+class VjmapConnectionError(VjmapError, requests.ConnectionError):
+    retryable = True
+
+
+# 请求超时，可重试
+class VjmapTimeoutError(VjmapError, requests.Timeout):
+    retryable = True
+
+
+# 熔断器打开，请求未发送
+class CircuitOpenError(VjmapError):
+    pass
+
+
+def error_for_response(response) -> VjmapHTTPError:
+    """
+    根据响应的状态码创建对应的异常
+    :param response: 非 200 的响应
+    :return: 异常对象
+    """
+    status_code = response.status_code
+    if status_code in (401, 403):
+        cls = VjmapAuthError
+    elif status_code == 404:
+        cls = VjmapNotFoundError
+    elif status_code == 429:
+        cls = VjmapRateLimitError
+    elif 400 <= status_code < 500:
+        cls = VjmapClientError
+    elif status_code >= 500:
+        cls = VjmapServerError
+    else:
+        cls = VjmapHTTPError
+    return cls(response.text, status_code=status_code, response=response)
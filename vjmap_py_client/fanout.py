@@ -0,0 +1,170 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+from .exceptions import VjmapTimeoutError
+
+
+class FanOutResult(object):
+    """
+    The outcome of an operation on one (map_id, version) target: its value, or the error it raised.
+    """
+
+    __slots__ = ('index', 'map_id', 'version', 'value', 'error', 'elapsed')
+
+    def __init__(self, index: int, map_id: str, version: str, value: Any = None, error: Optional[BaseException] = None, elapsed: float = 0.0):
+        self.index = index
+        self.map_id = map_id
+        self.version = version
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def target(self) -> Tuple[str, str]:
+        return self.map_id, self.version
+
+    def __repr__(self):
+        outcome = f"error={self.error!r}" if self.error is not None else "ok"
+        return f"FanOutResult(map_id={self.map_id!r}, version={self.version!r}, {outcome}, elapsed={self.elapsed:.3f})"
+
+
+class FanOut(object):
+    """
+    Run one client operation on many (map_id, version) targets with bounded parallelism.
+
+    The operation is the name of a :class:`VjmapClient` method taking map_id and version first
+    (``'get_metadata'``, ``'get_thumbnail'``, ``'query_features'``, ``'close_map'``, ``'delete_map'``, ...),
+    or a function called as ``operation(client, map_id, version, *args, **kwargs)``.
+    Failures are collected per target instead of stopping the run, unless ``raise_errors`` is set.
+    """
+
+    def __init__(self, client, workers: int = 8, timeout: Optional[float] = None, raise_errors: bool = False):
+        """
+        Parameters
+        ----------
+        client : VjmapClient
+            The client the operation runs with.
+        workers : int
+            The number of targets processed in parallel.
+        timeout : float, optional
+            The seconds allowed per target. It is also passed as the request timeout of client methods,
+            a target exceeding it fails with a VjmapTimeoutError.
+        raise_errors : bool
+            Whether the first failure stops the run and is raised.
+        """
+        self.client = client
+        self.workers = workers
+        self.timeout = timeout
+        self.raise_errors = raise_errors
+
+    def run(self, targets: Iterable[Tuple[str, str]], operation: str|Callable[..., Any], *args, ordered: bool = False, **kwargs) -> Iterator[FanOutResult]:
+        """
+        Run the operation on every target.
+
+        Parameters
+        ----------
+        targets : Iterable[Tuple[str, str]]
+            The (map_id, version) targets.
+        operation : str|Callable
+            The client method name, or a function called with the client, map_id, version, args and kwargs.
+        ordered : bool
+            Whether the results are yielded in the order of the targets instead of as they complete.
+
+        Returns
+        -------
+        results : Iterator[FanOutResult]
+            One result per target.
+        """
+        if isinstance(operation, str):
+            method = getattr(self.client, operation)
+            if self.timeout is not None and "timeout" not in kwargs:
+                kwargs["timeout"] = self.timeout
+
+            def call(map_id, version):
+                return method(map_id, version, *args, **kwargs)
+        else:
+            def call(map_id, version):
+                return operation(self.client, map_id, version, *args, **kwargs)
+
+        targets = iter(enumerate(targets))
+        max_pending = self.workers * 2
+        started = {}
+        pending = {}
+        completed = {}
+        next_index = 0
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        def task(index, map_id, version):
+            started[index] = time.monotonic()
+            return call(map_id, version)
+
+        try:
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) + len(completed) < max_pending:
+                    item = next(targets, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    index, (map_id, version) = item
+                    pending[executor.submit(task, index, map_id, version)] = (index, map_id, version)
+                if not pending and not completed:
+                    break
+                finished = []
+                if pending:
+                    done, _ = wait(pending, timeout=self._wait_timeout(pending, started), return_when=FIRST_COMPLETED)
+                    now = time.monotonic()
+                    for future in done:
+                        index, map_id, version = pending.pop(future)
+                        try:
+                            value, error = future.result(), None
+                        except Exception as e:
+                            value, error = None, e
+                        finished.append(FanOutResult(index, map_id, version, value, error, now - started.pop(index, now)))
+                    for future, (index, map_id, version) in list(pending.items()):
+                        if self.timeout is not None and index in started and now - started[index] >= self.timeout:
+                            # 超时的任务无法中断，放弃其结果
+                            del pending[future]
+                            error = VjmapTimeoutError(f"{map_id}/{version} did not complete within {self.timeout}s")
+                            finished.append(FanOutResult(index, map_id, version, None, error, now - started.pop(index)))
+                for result in finished:
+                    if result.error is not None and self.raise_errors:
+                        raise result.error
+                    if ordered:
+                        completed[result.index] = result
+                    else:
+                        yield result
+                while next_index in completed:
+                    yield completed.pop(next_index)
+                    next_index += 1
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _wait_timeout(self, pending: dict, started: dict) -> Optional[float]:
+        if self.timeout is None:
+            return None
+        deadlines = [started[index] + self.timeout for index, _, _ in pending.values() if index in started]
+        # 尚未开始的任务没有截止时间，稍后再检查
+        return max(min(deadlines) - time.monotonic(), 0.0) if deadlines else self.timeout
+
+    def collect(self, targets: Iterable[Tuple[str, str]], operation: str|Callable[..., Any], *args, **kwargs) -> Tuple[Dict[Tuple[str, str], Any], Dict[Tuple[str, str], BaseException]]:
+        """
+        Run the operation on every target, see :meth:`run`.
+
+        Returns
+        -------
+        results : Tuple[dict, dict]
+            The values of the successful targets and the errors of the failed ones, keyed by (map_id, version).
+        """
+        values = {}
+        errors = {}
+        for result in self.run(targets, operation, *args, **kwargs):
+            if result.ok:
+                values[result.target] = result.value
+            else:
+                errors[result.target] = result.error
+        return values, errors
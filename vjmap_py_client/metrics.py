@@ -0,0 +1,222 @@
+import bisect
+import threading
+import time
+from typing import Any, Callable, Iterable, Optional
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ('connect', 'ttfb', 'download', 'decode', 'total')
+
+
+def endpoint_name(endpoint: str) -> str:
+    """
+    接口名称，用作指标的标签，不包含地图 ID 等参数
+    :param endpoint: 接口路径，如 /map/cmd/queryFeatures/mapid/v1
+    :return: 如 queryFeatures
+    """
+    parts = [part for part in endpoint.split('/') if part]
+    if len(parts) > 2 and parts[0] == 'map' and parts[1] == 'cmd':
+        return parts[2]
+    if len(parts) > 1 and parts[0] == 'map':
+        return parts[1]
+    return parts[0] if parts else ''
+
+
+class Histogram(object):
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        The upper bound of the bucket holding the q quantile, None without observations.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float('inf')
+        return float('inf')
+
+
+class RequestRecord(object):
+    """
+    The timings in seconds and sizes of one client request, retries included.
+    """
+
+    __slots__ = ('method', 'endpoint', 'name', 'start_time_ns', 'status_code', 'retries', 'connect', 'ttfb', 'download',
+                 'decode', 'total', 'request_bytes', 'response_bytes', 'error', '_started')
+
+    def __init__(self, method: str, endpoint: str):
+        self.method = method
+        self.endpoint = endpoint
+        self.name = endpoint_name(endpoint)
+        self.start_time_ns = time.time_ns()
+        self.status_code = None
+        self.retries = 0
+        self.connect = 0.0
+        self.ttfb = 0.0
+        self.download = 0.0
+        self.decode = 0.0
+        self.total = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.error = None
+        self._started = time.perf_counter()
+
+    def add_attempt(self, response, elapsed: float, connect: float):
+        if response is None:
+            self.connect += connect
+            return
+        # elapsed 为发送请求到解析完响应头的时间，其余为读取响应体的时间
+        headers_time = response.elapsed.total_seconds() if response.elapsed else elapsed
+        self.connect += connect
+        self.ttfb += max(headers_time - connect, 0.0)
+        self.download += max(elapsed - headers_time, 0.0)
+        self.status_code = response.status_code
+        self.request_bytes += int(response.request.headers.get('Content-Length') or 0) if response.request is not None else 0
+        if response._content_consumed:
+            self.response_bytes += len(response.content)
+        else:
+            # 流式响应不在此读取响应体
+            self.response_bytes += int(response.headers.get('Content-Length') or 0)
+
+
+class ClientMetrics(object):
+    """
+    Request metrics of one or more clients: latency histograms per endpoint and phase (connect,
+    ttfb, download, decode and total), request and response bytes, cache hits and misses and retries.
+
+    Every finished request is also passed to the exporters, callables taking a :class:`RequestRecord`,
+    e.g. an :class:`OpenTelemetryExporter`. :meth:`prometheus` renders the metrics in the Prometheus text format.
+    """
+
+    def __init__(self, exporters: Iterable[Callable[[RequestRecord], Any]] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.exporters = list(exporters)
+        self.buckets = tuple(buckets)
+        self.histograms = {}
+        self.requests = {}
+        self.request_bytes = {}
+        self.response_bytes = {}
+        self.retries = {}
+        self.cache_hits = {}
+        self.cache_misses = {}
+        self._lock = threading.Lock()
+
+    def start(self, method: str, endpoint: str) -> RequestRecord:
+        return RequestRecord(method, endpoint)
+
+    def finish(self, record: RequestRecord):
+        record.total = time.perf_counter() - record._started
+        name = record.name
+        status = str(record.status_code) if record.error is None else type(record.error).__name__
+        with self._lock:
+            for phase in PHASES:
+                histogram = self.histograms.get((name, phase))
+                if histogram is None:
+                    histogram = self.histograms[(name, phase)] = Histogram(self.buckets)
+                histogram.observe(getattr(record, phase))
+            key = (name, record.method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.request_bytes[name] = self.request_bytes.get(name, 0) + record.request_bytes
+            self.response_bytes[name] = self.response_bytes.get(name, 0) + record.response_bytes
+            if record.retries:
+                self.retries[name] = self.retries.get(name, 0) + record.retries
+        for exporter in self.exporters:
+            exporter(record)
+
+    def cache_hit(self, cache: str):
+        with self._lock:
+            self.cache_hits[cache] = self.cache_hits.get(cache, 0) + 1
+
+    def cache_miss(self, cache: str):
+        with self._lock:
+            self.cache_misses[cache] = self.cache_misses.get(cache, 0) + 1
+
+    def histogram(self, endpoint: str, phase: str = 'total') -> Optional[Histogram]:
+        """
+        The latency histogram of an endpoint name (e.g. 'queryFeatures' or 'tile') and phase.
+        """
+        return self.histograms.get((endpoint, phase))
+
+    def prometheus(self, prefix: str = 'vjmap') -> str:
+        """
+        The metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            lines.append(f'# HELP {prefix}_request_duration_seconds Request latency by endpoint and phase.')
+            lines.append(f'# TYPE {prefix}_request_duration_seconds histogram')
+            for (name, phase), histogram in sorted(self.histograms.items()):
+                labels = f'endpoint="{name}",phase="{phase}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{prefix}_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f'{prefix}_request_duration_seconds_sum{{{labels}}} {histogram.sum!r}')
+                lines.append(f'{prefix}_request_duration_seconds_count{{{labels}}} {histogram.count}')
+            _counter(lines, f'{prefix}_requests_total', 'Requests by endpoint, method and status.',
+                     [(f'endpoint="{n}",method="{m}",status="{s}"', v) for (n, m, s), v in sorted(self.requests.items())])
+            _counter(lines, f'{prefix}_request_bytes_total', 'Request body bytes by endpoint.',
+                     [(f'endpoint="{n}"', v) for n, v in sorted(self.request_bytes.items())])
+            _counter(lines, f'{prefix}_response_bytes_total', 'Response body bytes by endpoint.',
+                     [(f'endpoint="{n}"', v) for n, v in sorted(self.response_bytes.items())])
+            _counter(lines, f'{prefix}_retries_total', 'Retries by endpoint.',
+                     [(f'endpoint="{n}"', v) for n, v in sorted(self.retries.items())])
+            _counter(lines, f'{prefix}_cache_hits_total', 'Cache hits by cache.',
+                     [(f'cache="{c}"', v) for c, v in sorted(self.cache_hits.items())])
+            _counter(lines, f'{prefix}_cache_misses_total', 'Cache misses by cache.',
+                     [(f'cache="{c}"', v) for c, v in sorted(self.cache_misses.items())])
+        return '\n'.join(lines) + '\n'
+
+
+def _counter(lines: list, name: str, help_text: str, samples):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} counter')
+    for labels, value in samples:
+        lines.append(f'{name}{{{labels}}} {value}')
+
+
+class OpenTelemetryExporter(object):
+    """
+    Export each request as an OpenTelemetry span, requires ``opentelemetry-api``.
+    The phases are recorded as span attributes.
+    """
+
+    def __init__(self, tracer=None):
+        if tracer is None:
+            from opentelemetry import trace
+            tracer = trace.get_tracer('vjmap_py_client')
+        self.tracer = tracer
+
+    def __call__(self, record: RequestRecord):
+        from opentelemetry.trace import Status, StatusCode
+        span = self.tracer.start_span(f'vjmap {record.name}', start_time=record.start_time_ns, attributes={
+            'http.request.method': record.method,
+            'url.path': record.endpoint,
+            'vjmap.endpoint': record.name,
+            'vjmap.retries': record.retries,
+            'vjmap.connect_seconds': record.connect,
+            'vjmap.ttfb_seconds': record.ttfb,
+            'vjmap.download_seconds': record.download,
+            'vjmap.decode_seconds': record.decode,
+            'http.request.body.size': record.request_bytes,
+            'http.response.body.size': record.response_bytes,
+        })
+        if record.status_code is not None:
+            span.set_attribute('http.response.status_code', record.status_code)
+        if record.error is not None:
+            span.record_exception(record.error)
+            span.set_status(Status(StatusCode.ERROR, str(record.error)))
+        span.end(end_time=record.start_time_ns + int(record.total * 1e9))
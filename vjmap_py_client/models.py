@@ -0,0 +1,93 @@
+from typing import Any, Callable, List, Optional, Union
+from .codec import get_decoder
+
+
+# 类型化结果模型基类，未声明的字段保存在 extra 中
+class ModelBase(object):
+    __slots__ = ('extra',)
+    _fields = ()
+    _nested = {}
+
+    def __init__(self, **kwargs):
+        for field in self._fields:
+            setattr(self, field, kwargs.pop(field, None))
+        self.extra = kwargs
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        data = dict(data)
+        for field, model in cls._nested.items():
+            if data.get(field) is not None:
+                data[field] = [model.from_dict(item) for item in data[field]]
+        return cls(**data)
+
+    def to_dict(self) -> dict:
+        data = dict(self.extra)
+        for field in self._fields:
+            value = getattr(self, field)
+            if field in self._nested and value is not None:
+                value = [item.to_dict() for item in value]
+            data[field] = value
+        return data
+
+    def __repr__(self):
+        fields = ", ".join(f"{field}={getattr(self, field)!r}" for field in self._fields[:3])
+        return f"{type(self).__name__}({fields}, ...)"
+
+
+# 查询返回的实体
+class Feature(ModelBase):
+    _fields = ('objectid', 'id', 'name', 'layername', 'bounds', 'color', 'geom')
+    __slots__ = _fields
+
+
+# 查询实体的结果
+class QueryResult(ModelBase):
+    _fields = ('recordCount', 'result')
+    _nested = {'result': Feature}
+    __slots__ = _fields
+
+
+# 地图元数据
+class Metadata(ModelBase):
+    _fields = ('mapid', 'version', 'fileid', 'bounds', 'layers')
+    __slots__ = _fields
+
+
+# 地图列表中的地图
+class MapInfo(ModelBase):
+    _fields = ('mapid', 'version', 'fileid', 'status')
+    __slots__ = _fields
+
+
+_structs = {}
+
+
+def _msgspec_struct(model):
+    # 按模型字段生成对应的 msgspec Struct，直接从字节解码
+    import msgspec
+    if model not in _structs:
+        fields = []
+        for field in model._fields:
+            field_type = List[_msgspec_struct(model._nested[field])] if field in model._nested else Any
+            fields.append((field, Optional[field_type], None))
+        _structs[model] = msgspec.defstruct(model.__name__, fields)
+    return _structs[model]
+
+
+def decode_model(content: bytes, model, decoder: Union[str, Callable[[bytes], Any]] = 'auto'):
+    """
+    将响应字节解码为类型化结果
+    :param content: 响应字节
+    :param model: 模型类，如 QueryResult、Metadata、MapInfo
+    :param decoder: 解码器，为 'msgspec' 时解码为 msgspec Struct（不保留 extra），否则解码为模型实例
+    :return: 模型实例，响应为数组时返回模型实例列表
+    """
+    if decoder == 'msgspec':
+        import msgspec
+        struct = _msgspec_struct(model)
+        return msgspec.json.decode(content, type=Union[struct, List[struct]])
+    data = get_decoder(decoder)(content)
+    if isinstance(data, list):
+        return [model.from_dict(item) for item in data]
+    return model.from_dict(data)
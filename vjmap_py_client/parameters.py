@@ -0,0 +1,151 @@
+import json
+from typing import Optional, Tuple
+
+
+def _compile_to_dict(fields: Tuple[str, ...], has_dict: bool):
+    """
+    生成逐个读取字段的 to_dict 函数，比遍历字段的推导式快一倍以上
+    :param fields: 字段名，按序列化的顺序
+    :param has_dict: 实例是否有 __dict__，其中的额外属性追加在最后
+    :return: to_dict 函数
+    """
+    lines = ["def to_dict(self):", "    d = {}"]
+    for field in fields:
+        lines += [f"    v = self.{field}", "    if v is not None:", f"        d[{field!r}] = v"]
+    if has_dict:
+        lines += ["    for k, v in self.__dict__.items():", "        if v is not None:", "            d[k] = v"]
+    lines.append("    return d")
+    namespace = {}
+    exec('\n'.join(lines), namespace)
+    return namespace['to_dict']
+
+
+# 定义查询实体参数基类
+class QueryParameterBase(object):
+    # 保留 __dict__，未声明的属性（如 RectQueryParameter 的 isContains）仍可设置并随 to_dict 发送
+    __slots__ = ('zoom', 'mapid', 'version', 'layername', 'maxReturnCount', 'fields', 'geom', 'simplifyTolerance', 'useCache', 'toMapCoordinate', '__dict__')
+
+    def __init__(
+            self,
+            zoom: Optional[int] = 1,
+            mapid: Optional[str] = None,
+            version: Optional[str] = None,
+            layer: Optional[str] = None,
+            limit: Optional[int] = None,
+            fields: Optional[str] = "",
+            geom: Optional[bool] = None,
+            simplifyTolerance: Optional[bool] = None,
+            useCache: Optional[bool] = False,
+            toMapCoordinate: Optional[bool] = None
+    ):
+        self.zoom = zoom
+        self.mapid = mapid
+        self.version = version
+        self.layername = layer
+        self.maxReturnCount = limit
+        self.fields = fields
+        self.geom = geom
+        self.simplifyTolerance = simplifyTolerance
+        self.useCache = useCache
+        self.toMapCoordinate = toMapCoordinate
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # 每个子类的字段顺序固定，序列化函数在定义类时生成一次
+        fields = []
+        for klass in reversed(cls.__mro__):
+            for field in klass.__dict__.get('__slots__', ()):
+                if field not in fields and field != '__dict__':
+                    fields.append(field)
+        cls.to_dict = _compile_to_dict(tuple(fields), cls.__dictoffset__ != 0)
+
+
+QueryParameterBase.to_dict = _compile_to_dict(QueryParameterBase.__slots__[:-1], True)
+
+
+# 点查询实体参数类
+class PointQueryParameter(QueryParameterBase):
+    __slots__ = ('querytype', 'x', 'y', 'pixelsize', 'condition', 'maxGeomBytesSize', 'pixelToGeoLength')
+
+    def __init__(
+            self,
+            x: float,
+            y: float,
+            pixelsize: Optional[int] = 5,
+            condition: Optional[str] = None,
+            maxGeomBytesSize: Optional[int] = None,
+            pixelToGeoLength: Optional[float] = None,
+            **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.querytype = "point"
+        self.x = x
+        self.y = y
+        self.pixelsize = pixelsize
+        self.condition = condition
+        self.maxGeomBytesSize = maxGeomBytesSize
+        self.pixelToGeoLength = pixelToGeoLength
+
+
+# 矩形查询实体参数类
+class RectQueryParameter(QueryParameterBase):
+    __slots__ = ('querytype', 'x1', 'y1', 'x2', 'y2', 'condition', 'maxGeomBytesSize')
+
+    def __init__(
+            self,
+            x1: Optional[float] = None,
+            y1: Optional[float] = None,
+            x2: Optional[float] = None,
+            y2: Optional[float] = None,
+            condition: Optional[str] = None,
+            maxGeomBytesSize: Optional[int] = None,
+            **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.querytype = "rect"
+        self.x1 = x1
+        self.y1 = y1
+        self.x2 = x2
+        self.y2 = y2
+        self.condition = condition
+        self.maxGeomBytesSize = maxGeomBytesSize
+
+
+# 表达式查询实体参数类
+class ExprQueryParameter(QueryParameterBase):
+    __slots__ = ('querytype', 'expr', 'beginpos')
+
+    def __init__(
+            self,
+            expr: str,
+            beginpos: Optional[int] = None,
+            **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.querytype = "expresion"
+        self.expr = expr
+        self.beginpos = beginpos
+
+
+# 条件查询实体参数类
+class ConditionQueryParameter(QueryParameterBase):
+    __slots__ = ('querytype', 'condition', 'bounds', 'beginpos', 'includegeom', 'realgeom', 'isContains')
+
+    def __init__(
+            self,
+            condition: str,
+            bounds: Optional[Tuple[float, float, float, float]] = None,
+            beginpos: Optional[int] = None,
+            includegeom: Optional[bool] = None,
+            realgeom: Optional[bool] = None,
+            isContains: Optional[bool] = None,
+            **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.querytype = "condition"
+        self.condition = condition
+        self.bounds = json.dumps(bounds) if bounds else ""
+        self.beginpos = beginpos
+        self.includegeom = includegeom
+        self.realgeom = realgeom
+        self.isContains = isContains
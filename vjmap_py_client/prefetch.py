@@ -0,0 +1,343 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional, Tuple
+from .cache import TileKey
+from .ratelimit import TokenBucket
+from .tiles import iter_tiles, tile_range
+
+# 预置瓦片的优先级低于所有视口附近的瓦片
+_SEED_SCORE = 1000.0
+
+
+class PrefetchStats(object):
+
+    def __init__(self):
+        self.views = 0
+        self.hits = 0
+        self.scheduled = 0
+        self.fetched = 0
+        self.cached = 0
+        self.cancelled = 0
+        self.dropped = 0
+        self.failed = 0
+        self.bytes = 0
+        self.errors = deque(maxlen=100)
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        The fraction of the viewed tiles that had been prefetched.
+        """
+        return self.hits / self.views if self.views else 0.0
+
+    def __repr__(self):
+        return (f"PrefetchStats(views={self.views}, hits={self.hits}, scheduled={self.scheduled}, fetched={self.fetched}, "
+                f"cached={self.cached}, cancelled={self.cancelled}, dropped={self.dropped}, failed={self.failed}, bytes={self.bytes})")
+
+
+class _Viewport(object):
+    """
+    The tiles recently viewed at the current zoom level of one map/version/style.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self.zoom = None
+        self.views = deque()
+        self.last = None
+
+    def add(self, z: int, x: int, y: int, now: float) -> Optional[Tuple[int, int]]:
+        # 返回相对上一次请求的移动方向
+        motion = None
+        if z != self.zoom:
+            self.zoom = z
+            self.views.clear()
+        elif self.last is not None:
+            motion = (x - self.last[0], y - self.last[1])
+        self.views.append((now, x, y))
+        self.last = (x, y)
+        self._expire(now)
+        return motion
+
+    def _expire(self, now: float):
+        while len(self.views) > 1 and now - self.views[0][0] > self.window:
+            self.views.popleft()
+
+    def bounds(self, now: float) -> Tuple[int, int, int, int]:
+        self._expire(now)
+        xs = [x for _, x, _ in self.views]
+        ys = [y for _, _, y in self.views]
+        return min(xs), min(ys), max(xs), max(ys)
+
+
+class TilePrefetcher(object):
+    """
+    Warm the tile cache of a client with the tiles a viewer is likely to request next.
+
+    Each tile requested through :meth:`get_tile` (or reported with :meth:`view`) schedules its
+    neighbours within ``radius`` at the same zoom level, favouring the direction of panning, then the
+    tiles covering it ``zoom_levels`` levels above and below. Background workers fetch them by
+    priority through ``client.get_map_tile``, which stores them in the client's tile cache, so the
+    viewer's next requests are served locally.
+
+    The viewport of each map/version/style is the area of the tiles viewed in the last ``window``
+    seconds at the current zoom level. Scheduled tiles no longer near it when their turn comes, e.g.
+    after the viewer panned away or zoomed, are cancelled. ``bandwidth`` caps the bytes per second
+    fetched by the workers, so that prefetching does not compete with the viewer's own requests.
+    """
+
+    def __init__(self, client, workers: int = 4, radius: int = 1, zoom_levels: int = 1, bandwidth: Optional[float] = None,
+                 window: float = 2.0, max_queue: int = 1024, min_zoom: int = 0, max_zoom: Optional[int] = None, zoom_penalty: float = 1.5):
+        """
+        Parameters
+        ----------
+        client : VjmapClient
+            The client used to fetch the tiles, which must have a tile cache.
+        workers : int
+            The number of worker threads fetching tiles.
+        radius : int
+            The number of tiles around the viewport prefetched at the same zoom level.
+        zoom_levels : int
+            The number of zoom levels above and below the viewport prefetched.
+        bandwidth : float, optional
+            The maximum bytes per second fetched by the workers, None for no limit.
+        window : float
+            The seconds during which a viewed tile is part of the viewport.
+        max_queue : int
+            The maximum number of scheduled tiles, the lowest priority ones are dropped beyond.
+        min_zoom : int
+            The lowest zoom level prefetched.
+        max_zoom : int, optional
+            The highest zoom level prefetched, None for no limit.
+        zoom_penalty : float
+            The priority of the tiles one zoom level away, relative to the tiles one tile away at the same level.
+        """
+        if client.tile_cache is None:
+            raise ValueError("The client must have a tile_cache to prefetch tiles into")
+        self.client = client
+        self.radius = radius
+        self.zoom_levels = zoom_levels
+        self.window = window
+        self.max_queue = max_queue
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.zoom_penalty = zoom_penalty
+        self.budget = TokenBucket(bandwidth, bandwidth) if bandwidth else None
+        self.stats = PrefetchStats()
+        self._viewports = {}
+        self._heap = []
+        self._queued = set()
+        self._inflight = set()
+        self._known = OrderedDict()
+        self._seeds = deque()
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def get_tile(self, map_id: str, version: str, stylename: str, zoom: int, x: int, y: int, fileid: str, as_mvt: bool = False, **kwargs):
+        """
+        Get a map tile like :meth:`VjmapClient.get_map_tile`, and prefetch the tiles around it.
+        """
+        self.view(map_id, version, stylename, zoom, x, y, fileid, as_mvt)
+        return self.client.get_map_tile(map_id, version, stylename, zoom, x, y, fileid, as_mvt=as_mvt, **kwargs)
+
+    def view(self, map_id: str, version: str, stylename: str, zoom: int, x: int, y: int, fileid: str, as_mvt: bool = False):
+        """
+        Report a tile requested by a viewer, and prefetch the tiles around it.
+        """
+        layer = (map_id, version, stylename, fileid or '', 'mvt' if as_mvt else 'raster')
+        now = time.monotonic()
+        with self._condition:
+            self.stats.views += 1
+            key = TileKey(*layer[:3], zoom, x, y, *layer[3:])
+            if self._known.get(key):
+                self.stats.hits += 1
+            self._remember(key, False)
+            viewport = self._viewports.get(layer)
+            if viewport is None:
+                viewport = self._viewports[layer] = _Viewport(self.window)
+            motion = viewport.add(zoom, x, y, now)
+            order = -next(self._sequence)
+            for score, z, tx, ty in self._candidates(zoom, x, y, motion):
+                self._push(score, order, layer, z, tx, ty, False)
+            self._trim(now)
+            self._condition.notify_all()
+
+    def seed(self, map_id: str, version: str, stylename: str, fileid: str, min_zoom: int, max_zoom: int, bounds, map_bounds=None, as_mvt: bool = False) -> int:
+        """
+        Prefetch all tiles covering bounds from min_zoom to max_zoom, after the tiles around the viewports.
+
+        The tiles are taken one at a time from the range when a worker finds no other tile scheduled,
+        so a large range neither fills the queue nor delays the viewports. Seeded tiles are never
+        cancelled; those already viewed, scheduled or prefetched are skipped when their turn comes.
+
+        Returns
+        -------
+        count : int
+            The number of tiles in the range within min_zoom and max_zoom of the prefetcher.
+        """
+        layer = (map_id, version, stylename, fileid or '', 'mvt' if as_mvt else 'raster')
+        min_zoom = max(min_zoom, self.min_zoom)
+        if self.max_zoom is not None:
+            max_zoom = min(max_zoom, self.max_zoom)
+        count = 0
+        for z in range(min_zoom, max_zoom + 1):
+            x_min, y_min, x_max, y_max = tile_range(bounds, z, map_bounds)
+            count += (x_max - x_min + 1) * (y_max - y_min + 1)
+        with self._condition:
+            self._seeds.append((layer, iter_tiles(bounds, min_zoom, max_zoom, map_bounds)))
+            self._condition.notify_all()
+        return count
+
+    def _candidates(self, zoom: int, x: int, y: int, motion: Optional[Tuple[int, int]]):
+        # 同级的相邻瓦片按距离排序，沿移动方向的瓦片优先
+        length = (motion[0] ** 2 + motion[1] ** 2) ** 0.5 if motion else 0
+        for dx in range(-self.radius, self.radius + 1):
+            for dy in range(-self.radius, self.radius + 1):
+                if dx == 0 and dy == 0:
+                    continue
+                score = float(max(abs(dx), abs(dy)))
+                if length:
+                    score -= 0.5 * (dx * motion[0] + dy * motion[1]) / (length * (dx * dx + dy * dy) ** 0.5)
+                yield score, zoom, x + dx, y + dy
+        # 上下级覆盖该瓦片的瓦片
+        for level in range(1, self.zoom_levels + 1):
+            score = self.zoom_penalty * level
+            yield score, zoom - level, x >> level, y >> level
+            side = 1 << level
+            for cx in range(x << level, (x << level) + side):
+                for cy in range(y << level, (y << level) + side):
+                    yield score, zoom + level, cx, cy
+
+    def _push(self, score: float, order: int, layer: tuple, z: int, x: int, y: int, seeded: bool) -> bool:
+        count = 1 << z if z >= 0 else 0
+        if z < self.min_zoom or self.max_zoom is not None and z > self.max_zoom or not (0 <= x < count and 0 <= y < count):
+            return False
+        key = TileKey(*layer[:3], z, x, y, *layer[3:])
+        if key in self._queued or key in self._inflight or key in self._known:
+            return False
+        self._queued.add(key)
+        heapq.heappush(self._heap, (score, order, next(self._sequence), key, layer, seeded))
+        self.stats.scheduled += 1
+        return True
+
+    def _next_seed(self) -> bool:
+        # 从预置范围中取下一个需要预取的瓦片加入队列，没有时返回 False
+        while self._seeds:
+            layer, tiles = self._seeds[0]
+            for z, x, y in tiles:
+                if self._push(_SEED_SCORE + z, 0, layer, z, x, y, True):
+                    return True
+            self._seeds.popleft()
+        return False
+
+    def _remember(self, key: TileKey, prefetched: bool):
+        # 记录最近请求过（False）或预取过（True）的瓦片，不再重复调度，并用于统计命中率
+        self._known[key] = prefetched
+        self._known.move_to_end(key)
+        while len(self._known) > self.max_queue * 4:
+            self._known.popitem(last=False)
+
+    def _relevant(self, key: TileKey, layer: tuple, seeded: bool, now: float) -> bool:
+        if seeded:
+            return True
+        viewport = self._viewports.get(layer)
+        if viewport is None or viewport.zoom is None:
+            return False
+        level = key.z - viewport.zoom
+        if abs(level) > self.zoom_levels:
+            return False
+        x_min, y_min, x_max, y_max = viewport.bounds(now)
+        if level > 0:
+            x_min, y_min = x_min << level, y_min << level
+            x_max, y_max = ((x_max + 1) << level) - 1, ((y_max + 1) << level) - 1
+        elif level < 0:
+            x_min, y_min, x_max, y_max = x_min >> -level, y_min >> -level, x_max >> -level, y_max >> -level
+        # 上下级的瓦片只保留视口下方的，同级的瓦片保留视口周围 radius 范围内的
+        margin = self.radius if level == 0 else 0
+        return x_min - margin <= key.x <= x_max + margin and y_min - margin <= key.y <= y_max + margin
+
+    def _trim(self, now: float):
+        if len(self._heap) <= self.max_queue:
+            return
+        kept = [entry for entry in self._heap if self._relevant(entry[3], entry[4], entry[5], now)]
+        self.stats.cancelled += len(self._heap) - len(kept)
+        if len(kept) > self.max_queue:
+            self.stats.dropped += len(kept) - self.max_queue
+            kept = heapq.nsmallest(self.max_queue, kept)
+        self._queued = set(entry[3] for entry in kept)
+        heapq.heapify(kept)
+        self._heap = kept
+
+    def _work(self):
+        cache = self.client.tile_cache
+        while True:
+            with self._condition:
+                while not self._heap and not self._closed and not self._next_seed():
+                    self._condition.wait()
+                if self._closed:
+                    return
+                _, _, _, key, layer, seeded = heapq.heappop(self._heap)
+                self._queued.discard(key)
+                if not self._relevant(key, layer, seeded, time.monotonic()):
+                    self.stats.cancelled += 1
+                    continue
+                self._inflight.add(key)
+            try:
+                cached = cache.get(key)
+                if cached is not None and cache.is_fresh(key, cached):
+                    with self._condition:
+                        self.stats.cached += 1
+                    continue
+                response = self.client.get_map_tile(key.map_id, key.version, key.stylename, key.z, key.x, key.y, key.fileid,
+                                                    as_mvt=key.format == 'mvt')
+                size = len(response.content)
+                with self._condition:
+                    self.stats.fetched += 1
+                    self.stats.bytes += size
+                    self._remember(key, True)
+                # 按令牌桶容量分段计入整个瓦片的大小
+                while self.budget is not None and size > 0 and not self._closed:
+                    piece = min(size, self.budget.burst)
+                    self.budget.acquire(piece)
+                    size -= piece
+            except Exception as e:
+                with self._condition:
+                    self.stats.failed += 1
+                    self.stats.errors.append((key, e))
+            finally:
+                with self._condition:
+                    self._inflight.discard(key)
+
+    def pending(self) -> int:
+        """
+        The number of scheduled tiles, including those that will be cancelled.
+        """
+        with self._condition:
+            return len(self._heap)
+
+    def close(self):
+        """
+        Stop the workers, dropping the scheduled tiles. Fetches in progress are completed.
+        """
+        with self._condition:
+            self._closed = True
+            self.stats.dropped += len(self._heap)
+            self._heap = []
+            self._queued.clear()
+            self._seeds.clear()
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
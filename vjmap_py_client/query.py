@@ -0,0 +1,256 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Optional
+from .exceptions import VjmapError
+from .parameters import PointQueryParameter, RectQueryParameter, ExprQueryParameter, ConditionQueryParameter
+from .utils import parse_bounds
+
+
+def feature_key(feature: dict):
+    """
+    实体的唯一标识，用于合并多次查询的结果
+    :param feature: 查询返回的实体
+    :return: objectid，没有时使用 id
+    """
+    key = feature.get("objectid")
+    return key if key is not None else feature.get("id")
+
+
+def ensure_pageable(parameters):
+    """
+    检查查询能否按 beginpos 分页，点查询和矩形查询不支持分页
+    :param parameters: 查询参数
+    """
+    if not isinstance(parameters, (ExprQueryParameter, ConditionQueryParameter)):
+        raise TypeError(f"Only expression and condition queries can be paged, not {type(parameters).__name__}")
+
+
+def page_key(page: list, previous):
+    """
+    返回一页实体中首个实体的标识，与上一页相同时说明服务端忽略了 beginpos，抛出异常以免无限循环
+    :param page: 本页的实体
+    :param previous: 上一页首个实体的标识
+    :return: 本页首个实体的标识
+    """
+    key = feature_key(page[0]) if page else None
+    if key is not None and key == previous:
+        raise VjmapError(f"The server returned the page starting at {key!r} twice, it ignores beginpos")
+    return key
+
+
+class RectQueryEngine(object):
+    """
+    Run a rect query over a large area as many smaller rect queries in parallel.
+
+    The area is split as a quadtree: a cell whose result reaches ``cell_limit`` is split
+    into four sub cells until ``max_depth``. Entities returned by several cells are merged by
+    their object id, or by their content when they have none.
+    """
+
+    def __init__(self, client, workers: int = 8, cell_limit: int = 5000, max_depth: int = 8):
+        """
+        Parameters
+        ----------
+        client : VjmapClient
+            The client used to query the features.
+        workers : int
+            The number of queries run in parallel.
+        cell_limit : int
+            The maxReturnCount of each cell query. A cell returning as many entities is split.
+        max_depth : int
+            The maximum number of splits of the whole area.
+        """
+        self.client = client
+        self.workers = workers
+        self.cell_limit = cell_limit
+        self.max_depth = max_depth
+
+    def query(self, map_id: str, version: str, bounds=None, parameters: Optional[RectQueryParameter] = None, **kwargs):
+        """
+        Query all features in bounds.
+
+        Parameters
+        ----------
+        map_id : str
+            The ID of the map to query.
+        version : str
+            The version of the map to query.
+        bounds : list|str, optional
+            The area to query, defaults to the bounds returned by get_data_bounds.
+        parameters : RectQueryParameter, optional
+            The other parameters of the rect queries, e.g. layer, condition, fields or geom.
+            Its rectangle and limit are ignored.
+
+        Returns
+        -------
+        response : dict
+            ``result`` holds the de-duplicated entities and ``recordCount`` their number.
+            ``truncated`` lists the cells still reaching the limit at max_depth.
+        """
+        if bounds is None:
+            bounds = self.client.get_data_bounds(map_id, version, **kwargs)["bounds"]
+        template = (parameters or RectQueryParameter()).to_dict()
+        template["maxReturnCount"] = self.cell_limit
+        features = {}
+        truncated = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = {}
+
+            def submit(cell, depth):
+                x1, y1, x2, y2 = cell
+                data = dict(template, x1=x1, y1=y1, x2=x2, y2=y2)
+                pending[executor.submit(self._query_cell, map_id, version, data, **kwargs)] = (cell, depth)
+
+            submit(parse_bounds(bounds), 0)
+            try:
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        cell, depth = pending.pop(future)
+                        result = future.result()
+                        if len(result) >= self.cell_limit:
+                            if depth < self.max_depth:
+                                for sub_cell in self._split(cell):
+                                    submit(sub_cell, depth + 1)
+                                continue
+                            truncated.append(cell)
+                        occurrences = {}
+                        for feature in result:
+                            key = feature_key(feature)
+                            if key is None:
+                                # 没有 objectid 的实体按内容合并，同一单元内内容相同的实体按出现次序区分
+                                content = json.dumps(feature, sort_keys=True, default=str)
+                                key = (content, occurrences.get(content, 0))
+                                occurrences[content] = key[1] + 1
+                            features.setdefault(key, feature)
+            finally:
+                for future in pending:
+                    future.cancel()
+        return {"recordCount": len(features), "result": list(features.values()), "truncated": truncated}
+
+    def _query_cell(self, map_id, version, data, **kwargs):
+        endpoint = f'/map/cmd/queryFeatures/{map_id}/{version}'
+        return self.client._request('POST', endpoint, json=data, **kwargs).get("result") or []
+
+    @staticmethod
+    def _split(cell):
+        x1, y1, x2, y2 = cell
+        cx = (x1 + x2) / 2
+        cy = (y1 + y2) / 2
+        return (x1, y1, cx, cy), (cx, y1, x2, cy), (x1, cy, cx, y2), (cx, cy, x2, y2)
+
+
+def plan_point_queries(points, pixelsize: Optional[int], tolerance: Optional[float], cluster_size: Optional[float], query_options: Optional[dict]):
+    """
+    将点按网格聚合，网格内的点共用一次矩形查询
+    :param points: (x, y) 序列或 numpy 数组
+    :param pixelsize: 点查询的像素容差
+    :param tolerance: 聚合查询使用的地图单位容差，缺省时为 pixelsize * pixelToGeoLength
+    :param cluster_size: 网格边长，None 表示不聚合、逐点查询
+    :param query_options: 其他查询参数
+    :return: (点列表, 容差, 查询参数, 每个网格内的点序号列表)
+    """
+    if hasattr(points, "tolist"):
+        points = points.tolist()
+    points = [(float(x), float(y)) for x, y in points]
+    query_options = dict(query_options or {})
+    if tolerance is None and query_options.get("pixelToGeoLength"):
+        tolerance = (pixelsize or 0) * query_options["pixelToGeoLength"]
+    if cluster_size is not None and tolerance is None:
+        raise ValueError("tolerance or pixelToGeoLength is required to cluster points")
+
+    # 按网格聚合相邻的点
+    groups = {}
+    for index, (x, y) in enumerate(points):
+        cell = (x // cluster_size, y // cluster_size) if cluster_size else index
+        groups.setdefault(cell, []).append(index)
+    return points, tolerance, query_options, list(groups.values())
+
+
+def point_parameters(point, pixelsize: Optional[int], query_options: dict) -> dict:
+    x, y = point
+    return PointQueryParameter(x=x, y=y, pixelsize=pixelsize, **query_options).to_dict()
+
+
+def cluster_parameters(points, indexes, tolerance: float, cluster_limit: int, query_options: dict) -> dict:
+    xs = [points[i][0] for i in indexes]
+    ys = [points[i][1] for i in indexes]
+    options = dict((k, v) for k, v in query_options.items() if k != "pixelToGeoLength")
+    return RectQueryParameter(
+        x1=min(xs) - tolerance, y1=min(ys) - tolerance,
+        x2=max(xs) + tolerance, y2=max(ys) + tolerance,
+        **dict(options, limit=cluster_limit)
+    ).to_dict()
+
+
+def assign_cluster(points, indexes, features: list, tolerance: float, cluster_limit: int, results: list) -> bool:
+    """
+    将矩形查询的实体按范围分配给各点
+    :return: 结果被截断或实体没有范围、需要逐点查询时返回 False
+    """
+    if len(features) >= cluster_limit or any(not feature.get("bounds") for feature in features):
+        return False
+    boxes = [parse_bounds(feature["bounds"]) for feature in features]
+    for index in indexes:
+        x, y = points[index]
+        results[index] = [
+            feature for feature, (x1, y1, x2, y2) in zip(features, boxes)
+            if x1 - tolerance <= x <= x2 + tolerance and y1 - tolerance <= y <= y2 + tolerance
+        ]
+    return True
+
+
+def query_points(client, map_id: str, version: str, points, pixelsize: Optional[int] = 5, tolerance: Optional[float] = None, cluster_size: Optional[float] = None, workers: int = 8, cluster_limit: int = 5000, query_options: Optional[dict] = None, **kwargs):
+    """
+    Hit-test many points, see :meth:`VjmapClient.query_points`.
+    """
+    points, tolerance, query_options, groups = plan_point_queries(points, pixelsize, tolerance, cluster_size, query_options)
+    endpoint = f'/map/cmd/queryFeatures/{map_id}/{version}'
+    results = [None] * len(points)
+
+    def query_point(index):
+        parameters = point_parameters(points[index], pixelsize, query_options)
+        results[index] = client._request('POST', endpoint, json=parameters, **kwargs).get("result") or []
+
+    def query_group(indexes):
+        if len(indexes) == 1:
+            return query_point(indexes[0])
+        parameters = cluster_parameters(points, indexes, tolerance, cluster_limit, query_options)
+        features = client._request('POST', endpoint, json=parameters, **kwargs).get("result") or []
+        if not assign_cluster(points, indexes, features, tolerance, cluster_limit, results):
+            # 结果被截断或无法在本地判断时逐点查询
+            for index in indexes:
+                query_point(index)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(query_group, indexes) for indexes in groups]:
+            future.result()
+    return results
+
+
+async def async_query_points(client, map_id: str, version: str, points, pixelsize: Optional[int] = 5, tolerance: Optional[float] = None, cluster_size: Optional[float] = None, workers: int = 8, cluster_limit: int = 5000, query_options: Optional[dict] = None, **kwargs):
+    """
+    Hit-test many points, see :meth:`AsyncVjmapClient.query_points`.
+    """
+    points, tolerance, query_options, groups = plan_point_queries(points, pixelsize, tolerance, cluster_size, query_options)
+    endpoint = f'/map/cmd/queryFeatures/{map_id}/{version}'
+    results = [None] * len(points)
+    semaphore = asyncio.Semaphore(workers)
+
+    async def query_point(index):
+        parameters = point_parameters(points[index], pixelsize, query_options)
+        results[index] = (await client._request('POST', endpoint, json=parameters, **kwargs)).get("result") or []
+
+    async def query_group(indexes):
+        async with semaphore:
+            if len(indexes) == 1:
+                return await query_point(indexes[0])
+            parameters = cluster_parameters(points, indexes, tolerance, cluster_limit, query_options)
+            features = (await client._request('POST', endpoint, json=parameters, **kwargs)).get("result") or []
+            if not assign_cluster(points, indexes, features, tolerance, cluster_limit, results):
+                for index in indexes:
+                    await query_point(index)
+
+    await asyncio.gather(*(query_group(indexes) for indexes in groups))
+    return results
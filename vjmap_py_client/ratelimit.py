@@ -0,0 +1,185 @@
+import threading
+import time
+from typing import Dict, Optional
+
+
+def endpoint_family(endpoint: str) -> str:
+    """
+    接口所属的类别，用于分别限流
+    :param endpoint: 接口路径
+    :return: 'tile'、'query'、'upload' 或 'default'
+    """
+    if endpoint.startswith(('/map/tile/', '/map/cmd/thumbnail/')):
+        return 'tile'
+    if endpoint.startswith('/map/cmd/queryFeatures/'):
+        return 'query'
+    if endpoint.startswith('/map/uploads'):
+        return 'upload'
+    return 'default'
+
+
+class TokenBucket(object):
+    """
+    Token bucket rate limiter: ``rate`` requests per second on average, bursts up to ``burst``.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """
+        Take tokens, sleeping until they are available.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveLimiter(object):
+    """
+    Adaptive concurrency limit (AIMD with a latency gradient).
+
+    The limit grows by about one per round trip while requests succeed and latency stays within
+    ``tolerance`` times its lowest value, and is multiplied by ``backoff`` when the server
+    signals overload (429, 503, timeouts) or latency grows beyond that, so that concurrency
+    settles at what the server sustains.
+    """
+
+    def __init__(self, initial: int = 8, min_limit: int = 1, max_limit: int = 256, backoff: float = 0.7, tolerance: float = 2.0,
+                 smoothing: float = 0.2, rtt_decay: float = 0.01):
+        """
+        Parameters
+        ----------
+        initial : int
+            The initial concurrency limit.
+        min_limit : int
+            The lowest concurrency limit.
+        max_limit : int
+            The highest concurrency limit.
+        backoff : float
+            The factor applied to the limit on overload.
+        tolerance : float
+            The increase of the smoothed latency over its lowest value treated as queueing on the server.
+        smoothing : float
+            The weight of each sample in the smoothed latency.
+        rtt_decay : float
+            How fast the lowest smoothed latency follows higher values, so that it adapts to a slower server.
+        """
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.rtt_decay = rtt_decay
+        self.in_flight = 0
+        self.min_rtt = None
+        self.rtt = None
+        self._cooldown = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False):
+        with self._condition:
+            self.in_flight -= 1
+            if latency is not None and not overloaded:
+                self.rtt = latency if self.rtt is None else self.rtt + (latency - self.rtt) * self.smoothing
+                # 基准延迟取平滑延迟的最小值，避免个别过快的响应拉低基准
+                if self.min_rtt is None or self.rtt < self.min_rtt:
+                    self.min_rtt = self.rtt
+                else:
+                    self.min_rtt += (self.rtt - self.min_rtt) * self.rtt_decay
+                overloaded = self.rtt > self.min_rtt * self.tolerance
+            if self._cooldown > 0:
+                # 每个往返周期内最多减小一次
+                self._cooldown -= 1
+            elif overloaded:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._cooldown = int(self.limit)
+            elif self.in_flight + 1 >= int(self.limit):
+                # 仅在并发已用满时增加上限
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+
+class RequestLimiter(object):
+    """
+    Rate and concurrency limits of the requests of one or more clients, per endpoint family
+    ('tile', 'query', 'upload' and 'default'). Share an instance between clients, or use
+    :meth:`shared`, to limit all the requests of a process.
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None, concurrency: Optional[Dict[str, AdaptiveLimiter]] = None, adaptive: bool = True):
+        """
+        Parameters
+        ----------
+        rates : Dict[str, float], optional
+            The maximum requests per second of endpoint families, e.g. {'tile': 200, 'query': 20}.
+        concurrency : Dict[str, AdaptiveLimiter], optional
+            The concurrency limiters of endpoint families.
+        adaptive : bool
+            Whether families without a concurrency limiter get a default AdaptiveLimiter.
+        """
+        self.buckets = dict((family, TokenBucket(rate)) for family, rate in (rates or {}).items())
+        self.concurrency = dict(concurrency or {})
+        self.adaptive = adaptive
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, name: str = 'default', **kwargs) -> 'RequestLimiter':
+        """
+        The process wide limiter named name, created with kwargs on first use.
+        """
+        with cls._shared_lock:
+            if name not in cls._shared:
+                cls._shared[name] = cls(**kwargs)
+            return cls._shared[name]
+
+    def _concurrency(self, family: str) -> Optional[AdaptiveLimiter]:
+        limiter = self.concurrency.get(family)
+        if limiter is None and self.adaptive:
+            with self._lock:
+                limiter = self.concurrency.setdefault(family, AdaptiveLimiter())
+        return limiter
+
+    def acquire(self, endpoint: str):
+        """
+        Wait until a request to endpoint may be sent.
+
+        Returns
+        -------
+        token : tuple
+            To be passed to :meth:`release` once the request has completed.
+        """
+        family = endpoint_family(endpoint)
+        bucket = self.buckets.get(family)
+        if bucket is not None:
+            bucket.acquire()
+        limiter = self._concurrency(family)
+        if limiter is not None:
+            limiter.acquire()
+        return limiter, time.monotonic()
+
+    def release(self, token, overloaded: bool = False):
+        limiter, started = token
+        if limiter is not None:
+            limiter.release(time.monotonic() - started, overloaded)
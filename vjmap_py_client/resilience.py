@@ -0,0 +1,156 @@
+import random
+import threading
+import time
+from typing import Iterable, Optional
+from .exceptions import CircuitOpenError
+
+
+class RetryBudget(object):
+    """
+    Limit retries to a fraction of the requests, so that retries cannot multiply the load
+    of an overloaded server. Every request deposits ``ratio`` token, every retry withdraws one,
+    and ``min_per_second`` tokens are added over time so that a quiet client can still retry.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, max_tokens: float = 20.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class RetryPolicy(object):
+    """
+    Automatic retries of idempotent requests with jittered exponential backoff.
+
+    GET requests and queryFeatures POSTs are retried on connection errors, timeouts, 429 and
+    502/503/504 responses; other requests are never retried automatically.
+    """
+
+    def __init__(self, max_retries: int = 3, backoff_base: float = 0.2, backoff_max: float = 10.0, budget: Optional[RetryBudget] = None, idempotent_posts: Iterable[str] = ('/map/cmd/queryFeatures/',)):
+        """
+        Parameters
+        ----------
+        max_retries : int
+            The maximum number of retries of a request.
+        backoff_base : float
+            The backoff in seconds before the first retry, doubled for each further retry.
+        backoff_max : float
+            The maximum backoff in seconds.
+        budget : RetryBudget, optional
+            The retry budget, defaults to one allowing 20% of the requests to be retried.
+        idempotent_posts : Iterable[str]
+            The endpoint prefixes of POST requests that are safe to retry.
+        """
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.budget = budget if budget is not None else RetryBudget()
+        self.idempotent_posts = tuple(idempotent_posts)
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def is_idempotent(self, method: str, endpoint: str) -> bool:
+        method = method.upper()
+        return method in ('GET', 'HEAD', 'OPTIONS') or method == 'POST' and endpoint.startswith(self.idempotent_posts)
+
+    def should_retry(self, attempt: int) -> bool:
+        """
+        Whether the request may be retried after its attempt-th retry, consuming the budget.
+        """
+        if attempt >= self.max_retries or not self.budget.withdraw():
+            return False
+        with self._lock:
+            self.retries += 1
+        return True
+
+    def backoff(self, attempt: int, response=None) -> float:
+        """
+        The delay before the next retry: Retry-After when the server sent it, otherwise a
+        "full jitter" random delay up to backoff_base * 2 ** attempt.
+        """
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+class _CircuitState(object):
+    __slots__ = ('failures', 'opened_at', 'trial')
+
+    def __init__(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+
+class CircuitBreaker(object):
+    """
+    Per host circuit breaker.
+
+    After ``failure_threshold`` consecutive failures (connection errors, timeouts, 429 and 5xx)
+    the circuit of the host opens and requests fail fast with :class:`CircuitOpenError`.
+    After ``reset_timeout`` seconds one trial request is let through: its success closes the
+    circuit, its failure opens it again. An instance can be shared by several clients.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def state(self, host: str) -> str:
+        with self._lock:
+            state = self._states.get(host)
+            if state is None or state.opened_at is None:
+                return 'closed'
+            if time.monotonic() - state.opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def before_request(self, host: str):
+        with self._lock:
+            state = self._states.setdefault(host, _CircuitState())
+            if state.opened_at is None:
+                return
+            if time.monotonic() - state.opened_at >= self.reset_timeout and not state.trial:
+                state.trial = True
+                return
+        raise CircuitOpenError(f"Circuit open for {host}")
+
+    def record_success(self, host: str):
+        with self._lock:
+            state = self._states.setdefault(host, _CircuitState())
+            state.failures = 0
+            state.opened_at = None
+            state.trial = False
+
+    def record_failure(self, host: str):
+        with self._lock:
+            state = self._states.setdefault(host, _CircuitState())
+            state.failures += 1
+            if state.trial or state.failures >= self.failure_threshold:
+                state.opened_at = time.monotonic()
+            state.trial = False
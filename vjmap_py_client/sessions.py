@@ -0,0 +1,250 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterable, Optional, Tuple
+
+
+class MapSession(object):
+    """
+    A map kept open on the server by a :class:`MapSessionPool`.
+    """
+
+    def __init__(self, map_id: str, version: Optional[str], pinned: bool = False):
+        self.map_id = map_id
+        self.version = version
+        self.pinned = pinned
+        self.info = None
+        self.refs = 0
+        self.last_used = time.monotonic()
+        self.error = None
+        self.closing = False
+        self._key = (map_id, version)
+        self._ready = threading.Event()
+
+    def __repr__(self):
+        return f"MapSession(map_id={self.map_id!r}, version={self.version!r}, refs={self.refs})"
+
+
+class MapSessionPool(object):
+    """
+    Keep frequently used maps open on the server, so that queries do not pay the cost of opening them.
+
+    Users acquire a map with :meth:`session` (or :meth:`acquire` / :meth:`release`), which opens it
+    with ``open_map`` on first use only, concurrent users waiting for the same open. Maps no longer
+    in use are closed with ``close_map`` once idle for ``ttl`` seconds, or least recently used first
+    when more than ``max_open`` of them are open. Pinned maps, e.g. prewarmed ones, are never closed
+    before :meth:`close`.
+
+    Maps are closed by a background thread, so that releasing a map never waits for ``close_map``.
+    A map being closed stays in the pool until its close completes, and acquiring it meanwhile waits
+    for the close before opening it again.
+    """
+
+    def __init__(self, client, ttl: Optional[float] = 600.0, max_open: Optional[int] = 32, prewarm: Iterable[Tuple[str, Optional[str]]] = (),
+                 pin_prewarmed: bool = True, reap_interval: Optional[float] = None, open_params: Optional[dict] = None):
+        """
+        Parameters
+        ----------
+        client : VjmapClient
+            The client used to open and close the maps.
+        ttl : float, optional
+            The seconds after which a map not in use is closed, None to keep it open.
+        max_open : int, optional
+            The maximum number of open maps not in use, None for no limit.
+        prewarm : Iterable[Tuple[str, Optional[str]]]
+            The (map_id, version) of the maps opened right away.
+        pin_prewarmed : bool
+            Whether the prewarmed maps stay open until the pool is closed.
+        reap_interval : float, optional
+            The interval in seconds at which the background thread looks for idle maps. Otherwise idle maps
+            are only looked for when the pool is used.
+        open_params : dict, optional
+            Additional parameters passed to open_map.
+        """
+        self.client = client
+        self.ttl = ttl
+        self.max_open = max_open
+        self.open_params = dict(open_params or {})
+        self.opened = 0
+        self.reused = 0
+        self.closed = 0
+        self.errors = []
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._closing = deque()
+        self._stopped = False
+        self._reaper = threading.Thread(target=self._reap, args=(reap_interval or None,), daemon=True)
+        self._reaper.start()
+        prewarm = list(prewarm)
+        if prewarm:
+            self.prewarm(prewarm, pin=pin_prewarmed)
+
+    def prewarm(self, maps: Iterable[Tuple[str, Optional[str]]], pin: bool = False, workers: int = 4):
+        """
+        Open maps ahead of their use, in parallel.
+        """
+        def open_one(key):
+            map_id, version = key
+            session = self.acquire(map_id, version, pin=pin)
+            self.release(session)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(open_one, maps))
+
+    def acquire(self, map_id: str, version: Optional[str] = None, pin: bool = False) -> MapSession:
+        """
+        Get the session of an open map, opening it if needed. Each acquire must be followed by a :meth:`release`.
+        """
+        key = (map_id, version)
+        with self._lock:
+            session = self._sessions.get(key)
+            # 正在关闭的地图需等关闭完成后重新打开
+            while session is not None and session.closing:
+                self._wake.wait()
+                session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = MapSession(map_id, version, pin)
+                opener = True
+            else:
+                opener = False
+                self._sessions.move_to_end(key)
+            session.refs += 1
+            session.pinned = session.pinned or pin
+            if opener:
+                self.opened += 1
+            else:
+                self.reused += 1
+        if opener:
+            self._open(key, session)
+        else:
+            session._ready.wait()
+            if session.error is not None:
+                self._unref(session)
+                raise session.error
+        return session
+
+    def _open(self, key, session: MapSession):
+        params = dict(self.open_params)
+        if session.version is not None:
+            params.setdefault("version", session.version)
+        try:
+            session.info = self.client.open_map(session.map_id, params=params)
+        except Exception as e:
+            session.error = e
+            with self._lock:
+                if self._sessions.get(key) is session:
+                    del self._sessions[key]
+            session._ready.set()
+            raise
+        if session.version is None and isinstance(session.info, dict):
+            session.version = session.info.get("version")
+        session._ready.set()
+
+    def _unref(self, session: MapSession):
+        with self._lock:
+            session.refs -= 1
+            session.last_used = time.monotonic()
+
+    def release(self, session: MapSession):
+        self._unref(session)
+        self.evict()
+
+    @contextmanager
+    def session(self, map_id: str, version: Optional[str] = None):
+        """
+        Use an open map::
+
+            with pool.session(map_id, version) as session:
+                client.query_features(session.map_id, session.version, parameters)
+        """
+        session = self.acquire(map_id, version)
+        try:
+            yield session
+        finally:
+            self.release(session)
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """
+        Schedule the maps idle for more than ttl, and the least recently used ones beyond max_open,
+        to be closed by the background thread.
+
+        Returns
+        -------
+        count : int
+            The number of maps scheduled to be closed.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = [session for session in self._sessions.values()
+                    if session.refs == 0 and not session.pinned and not session.closing and session._ready.is_set()]
+            excess = len(idle) - self.max_open if self.max_open is not None else 0
+            count = 0
+            for session in idle:
+                # idle 按最近使用的先后排列
+                if excess > 0 or self.ttl is not None and now - session.last_used >= self.ttl:
+                    session.closing = True
+                    self._closing.append(session)
+                    excess -= 1
+                    count += 1
+            if count:
+                self._wake.notify_all()
+        return count
+
+    def _close(self, session: MapSession):
+        try:
+            self.client.close_map(session.map_id, session.version)
+            error = None
+        except Exception as e:
+            # 关闭失败不影响使用者，服务端最终会自行释放
+            error = e
+        with self._lock:
+            if error is None:
+                self.closed += 1
+            else:
+                self.errors.append((session.map_id, session.version, error))
+            if self._sessions.get(session._key) is session:
+                del self._sessions[session._key]
+            self._wake.notify_all()
+
+    def _reap(self, interval: Optional[float]):
+        while True:
+            with self._lock:
+                if not self._closing and not self._stopped:
+                    self._wake.wait(interval)
+                session = self._closing.popleft() if self._closing else None
+                if session is None and self._stopped:
+                    return
+            if session is not None:
+                self._close(session)
+            elif interval is not None:
+                self.evict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def close(self):
+        """
+        Stop the background thread once it has closed the maps scheduled, then close all other maps,
+        including those still in use.
+        """
+        with self._lock:
+            self._stopped = True
+            self._wake.notify_all()
+        self._reaper.join()
+        with self._lock:
+            sessions = [s for s in self._sessions.values() if s._ready.is_set() and not s.closing]
+            for session in sessions:
+                session.closing = True
+        for session in sessions:
+            self._close(session)
+        with self._lock:
+            self._sessions.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
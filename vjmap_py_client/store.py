@@ -0,0 +1,310 @@
+import json
+import re
+import sqlite3
+import threading
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+from .codec import get_decoder, get_encoder
+from .parameters import ConditionQueryParameter
+from .query import feature_key
+from .utils import parse_bounds
+
+# 条件表达式：以 and 连接的 字段 运算符 值
+_CLAUSE = re.compile(
+    r"\s*([A-Za-z_][A-Za-z0-9_]*)\s*(==|=|!=|<>|<=|>=|<|>|\blike\b)\s*('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|-?\d+(?:\.\d+)?)\s*",
+    re.IGNORECASE
+)
+_AND = re.compile(r'and\b', re.IGNORECASE)
+_COLUMNS = {'objectid': 'f.objectid', 'layername': 'f.layername', 'name': 'f.name'}
+
+
+def parse_condition(condition: Optional[str]) -> Optional[Tuple[str, list]]:
+    """
+    将简单的查询条件转换为 SQL，如 name='AcDbLine' and color=1
+    :param condition: 查询条件，仅支持以 and 连接的 字段 运算符 值 形式
+    :return: (SQL 条件, 参数)，不支持的条件返回 None
+    """
+    if not condition or not condition.strip():
+        return '1', []
+    clauses = []
+    params = []
+    pos = 0
+    while True:
+        match = _CLAUSE.match(condition, pos)
+        if match is None:
+            return None
+        field, op, value = match.groups()
+        if value[0] in '\'"':
+            value = value[1:-1].replace(value[0] * 2, value[0])
+        else:
+            value = float(value) if '.' in value else int(value)
+        op = {'==': '=', '<>': '!='}.get(op, op.upper())
+        column = _COLUMNS.get(field.lower(), f"json_extract(f.data, '$.{field}')")
+        clauses.append(f'{column} {op} ?')
+        params.append(value)
+        pos = match.end()
+        if pos == len(condition):
+            return ' AND '.join(clauses), params
+        match = _AND.match(condition, pos)
+        if match is None:
+            return None
+        pos = match.end()
+
+
+class FeatureStore(object):
+    """
+    Local store of the entities of immutable map versions, with a spatial index of their bounds.
+
+    The entities are stored in an SQLite file with an R*Tree index (a B-tree index when SQLite lacks
+    the R*Tree module). Once a version has been loaded entirely, point, rect and condition queries
+    with simple conditions (``field op value`` joined by ``and``) and layer filters are answered
+    locally. Other queries, and queries of versions not loaded, fall back to the server through the
+    client. Local hits are tested against the bounds of the entities, not their exact geometry.
+    """
+
+    def __init__(self, path: str = ':memory:', client=None, decoder: str|Callable[[bytes], Any] = 'auto', encoder: str|Callable[[Any], str] = 'auto'):
+        """
+        Parameters
+        ----------
+        path : str
+            The path of the SQLite file, ':memory:' for a non persistent store.
+        client : VjmapClient, optional
+            The client used to load versions and answer the queries the store cannot.
+        decoder : str|Callable[[bytes], Any]
+            The JSON decoder of the stored entities.
+        encoder : str|Callable[[Any], str]
+            The JSON encoder of the stored entities.
+        """
+        self.path = path
+        self.client = client
+        self._decode = get_decoder(decoder)
+        self._encode = get_encoder(encoder)
+        self.local_queries = 0
+        self.server_queries = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS versions (
+                map_id TEXT NOT NULL, version TEXT NOT NULL, complete INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (map_id, version)
+            );
+            CREATE TABLE IF NOT EXISTS features (
+                id INTEGER PRIMARY KEY, map_id TEXT NOT NULL, version TEXT NOT NULL,
+                objectid TEXT, layername TEXT, name TEXT, data TEXT NOT NULL,
+                minx REAL, maxx REAL, miny REAL, maxy REAL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS features_objectid ON features (map_id, version, objectid);
+            CREATE INDEX IF NOT EXISTS features_layername ON features (map_id, version, layername);
+        ''')
+        # R*Tree 以单精度保存范围，仅用于筛选候选实体，精确范围保存在 features 中
+        try:
+            self._conn.execute('CREATE VIRTUAL TABLE IF NOT EXISTS feature_index USING rtree(id, minx, maxx, miny, maxy)')
+        except sqlite3.OperationalError:
+            self._conn.executescript('''
+                CREATE TABLE IF NOT EXISTS feature_index (id INTEGER PRIMARY KEY, minx REAL, maxx REAL, miny REAL, maxy REAL);
+                CREATE INDEX IF NOT EXISTS feature_index_minx ON feature_index (minx, maxx);
+            ''')
+        self._conn.commit()
+
+    def add(self, map_id: str, version: str, features: Iterable[dict]) -> int:
+        """
+        Add or replace entities of a version, e.g. one page of query results.
+
+        Returns
+        -------
+        count : int
+            The number of entities added.
+        """
+        count = 0
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute('INSERT OR IGNORE INTO versions (map_id, version) VALUES (?, ?)', (map_id, version))
+            for feature in features:
+                key = feature_key(feature)
+                key = None if key is None else str(key)
+                box = (None, None, None, None)
+                if feature.get("bounds"):
+                    try:
+                        x1, y1, x2, y2 = parse_bounds(feature["bounds"])
+                    except ValueError:
+                        pass
+                    else:
+                        box = (min(x1, x2), max(x1, x2), min(y1, y2), max(y1, y2))
+                row = (map_id, version, key, feature.get("layername"), feature.get("name"), self._encode(feature)) + box
+                existing = cursor.execute('SELECT id FROM features WHERE map_id=? AND version=? AND objectid=?', row[:3]).fetchone() if key is not None else None
+                if existing is None:
+                    cursor.execute('INSERT INTO features (map_id, version, objectid, layername, name, data, minx, maxx, miny, maxy) '
+                                   'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', row)
+                    rowid = cursor.lastrowid
+                else:
+                    rowid = existing[0]
+                    cursor.execute('UPDATE features SET layername=?, name=?, data=?, minx=?, maxx=?, miny=?, maxy=? WHERE id=?', row[3:] + (rowid,))
+                    cursor.execute('DELETE FROM feature_index WHERE id=?', (rowid,))
+                if box[0] is not None:
+                    cursor.execute('INSERT INTO feature_index (id, minx, maxx, miny, maxy) VALUES (?, ?, ?, ?, ?)', (rowid,) + box)
+                count += 1
+            self._conn.commit()
+        return count
+
+    def load(self, map_id: str, version: str, page_size: int = 1000, geom: bool = False, **kwargs) -> int:
+        """
+        Load all the entities of a version from the server page by page, and mark it complete.
+
+        Parameters
+        ----------
+        map_id : str
+            The ID of the map.
+        version : str
+            The version of the map, which should be immutable.
+        page_size : int
+            The number of entities per request.
+        geom : bool
+            Whether the geometry of the entities is stored too.
+
+        Returns
+        -------
+        count : int
+            The number of entities loaded.
+        """
+        parameters = ConditionQueryParameter(condition='', fields='', geom=geom or None, includegeom=geom or None)
+        count = 0
+        page = []
+        for feature in self.client.iter_features(map_id, version, parameters, page_size=page_size, **kwargs):
+            page.append(feature)
+            if len(page) >= page_size:
+                count += self.add(map_id, version, page)
+                page = []
+        count += self.add(map_id, version, page)
+        self.mark_complete(map_id, version)
+        return count
+
+    def mark_complete(self, map_id: str, version: str, complete: bool = True):
+        with self._lock:
+            self._conn.execute('INSERT INTO versions (map_id, version, complete) VALUES (?, ?, ?) '
+                               'ON CONFLICT (map_id, version) DO UPDATE SET complete=excluded.complete', (map_id, version, int(complete)))
+            self._conn.commit()
+
+    def is_complete(self, map_id: str, version: str) -> bool:
+        with self._lock:
+            row = self._conn.execute('SELECT complete FROM versions WHERE map_id=? AND version=?', (map_id, version)).fetchone()
+        return bool(row and row[0])
+
+    def remove(self, map_id: str, version: str):
+        with self._lock:
+            self._conn.execute('DELETE FROM feature_index WHERE id IN (SELECT id FROM features WHERE map_id=? AND version=?)', (map_id, version))
+            self._conn.execute('DELETE FROM features WHERE map_id=? AND version=?', (map_id, version))
+            self._conn.execute('DELETE FROM versions WHERE map_id=? AND version=?', (map_id, version))
+            self._conn.commit()
+
+    def query_rect(self, map_id: str, version: str, x1: float, y1: float, x2: float, y2: float, layer: Optional[str] = None,
+                   condition: Optional[str] = None, contains: bool = False, limit: Optional[int] = None, offset: int = 0) -> List[dict]:
+        """
+        The stored entities whose bounds intersect, or are contained in, the rectangle.
+        """
+        where = self._filters(layer, condition)
+        if where is None:
+            raise ValueError(f"Unsupported condition: {condition}")
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        # R*Tree 中的范围向外取整，相交的候选包含所有相交或被包含的实体，再按精确范围判断
+        candidates = 'i.minx <= ? AND i.maxx >= ? AND i.miny <= ? AND i.maxy >= ?'
+        params = [x2, x1, y2, y1]
+        if contains:
+            spatial = 'f.minx >= ? AND f.maxx <= ? AND f.miny >= ? AND f.maxy <= ?'
+            params += [x1, x2, y1, y2]
+        else:
+            spatial = 'f.minx <= ? AND f.maxx >= ? AND f.miny <= ? AND f.maxy >= ?'
+            params += [x2, x1, y2, y1]
+        # CROSS JOIN 使 SQLite 先查询空间索引，再按 id 查找实体
+        sql = (f'SELECT f.data FROM feature_index i CROSS JOIN features f ON f.id = i.id '
+               f'WHERE {candidates} AND {spatial} AND f.map_id=? AND f.version=? AND {where[0]} ORDER BY f.id')
+        return self._select(sql, params + [map_id, version] + where[1], limit, offset)
+
+    def query_point(self, map_id: str, version: str, x: float, y: float, tolerance: float = 0.0, **kwargs) -> List[dict]:
+        """
+        The stored entities whose bounds are within tolerance of the point, see :meth:`query_rect`.
+        """
+        return self.query_rect(map_id, version, x - tolerance, y - tolerance, x + tolerance, y + tolerance, **kwargs)
+
+    def query_condition(self, map_id: str, version: str, layer: Optional[str] = None, condition: Optional[str] = None,
+                        limit: Optional[int] = None, offset: int = 0) -> List[dict]:
+        """
+        The stored entities matching a layer and a simple condition.
+        """
+        where = self._filters(layer, condition)
+        if where is None:
+            raise ValueError(f"Unsupported condition: {condition}")
+        sql = f'SELECT f.data FROM features f WHERE f.map_id=? AND f.version=? AND {where[0]} ORDER BY f.id'
+        return self._select(sql, [map_id, version] + where[1], limit, offset)
+
+    @staticmethod
+    def _filters(layer: Optional[str], condition: Optional[str]) -> Optional[Tuple[str, list]]:
+        where = parse_condition(condition)
+        if where is None or layer is None:
+            return where
+        return f'f.layername = ? AND {where[0]}', [layer] + where[1]
+
+    def _select(self, sql: str, params: list, limit: Optional[int], offset: int) -> List[dict]:
+        if limit is not None or offset:
+            sql += ' LIMIT ? OFFSET ?'
+            params = params + [limit if limit is not None else -1, offset or 0]
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._decode(data) for data, in rows]
+
+    def local_query(self, map_id: str, version: str, parameters) -> Optional[List[dict]]:
+        """
+        Answer a query parameters object locally.
+
+        Returns
+        -------
+        features : List[dict], optional
+            The entities, or None when the query is not supported locally.
+        """
+        data = parameters.to_dict() if hasattr(parameters, 'to_dict') else dict(parameters)
+        querytype = data.get("querytype")
+        condition = data.get("condition")
+        if parse_condition(condition) is None:
+            return None
+        options = {"layer": data.get("layername"), "condition": condition, "limit": data.get("maxReturnCount"), "offset": data.get("beginpos") or 0}
+        if querytype == "point":
+            if not data.get("pixelToGeoLength"):
+                return None
+            tolerance = (data.get("pixelsize") or 0) * data["pixelToGeoLength"]
+            return self.query_point(map_id, version, data["x"], data["y"], tolerance, **options)
+        if querytype == "rect":
+            if any(data.get(k) is None for k in ("x1", "y1", "x2", "y2")):
+                return self.query_condition(map_id, version, **options)
+            return self.query_rect(map_id, version, data["x1"], data["y1"], data["x2"], data["y2"], **options)
+        if querytype == "condition":
+            bounds = data.get("bounds")
+            if bounds:
+                x1, y1, x2, y2 = parse_bounds(json.loads(bounds) if isinstance(bounds, str) else bounds)
+                return self.query_rect(map_id, version, x1, y1, x2, y2, contains=bool(data.get("isContains")), **options)
+            return self.query_condition(map_id, version, **options)
+        return None
+
+    def query_features(self, map_id: str, version: str, parameters, **kwargs):
+        """
+        Query features like :meth:`VjmapClient.query_features`, locally when the version is loaded
+        and the query is supported, otherwise from the server.
+
+        Returns
+        -------
+        response : dict
+            ``result`` holds the entities and ``recordCount`` their number.
+        """
+        if self.is_complete(map_id, version):
+            result = self.local_query(map_id, version, parameters)
+            if result is not None:
+                self.local_queries += 1
+                return {"recordCount": len(result), "result": result}
+        if self.client is None:
+            raise ValueError("The query cannot be answered locally and the store has no client")
+        self.server_queries += 1
+        return self.client.query_features(map_id, version, parameters, **kwargs)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
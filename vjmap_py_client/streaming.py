@@ -0,0 +1,317 @@
+import asyncio
+import os
+import re
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+DEFAULT_STREAM_CHUNK_SIZE = 65536
+
+# 完整的字符串，或结构字符；单独匹配到引号说明字符串尚未完整到达
+_LEXEME = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|["\[\]{},:]', re.S)
+# 数组项内部只关心括号，一次跳过其余字符与完整的字符串
+_SKIP = re.compile(rb'(?:[^"\[\]{}]+|"[^"\\]*(?:\\.[^"\\]*)*")*', re.S)
+_SPACE = b' \t\r\n'
+
+
+def write_response(response, destination, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE) -> int:
+    """
+    将响应体分块写入文件、文件对象或预先分配的缓冲区，返回写入的字节数。
+    未压缩的流式响应直接读入复用的缓冲区，写入 bytearray/memoryview 时不做额外复制
+    :param response: requests 的响应，最好以 stream=True 发出
+    :param destination: 文件路径、可写的文件对象，或 bytearray/memoryview
+    :param chunk_size: 每次读取的字节数
+    :return: 写入的字节数
+    """
+    if isinstance(destination, (bytearray, memoryview)):
+        return _read_into_buffer(response, memoryview(destination).cast('B'), chunk_size)
+    if isinstance(destination, (str, os.PathLike)):
+        with open(destination, 'wb') as f:
+            return write_response(response, f, chunk_size)
+    try:
+        if response._content_consumed or response.raw is None:
+            destination.write(memoryview(response.content))
+            return len(response.content)
+        written = 0
+        if _identity(response) and hasattr(response.raw, 'readinto'):
+            buffer = bytearray(chunk_size)
+            view = memoryview(buffer)
+            while size := response.raw.readinto(buffer):
+                destination.write(view[:size])
+                written += size
+        else:
+            # 压缩的响应需要解码，无法直接读入缓冲区
+            for chunk in response.iter_content(chunk_size):
+                destination.write(chunk)
+                written += len(chunk)
+        return written
+    finally:
+        response.close()
+
+
+async def async_write_response(response, destination, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE) -> int:
+    """
+    write_response 的 asyncio 版本，分块读取 httpx 的流式响应，文件在默认线程池中打开和写入
+    :param response: 以 stream=True 发出的 httpx 响应
+    :param destination: 文件路径、可写的文件对象，或 bytearray/memoryview
+    :param chunk_size: 每次读取的字节数
+    :return: 写入的字节数
+    """
+    loop = asyncio.get_running_loop()
+    if isinstance(destination, (str, os.PathLike)):
+        f = await loop.run_in_executor(None, open, destination, 'wb')
+        try:
+            return await async_write_response(response, f, chunk_size)
+        finally:
+            await loop.run_in_executor(None, f.close)
+    view = memoryview(destination).cast('B') if isinstance(destination, (bytearray, memoryview)) else None
+    written = 0
+    try:
+        async for chunk in response.aiter_bytes(chunk_size):
+            if view is not None:
+                if written + len(chunk) > len(view):
+                    raise ValueError(f"The buffer of {len(view)} bytes is too small for the response")
+                view[written:written + len(chunk)] = chunk
+            else:
+                await loop.run_in_executor(None, destination.write, chunk)
+            written += len(chunk)
+        return written
+    finally:
+        await response.aclose()
+
+
+def _identity(response) -> bool:
+    return response.headers.get('Content-Encoding', 'identity').lower() in ('identity', '')
+
+
+def _read_into_buffer(response, view: memoryview, chunk_size: int) -> int:
+    try:
+        if response._content_consumed or response.raw is None:
+            content = response.content
+            if len(content) > len(view):
+                raise ValueError(f"The buffer of {len(view)} bytes is too small for {len(content)} bytes")
+            view[:len(content)] = content
+            return len(content)
+        written = 0
+        if _identity(response) and hasattr(response.raw, 'readinto'):
+            while written < len(view):
+                size = response.raw.readinto(view[written:written + chunk_size])
+                if not size:
+                    return written
+                written += size
+            if response.raw.read(1):
+                raise ValueError(f"The buffer of {len(view)} bytes is too small for the response")
+            return written
+        for chunk in response.iter_content(chunk_size):
+            if written + len(chunk) > len(view):
+                raise ValueError(f"The buffer of {len(view)} bytes is too small for the response")
+            view[written:written + len(chunk)] = chunk
+            written += len(chunk)
+        return written
+    finally:
+        response.close()
+
+
+class ArrayItemParser(object):
+    """
+    Incremental parser splitting a JSON document, fed chunk by chunk, into the raw items of one array.
+
+    The array is the value of ``key`` in the top-level object, e.g. the "result" of a queryFeatures
+    response, or the top-level array when key is None. :meth:`feed` returns the items completed by a
+    chunk as bytes, ready to be decoded one by one, so that only the current item is kept in memory.
+    The rest of the document is kept and returned by :meth:`envelope`, the array being replaced by [].
+    """
+
+    def __init__(self, key: Optional[str] = 'result'):
+        self.key = None if key is None else b'"' + key.encode('utf-8') + b'"'
+        self._buffer = bytearray()
+        self._pos = 0
+        self._depth = 0
+        self._last_string = None
+        self._expect_value_of = None
+        self._mode = 'prefix'
+        self._item_depth = 1 if key is None else 2
+        self._separator = 0
+        self._prefix = b''
+        self._suffix = bytearray()
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        if self._mode == 'suffix':
+            self._suffix += chunk
+            return []
+        self._buffer += chunk
+        items = []
+        buffer = self._buffer
+        pos = self._pos
+        while True:
+            if self._depth > self._item_depth and self._mode == 'array':
+                pos = _SKIP.match(buffer, pos).end()
+                if pos >= len(buffer) or buffer[pos] == 0x22:
+                    break
+                token = buffer[pos]
+                if token in b'[{':
+                    self._depth += 1
+                    pos += 1
+                    continue
+            else:
+                match = _LEXEME.search(buffer, pos)
+                if match is None:
+                    pos = len(buffer)
+                    break
+                pos = match.start()
+                token = buffer[pos]
+                if token == 0x22:  # "
+                    if match.end() - pos == 1:
+                        break
+                    pos = match.end()
+                    if self._mode == 'prefix' and self._depth == 1:
+                        self._last_string = match.group()
+                    continue
+            if self._mode == 'prefix':
+                if token == 0x3a:  # :
+                    self._expect_value_of = self._last_string if self._depth == 1 else None
+                elif token == 0x2c:  # ,
+                    self._expect_value_of = None
+                elif token == 0x5b and (self.key is None and self._depth == 0 or self.key is not None and self._depth == 1 and self._expect_value_of == self.key):
+                    self._prefix = bytes(buffer[:pos])
+                    self._mode = 'array'
+                    self._depth += 1
+                    pos += 1
+                    self._separator = pos
+                    continue
+                if token in b'[{':
+                    self._depth += 1
+                elif token in b']}':
+                    self._depth -= 1
+                pos += 1
+                continue
+            # 数组内
+            if token in b'[{':
+                self._depth += 1
+            elif token in b']}':
+                self._depth -= 1
+                if self._depth == self._item_depth:
+                    items.append(bytes(buffer[self._separator:pos + 1]).strip(_SPACE))
+                    self._separator = pos + 1
+                elif self._depth == self._item_depth - 1:
+                    item = bytes(buffer[self._separator:pos]).strip(_SPACE)
+                    if item:
+                        items.append(item)
+                    self._suffix = bytearray(buffer[pos + 1:])
+                    self._mode = 'suffix'
+                    self._buffer = bytearray()
+                    self._pos = 0
+                    return items
+            elif token == 0x2c and self._depth == self._item_depth:
+                item = bytes(buffer[self._separator:pos]).strip(_SPACE)
+                if item:
+                    items.append(item)
+                self._separator = pos + 1
+            pos += 1
+        if self._mode == 'array' and self._separator:
+            # 丢弃已解析的数据，只保留当前项
+            del buffer[:self._separator]
+            pos -= self._separator
+            self._separator = 0
+        self._pos = pos
+        return items
+
+    @property
+    def finished(self) -> bool:
+        return self._mode == 'suffix'
+
+    def envelope(self) -> bytes:
+        """
+        The document without the items of the array, or the whole document when it had no such array.
+        """
+        if self._mode == 'prefix':
+            return bytes(self._buffer)
+        return self._prefix + b'[]' + bytes(self._suffix)
+
+
+def iter_json_items(chunks: Iterable[bytes], decoder: Callable[[bytes], Any], key: Optional[str] = 'result', parser: Optional[ArrayItemParser] = None) -> Iterator[Any]:
+    """
+    逐个解码分块到达的 JSON 文档中某个数组的元素
+    :param chunks: JSON 文档的分块
+    :param decoder: 单个元素的解码函数
+    :param key: 数组在顶层对象中的键，None 表示顶层数组
+    :param parser: 使用的解析器，可在迭代结束后读取其 envelope
+    :return: 元素的生成器
+    """
+    parser = parser if parser is not None else ArrayItemParser(key)
+    for chunk in chunks:
+        for item in parser.feed(chunk):
+            yield decoder(item)
+
+
+class FeatureStream(object):
+    """
+    The entities of a queryFeatures response, decoded one at a time while the response arrives.
+
+    The other fields of the response (recordCount, code, error, ...) are available in
+    :attr:`envelope` once the iteration is over.
+    """
+
+    def __init__(self, response, decoder: Callable[[bytes], Any], chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE, model=None):
+        self.response = response
+        self.decoder = decoder
+        self.chunk_size = chunk_size
+        self.model = model
+        self.count = 0
+        self._parser = ArrayItemParser('result')
+        self._envelope = None
+
+    @property
+    def envelope(self) -> Optional[dict]:
+        if self._envelope is None and self._parser.finished:
+            self._envelope = self.decoder(self._parser.envelope())
+        return self._envelope
+
+    def __iter__(self):
+        try:
+            for chunk in self.response.iter_content(self.chunk_size):
+                for item in self._parser.feed(chunk):
+                    self.count += 1
+                    feature = self.decoder(item)
+                    yield self.model.from_dict(feature) if self.model is not None else feature
+            if not self._parser.finished:
+                self._envelope = self.decoder(self._parser.envelope())
+        finally:
+            self.response.close()
+
+    def close(self):
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class AsyncFeatureStream(FeatureStream):
+    """
+    The asyncio counterpart of :class:`FeatureStream` over an httpx streaming response, to be used with ``async for``.
+    """
+
+    def __iter__(self):
+        raise TypeError("AsyncFeatureStream is iterated with async for")
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self.response.aiter_bytes(self.chunk_size):
+                for item in self._parser.feed(chunk):
+                    self.count += 1
+                    feature = self.decoder(item)
+                    yield self.model.from_dict(feature) if self.model is not None else feature
+            if not self._parser.finished:
+                self._envelope = self.decoder(self._parser.envelope())
+        finally:
+            await self.response.aclose()
+
+    async def aclose(self):
+        await self.response.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
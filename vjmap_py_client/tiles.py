@@ -0,0 +1,200 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Optional, Iterable, Iterator, Tuple
+from .utils import parse_bounds
+
+
+def tile_range(bounds, zoom: int, map_bounds=None) -> Tuple[int, int, int, int]:
+    """
+    计算范围在指定级别下覆盖的瓦片行列号
+    :param bounds: 需要覆盖的范围，如 get_data_bounds 返回的 bounds
+    :param zoom: 级别
+    :param map_bounds: 地图的全图范围，如 get_metadata 返回的 bounds，缺省时使用 bounds
+    :return: (x_min, y_min, x_max, y_max)，均包含在内
+    """
+    x1, y1, x2, y2 = parse_bounds(bounds)
+    mx1, my1, mx2, my2 = parse_bounds(map_bounds if map_bounds is not None else bounds)
+    # 0 级瓦片覆盖以全图中心为中心的正方形范围，y 方向自上而下编号
+    size = max(mx2 - mx1, my2 - my1)
+    left = (mx1 + mx2 - size) / 2
+    top = (my1 + my2 + size) / 2
+    count = 1 << zoom
+    tile_size = size / count if size else 1.0
+
+    def clamp(v):
+        return min(max(v, 0), count - 1)
+
+    x_min = clamp(math.floor((min(x1, x2) - left) / tile_size))
+    x_max = clamp(math.floor((max(x1, x2) - left) / tile_size))
+    y_min = clamp(math.floor((top - max(y1, y2)) / tile_size))
+    y_max = clamp(math.floor((top - min(y1, y2)) / tile_size))
+    return x_min, y_min, x_max, y_max
+
+
+def iter_tiles(bounds, min_zoom: int, max_zoom: int, map_bounds=None) -> Iterator[Tuple[int, int, int]]:
+    """
+    逐个生成范围在 min_zoom 到 max_zoom 级别（包含）覆盖的瓦片
+    :return: (z, x, y) 生成器
+    """
+    for z in range(min_zoom, max_zoom + 1):
+        x_min, y_min, x_max, y_max = tile_range(bounds, z, map_bounds)
+        for x in range(x_min, x_max + 1):
+            for y in range(y_min, y_max + 1):
+                yield z, x, y
+
+
+class TileFetchStats(object):
+
+    def __init__(self):
+        self.requested = 0
+        self.completed = 0
+        self.failed = 0
+        self.bytes = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.finished = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def tiles_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.completed / elapsed if elapsed else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.bytes / elapsed if elapsed else 0.0
+
+    def __repr__(self):
+        return (f"TileFetchStats(requested={self.requested}, completed={self.completed}, failed={self.failed}, "
+                f"bytes={self.bytes}, elapsed={self.elapsed:.3f}s, tiles_per_second={self.tiles_per_second:.1f})")
+
+
+class TileFetcher(object):
+    """
+    Fetch many tiles of a map concurrently through a :class:`VjmapClient`.
+
+    Results are streamed as ``(z, x, y, content)`` in completion order. At most ``max_pending``
+    tiles are scheduled ahead of the consumer, so a slow consumer throttles the fetching.
+    The statistics of the last fetch are kept in :attr:`stats`.
+    """
+
+    def __init__(
+            self,
+            client,
+            workers: int = 8,
+            max_pending: Optional[int] = None,
+            max_connections: Optional[int] = None,
+            raise_errors: bool = False
+    ):
+        """
+        Parameters
+        ----------
+        client : VjmapClient
+            The client used to fetch the tiles.
+        workers : int
+            The number of worker threads.
+        max_pending : int, optional
+            The maximum number of scheduled but not yet consumed tiles, defaults to ``4 * workers``.
+        max_connections : int, optional
+            The maximum number of tiles fetched at the same time, defaults to ``workers`` capped by the
+            ``pool_maxsize`` of the client transport. It must not exceed ``pool_maxsize``: the client session is
+            shared with other threads and is not changed, so create the client with
+            ``TransportConfig(pool_maxsize=...)`` to fetch over more connections.
+        raise_errors : bool
+            Whether a failed tile stops the fetch. Otherwise failures are recorded in ``stats.errors``.
+        """
+        self.client = client
+        self.workers = workers
+        self.max_pending = max_pending or workers * 4
+        self.raise_errors = raise_errors
+        self.stats = TileFetchStats()
+        pool_maxsize = client.transport.pool_maxsize
+        if max_connections is not None and max_connections > pool_maxsize:
+            raise ValueError(f"max_connections ({max_connections}) exceeds the pool_maxsize of the client transport ({pool_maxsize})")
+        self.max_connections = max_connections or min(workers, pool_maxsize)
+        self._connections = threading.BoundedSemaphore(self.max_connections)
+
+    def fetch(self, map_id: str, version: str, stylename: str, fileid: str, min_zoom: int, max_zoom: int, bounds, map_bounds=None, as_mvt: bool = False, **kwargs):
+        """
+        Fetch all tiles covering bounds from min_zoom to max_zoom.
+
+        Parameters
+        ----------
+        map_id : str
+            The ID of the map to get the tiles from.
+        version : str
+            The version of the map to get the tiles from.
+        stylename : str
+            The name of the style to get the tiles from.
+        fileid : str
+            The ID of the file to get the tiles from.
+        min_zoom : int
+            The lowest zoom level, inclusive.
+        max_zoom : int
+            The highest zoom level, inclusive.
+        bounds : list|str
+            The area to cover, e.g. the bounds returned by get_data_bounds.
+        map_bounds : list|str, optional
+            The full extent of the map used for the tile grid, e.g. the bounds returned by get_metadata.
+            Defaults to bounds.
+        as_mvt : bool
+            Whether to fetch MVT tiles instead of raster tiles.
+
+        Returns
+        -------
+        results : Iterator[Tuple[int, int, int, bytes]]
+            The (z, x, y, content) of each tile, in completion order.
+        """
+        tiles = iter_tiles(bounds, min_zoom, max_zoom, map_bounds)
+        return self.fetch_tiles(map_id, version, stylename, fileid, tiles, as_mvt=as_mvt, **kwargs)
+
+    def fetch_tiles(self, map_id: str, version: str, stylename: str, fileid: str, tiles: Iterable[Tuple[int, int, int]], as_mvt: bool = False, **kwargs):
+        """
+        Fetch the given (z, x, y) tiles, see :meth:`fetch`.
+        """
+        stats = self.stats = TileFetchStats()
+        tiles = iter(tiles)
+        pending = {}
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            while True:
+                while len(pending) < self.max_pending:
+                    tile = next(tiles, None)
+                    if tile is None:
+                        break
+                    z, x, y = tile
+                    future = executor.submit(self._fetch_tile, map_id, version, stylename, z, x, y, fileid, as_mvt, **kwargs)
+                    pending[future] = tile
+                    stats.requested += 1
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    z, x, y = pending.pop(future)
+                    try:
+                        content = future.result()
+                    except Exception as e:
+                        stats.failed += 1
+                        stats.errors.append((z, x, y, e))
+                        if self.raise_errors:
+                            raise
+                        continue
+                    stats.completed += 1
+                    stats.bytes += len(content)
+                    yield z, x, y, content
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            stats.finished = time.perf_counter()
+
+    def _fetch_tile(self, map_id, version, stylename, z, x, y, fileid, as_mvt, **kwargs):
+        with self._connections:
+            response = self.client.get_map_tile(map_id, version, stylename, z, x, y, fileid, as_mvt=as_mvt, **kwargs)
+        return response.content
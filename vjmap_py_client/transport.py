@@ -0,0 +1,371 @@
+import gzip
+import io
+import os
+import threading
+import time
+from typing import Optional, Tuple, Union
+import requests
+from requests.adapters import HTTPAdapter, BaseAdapter, DEFAULT_POOLBLOCK, DEFAULT_POOLSIZE
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import select_proxy
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# 当前线程最近一次请求建立连接的耗时
+_connect_timer = threading.local()
+
+
+def reset_connect_time():
+    _connect_timer.seconds = 0.0
+
+
+def connect_time() -> float:
+    """
+    当前线程自上次 reset_connect_time 以来建立连接的耗时（秒），复用连接时为 0
+    """
+    return getattr(_connect_timer, 'seconds', 0.0)
+
+
+class _TimedHTTPConnection(HTTPConnection):
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_timer.seconds = getattr(_connect_timer, 'seconds', 0.0) + time.perf_counter() - started
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_timer.seconds = getattr(_connect_timer, 'seconds', 0.0) + time.perf_counter() - started
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TransportConfig(object):
+    """
+    Connection pooling, keep-alive, timeout and compression settings of a client.
+    """
+
+    def __init__(
+            self,
+            pool_connections: int = DEFAULT_POOLSIZE,
+            pool_maxsize: int = DEFAULT_POOLSIZE,
+            pool_block: bool = DEFAULT_POOLBLOCK,
+            keep_alive: bool = True,
+            timeout: Optional[Union[float, Tuple[float, float]]] = None,
+            accept_encoding: Optional[str] = None,
+            compress_requests: bool = False,
+            compress_min_size: int = 16384,
+            http2: bool = False,
+            max_retries: int = 0
+    ):
+        """
+        Parameters
+        ----------
+        pool_connections : int
+            The number of hosts whose connection pools are kept.
+        pool_maxsize : int
+            The maximum number of connections kept per host.
+        pool_block : bool
+            Whether requests wait for a free connection when pool_maxsize connections are in use,
+            instead of opening extra connections that are discarded afterwards.
+        keep_alive : bool
+            Whether connections are reused. Otherwise every request closes its connection.
+        timeout : float|Tuple[float, float], optional
+            The default (connect, read) timeout in seconds of requests without one.
+        accept_encoding : str, optional
+            The Accept-Encoding header, e.g. 'gzip, br'. Defaults to the encodings supported by urllib3.
+        compress_requests : bool
+            Whether request bodies of at least compress_min_size bytes are gzip compressed.
+            The server must accept Content-Encoding: gzip.
+        compress_min_size : int
+            The minimum size of compressed request bodies.
+        http2 : bool
+            Whether requests are sent with httpx, multiplexed over HTTP/2 when the server negotiates it over TLS.
+        max_retries : int
+            The number of retries of failed connections done by urllib3.
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.accept_encoding = accept_encoding
+        self.compress_requests = compress_requests
+        self.compress_min_size = compress_min_size
+        self.http2 = http2
+        self.max_retries = max_retries
+
+    def replace(self, **kwargs) -> 'TransportConfig':
+        """
+        A copy of the config with some settings changed.
+        """
+        config = TransportConfig.__new__(TransportConfig)
+        config.__dict__.update(self.__dict__)
+        config.__dict__.update(kwargs)
+        return config
+
+    def create_adapter(self) -> BaseAdapter:
+        if self.http2:
+            return HTTP2Adapter(self)
+        return TransportAdapter(self)
+
+
+class _TransportStatsMixin(object):
+
+    def _init_stats(self):
+        self._stats_lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+
+    def _prepare(self, request, timeout):
+        config = self.transport_config
+        if config.compress_requests and request.body and 'Content-Encoding' not in request.headers:
+            body = request.body.encode('utf-8') if isinstance(request.body, str) else request.body
+            if isinstance(body, bytes) and len(body) >= config.compress_min_size:
+                request.body = gzip.compress(body, compresslevel=5)
+                request.headers['Content-Encoding'] = 'gzip'
+                request.headers['Content-Length'] = str(len(request.body))
+        if not config.keep_alive:
+            request.headers['Connection'] = 'close'
+        if config.accept_encoding:
+            request.headers['Accept-Encoding'] = config.accept_encoding
+        return config.timeout if timeout is None else timeout
+
+    def _enter(self):
+        with self._stats_lock:
+            self.in_flight += 1
+            self.requests += 1
+            if self.in_flight > self.peak_in_flight:
+                self.peak_in_flight = self.in_flight
+
+    def _exit(self):
+        with self._stats_lock:
+            self.in_flight -= 1
+
+
+class TransportAdapter(_TransportStatsMixin, HTTPAdapter):
+    """
+    :class:`requests.adapters.HTTPAdapter` applying a :class:`TransportConfig` and counting pool usage.
+    """
+
+    def __init__(self, config: Optional[TransportConfig] = None):
+        self.transport_config = config or TransportConfig()
+        self._init_stats()
+        super().__init__(
+            pool_connections=self.transport_config.pool_connections,
+            pool_maxsize=self.transport_config.pool_maxsize,
+            max_retries=self.transport_config.max_retries,
+            pool_block=self.transport_config.pool_block
+        )
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        # 记录建立连接的耗时
+        self.poolmanager.pool_classes_by_scheme = {'http': _TimedHTTPConnectionPool, 'https': _TimedHTTPSConnectionPool}
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        timeout = self._prepare(request, timeout)
+        self._enter()
+        try:
+            return super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+        finally:
+            self._exit()
+
+    def stats(self) -> dict:
+        """
+        Pool utilization: requests in flight (including those waiting for a connection), their peak,
+        total requests and, per host pool, the connections opened, idle connections and requests served.
+        A peak well above maxsize means the pool is too small for the load.
+        """
+        pools = {}
+        for key in list(self.poolmanager.pools.keys()):
+            pool = self.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            pools[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                "maxsize": self.transport_config.pool_maxsize,
+                "connections_opened": pool.num_connections,
+                "idle": pool.pool.qsize() if pool.pool is not None else 0,
+                "requests": pool.num_requests,
+            }
+        with self._stats_lock:
+            return {"in_flight": self.in_flight, "peak_in_flight": self.peak_in_flight, "requests": self.requests, "pools": pools}
+
+
+class _HTTPXRaw(io.RawIOBase):
+    """
+    File-like view of the decoded body of a streamed :class:`httpx.Response`, used as ``Response.raw``.
+    """
+
+    def __init__(self, response, request=None):
+        super().__init__()
+        self.response = response
+        self.request = request
+        self._chunks = response.iter_bytes()
+        self._pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks, None)
+            except _httpx_errors() as e:
+                raise _requests_error(e, self.request) from e
+            if self._pending is None:
+                self._pending = b''
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self):
+        self.response.close()
+        super().close()
+
+
+def _httpx_errors():
+    import httpx
+    return httpx.TransportError, httpx.DecodingError
+
+
+def _requests_error(error, request=None) -> requests.RequestException:
+    """
+    将 httpx 的异常转换为 requests 的对应异常，以便重试、熔断等按 requests 的异常类型处理
+
+    :param error: httpx 的异常
+    :param request: 对应的请求
+    :return: requests 的异常
+    """
+    import httpx
+    if isinstance(error, httpx.ConnectTimeout):
+        cls = requests.ConnectTimeout
+    elif isinstance(error, httpx.ReadTimeout):
+        cls = requests.ReadTimeout
+    elif isinstance(error, httpx.TimeoutException):
+        cls = requests.Timeout
+    elif isinstance(error, httpx.ProxyError):
+        cls = requests.exceptions.ProxyError
+    elif isinstance(error, httpx.DecodingError):
+        cls = requests.exceptions.ContentDecodingError
+    else:
+        cls = requests.ConnectionError
+    return cls(error, request=request)
+
+
+def _ssl_context(verify, cert):
+    # 按 requests 的 verify/cert 参数创建 SSL 上下文，默认与 requests 一样使用 certifi 的证书
+    import ssl
+    if verify is False:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif isinstance(verify, (str, os.PathLike)):
+        if os.path.isdir(verify):
+            context = ssl.create_default_context(capath=verify)
+        else:
+            context = ssl.create_default_context(cafile=verify)
+    else:
+        import certifi
+        context = ssl.create_default_context(cafile=certifi.where())
+    if isinstance(cert, tuple):
+        context.load_cert_chain(*cert)
+    elif cert:
+        context.load_cert_chain(cert)
+    return context
+
+
+class HTTP2Adapter(_TransportStatsMixin, BaseAdapter):
+    """
+    Transport adapter sending requests over HTTP/2 with :class:`httpx.Client`, requires ``httpx[http2]``.
+
+    The verify, cert and proxies settings of the session are honoured, one httpx client being kept per
+    combination. Iterable bodies are streamed, and so are response bodies of requests sent with ``stream=True``.
+    httpx errors are raised as the matching requests exceptions, e.g. :class:`requests.ConnectTimeout`.
+    """
+
+    def __init__(self, config: Optional[TransportConfig] = None):
+        super().__init__()
+        self.transport_config = config or TransportConfig(http2=True)
+        self._init_stats()
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+        self.client = self._client(True, None, None)
+
+    def _client(self, verify, cert, proxy):
+        import httpx
+        key = (verify, tuple(cert) if isinstance(cert, (list, tuple)) else cert, proxy)
+        with self._clients_lock:
+            client = self._clients.get(key)
+            if client is None:
+                limits = httpx.Limits(
+                    max_connections=self.transport_config.pool_connections * self.transport_config.pool_maxsize,
+                    max_keepalive_connections=self.transport_config.pool_maxsize if self.transport_config.keep_alive else 0
+                )
+                # 代理由 requests 根据环境变量解析后传入，httpx 不再读取环境变量
+                client = self._clients[key] = httpx.Client(
+                    http2=True, limits=limits, timeout=None, follow_redirects=False, trust_env=False,
+                    verify=_ssl_context(verify, key[1]), proxy=proxy
+                )
+            return client
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        import httpx
+        timeout = self._prepare(request, timeout)
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        client = self._client(verify, cert, select_proxy(request.url, proxies) if proxies else None)
+        body = request.body
+        if body is not None and not isinstance(body, (bytes, str)):
+            body = (chunk.encode('utf-8') if isinstance(chunk, str) else chunk for chunk in body)
+        self._enter()
+        try:
+            built = client.build_request(request.method, request.url, headers=dict(request.headers), content=body, timeout=timeout)
+            result = client.send(built, stream=stream)
+        except _httpx_errors() as e:
+            raise _requests_error(e, request) from e
+        finally:
+            self._exit()
+        response = Response()
+        response.status_code = result.status_code
+        response.headers = CaseInsensitiveDict(result.headers.multi_items())
+        if stream:
+            response.raw = _HTTPXRaw(result, request)
+        else:
+            response._content = result.content
+            response._content_consumed = True
+            response.elapsed = result.elapsed
+        response.reason = result.reason_phrase
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.encoding = result.encoding
+        return response
+
+    def close(self):
+        with self._clients_lock:
+            clients = list(self._clients.values())
+        for client in clients:
+            client.close()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {"in_flight": self.in_flight, "peak_in_flight": self.peak_in_flight, "requests": self.requests, "pools": {}}
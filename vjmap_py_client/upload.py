@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from typing import Any, Callable, Optional
+
+DEFAULT_CHUNK_SIZE = 2097152  # 2MB
+
+
+class UploadStream(object):
+    """
+    Streaming multipart/form-data body of one file.
+
+    The file is read chunk by chunk while the body is sent and its MD5 is computed on the way,
+    so the file is read only once. ``progress(sent, total)`` is called after each chunk,
+    total being None when the size of the file is unknown.
+    """
+
+    def __init__(self, file_object: Any, field_name: str = 'file', filename: Optional[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE, progress: Optional[Callable[[int, Optional[int]], Any]] = None):
+        self.file_object = file_object
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.boundary = uuid.uuid4().hex
+        self.sent = 0
+        self.finished = False
+        self._md5 = hashlib.md5()
+        if filename is None:
+            filename = os.path.basename(getattr(file_object, 'name', None) or field_name)
+        filename = str(filename).replace('"', '%22')
+        self._head = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'
+        ).encode('utf-8')
+        self._tail = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+        self.size = _remaining_size(file_object)
+
+    @property
+    def content_type(self) -> str:
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def hexdigest(self) -> Optional[str]:
+        """
+        The MD5 of the file, None until the whole file has been read.
+        """
+        return self._md5.hexdigest() if self.finished else None
+
+    def __len__(self):
+        if self.size is None:
+            raise TypeError("The size of the file is unknown")
+        return len(self._head) + self.size + len(self._tail)
+
+    def __iter__(self):
+        yield self._head
+        while chunk := self.file_object.read(self.chunk_size):
+            yield self._consume(chunk)
+        self.finished = True
+        yield self._tail
+
+    async def __aiter__(self):
+        # 文件在默认线程池中读取，不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        yield self._head
+        while chunk := await loop.run_in_executor(None, self.file_object.read, self.chunk_size):
+            yield self._consume(chunk)
+        self.finished = True
+        yield self._tail
+
+    def _consume(self, chunk: bytes) -> bytes:
+        self._md5.update(chunk)
+        self.sent += len(chunk)
+        if self.progress is not None:
+            self.progress(self.sent, self.size)
+        return chunk
+
+
+def is_seekable(file_object: Any) -> bool:
+    try:
+        return file_object.seekable()
+    except AttributeError:
+        return hasattr(file_object, "seek") and hasattr(file_object, "tell")
+
+
+def _remaining_size(file_object: Any) -> Optional[int]:
+    # 文件对象从当前位置到末尾的字节数，无法获取时返回 None
+    try:
+        position = file_object.tell()
+        try:
+            size = os.fstat(file_object.fileno()).st_size
+        except (AttributeError, OSError, ValueError):
+            size = file_object.seek(0, os.SEEK_END)
+            file_object.seek(position)
+        return max(size - position, 0)
+    except (AttributeError, OSError, ValueError):
+        return None
@@ -1,19 +1,33 @@
 import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+CHUNK_SIZE = 16777216  # 16MB，hashlib 处理大块数据时会释放 GIL
+STREAM_CHUNK_SIZE = 1048576  # 1MB，长度未知的文件对象每次读取的大小
 
 
 def file_md5(file_path: str) -> str:
     """
-    获取文件的MD5值
+    获取文件的MD5值，通过 mmap 零拷贝读取
     :param file_path: 文件的路径
     :return: 文件的MD5哈希值
     """
-    chunk_size = 2097152  # 2MB
     md5_hash = hashlib.md5()  # 创建MD5哈希对象
 
     try:
         with open(file_path, 'rb') as file:
-            while chunk := file.read(chunk_size):  # 按块读取文件
-                md5_hash.update(chunk)  # 更新哈希对象
+            try:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # 空文件或不支持 mmap 的文件按块读取
+                return file_object_md5(file)
+            with mapped, memoryview(mapped) as view:
+                for offset in range(0, len(view), CHUNK_SIZE):
+                    md5_hash.update(view[offset:offset + CHUNK_SIZE])  # 更新哈希对象
 
         return md5_hash.hexdigest()  # 返回十六进制格式的MD5值
 
@@ -21,20 +35,141 @@ def file_md5(file_path: str) -> str:
         raise IOError(f"Error reading file: {e}")
 
 
+def _remaining_size(file_object) -> Optional[int]:
+    # 可定位的文件对象从当前位置到末尾的长度，无法获取时返回 None
+    try:
+        if not file_object.seekable():
+            return None
+        position = file_object.tell()
+        end = file_object.seek(0, os.SEEK_END)
+        file_object.seek(position)
+        return max(end - position, 0)
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
 def file_object_md5(file_object) -> str:
     """
-    获取文件对象的MD5值
+    获取文件对象的MD5值，从当前位置读取到末尾
     :param file_object: 文件对象
     :return: 文件的MD5哈希值
     """
     md5_hash = hashlib.md5()  # 创建MD5哈希对象
-    chunk_size = 2097152  # 2MB
 
     try:
-        while chunk := file_object.read(chunk_size):    # 按块读取文件
-            md5_hash.update(chunk)  # 更新哈希对象
+        if hasattr(file_object, 'readinto'):
+            # 复用同一个缓冲区，避免每块数据的内存分配；长度已知时缓冲区不超过剩余长度
+            remaining = _remaining_size(file_object)
+            buffer = bytearray(STREAM_CHUNK_SIZE if remaining is None else max(min(CHUNK_SIZE, remaining), 1))
+            with memoryview(buffer) as view:
+                while size := file_object.readinto(buffer):
+                    md5_hash.update(view[:size])  # 更新哈希对象
+        else:
+            while chunk := file_object.read(STREAM_CHUNK_SIZE):    # 按块读取文件
+                md5_hash.update(chunk)  # 更新哈希对象
 
         return md5_hash.hexdigest()  # 返回十六进制格式的MD5值
 
     except Exception as e:
-        raise IOError(f"Error reading file: {e}")
\ No newline at end of file
+        raise IOError(f"Error reading file: {e}")
+
+
+class HashCache(object):
+    """
+    文件MD5缓存，以 (路径, 大小, 修改时间, inode) 为键，未修改的文件不会重复计算
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        :param path: SQLite 缓存文件的路径，为 None 时仅缓存在内存中
+        """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path or ':memory:', check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS file_md5 ('
+            'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, md5 TEXT)'
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(file_path: str) -> tuple:
+        """
+        获取文件当前的缓存键，应在读取文件之前获取，读取期间文件被修改时缓存的MD5值不会匹配修改后的文件
+        :param file_path: 文件的路径
+        :return: (路径, 大小, 修改时间, inode)
+        """
+        stat = os.stat(file_path)
+        return os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+    def get(self, file_path: str, key: Optional[tuple] = None) -> Optional[str]:
+        """
+        获取缓存的MD5值
+        :param file_path: 文件的路径
+        :param key: 预先获取的缓存键，缺省时重新获取
+        :return: 文件未修改时返回缓存的MD5值，否则返回 None
+        """
+        path, size, mtime_ns, inode = key or self.key(file_path)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT md5 FROM file_md5 WHERE path=? AND size=? AND mtime_ns=? AND inode=?',
+                (path, size, mtime_ns, inode)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, file_path: str, md5: str, key: Optional[tuple] = None):
+        """
+        缓存文件的MD5值
+        :param file_path: 文件的路径
+        :param md5: 文件的MD5哈希值
+        :param key: 计算MD5之前获取的缓存键，缺省时重新获取
+        """
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO file_md5 (path, size, mtime_ns, inode, md5) VALUES (?, ?, ?, ?, ?)',
+                (key or self.key(file_path)) + (md5,)
+            )
+            self._conn.commit()
+
+    def md5(self, file_path: str) -> str:
+        """
+        获取文件的MD5值，优先使用缓存
+        :param file_path: 文件的路径
+        :return: 文件的MD5哈希值
+        """
+        # 在计算之前获取缓存键，计算期间文件被修改时缓存的是修改前的键，不会被当作新文件的MD5
+        key = self.key(file_path)
+        md5 = self.get(file_path, key)
+        if md5 is None:
+            md5 = file_md5(file_path)
+            self.put(file_path, md5, key)
+        return md5
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def files_md5(file_paths: Iterable[str], max_workers: Optional[int] = None, cache: Optional[HashCache] = None) -> Dict[str, str]:
+    """
+    使用线程池并发获取多个文件的MD5值
+    :param file_paths: 文件路径列表
+    :param max_workers: 线程数，默认为 CPU 核数
+    :param cache: MD5缓存，未修改的文件不会重复计算
+    :return: 文件路径到MD5哈希值的字典
+    """
+    file_paths = list(file_paths)
+    md5 = cache.md5 if cache is not None else file_md5
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        return dict(zip(file_paths, executor.map(md5, file_paths)))
+
+
+def parse_bounds(bounds) -> tuple:
+    """
+    解析范围，支持 [x1, y1, x2, y2] 序列以及服务端返回的 "[x1,y1,x2,y2]" 或 "x1,y1,x2,y2" 字符串
+    :param bounds: 范围
+    :return: (x1, y1, x2, y2) 浮点数元组
+    """
+    if isinstance(bounds, str):
+        bounds = bounds.strip().strip('[]').split(',')
+    x1, y1, x2, y2 = (float(v) for v in bounds)
+    return x1, y1, x2, y2